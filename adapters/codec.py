@@ -0,0 +1,69 @@
+"""Compact binary encoding for the cached linter results of one file.
+
+The linter connectors only need the rule and the line of every warning, the
+other columns of the PMD CSV (absolute file path, description, package, ...)
+were stored as JSON for every warning which blew up the cache.
+We now store one zlib compressed blob per file:
+
+    header: version (uint8), lloc (uint32), number of warnings (uint32)
+    body:   rule ids (uint16 array), line numbers (uint32 array)
+
+The rule ids come from a rule dictionary which is kept by the database adapter.
+The path is not part of the blob, it is already stored once in the files table.
+"""
+
+import struct
+import sys
+import zlib
+from array import array
+
+VERSION = 1
+HEADER = struct.Struct('<BII')
+
+
+def _little_endian(arr):
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return arr
+
+
+def encode_lint_data(data, rule_id):
+    """Encode the linter data of one file.
+
+    :param data: dict with lloc, warnings and warning_list as produced by the linter connectors
+    :param rule_id: callable that returns the integer id for a rule name
+    :return: compressed bytes
+    """
+    rules = array('H', [rule_id(w['Rule']) for w in data['warning_list']])
+    lines = array('I', [int(w['Line']) for w in data['warning_list']])
+
+    blob = HEADER.pack(VERSION, data['lloc'], len(rules))
+    blob += _little_endian(rules).tobytes() + _little_endian(lines).tobytes()
+    return zlib.compress(blob)
+
+
+def decode_lint_data(blob, rule_name):
+    """Decode the linter data of one file.
+
+    :param blob: compressed bytes from encode_lint_data
+    :param rule_name: callable that returns the rule name for an integer id
+    :return: dict with lloc, warnings, warning_list (only Rule and Line per warning)
+             and rule_ids (uint16 array)
+    """
+    raw = zlib.decompress(blob)
+    version, lloc, num = HEADER.unpack_from(raw)
+    if version != VERSION:
+        raise Exception('unknown lint data version {}'.format(version))
+
+    offset = HEADER.size
+    rules = array('H')
+    rules.frombytes(raw[offset:offset + num * rules.itemsize])
+    offset += num * rules.itemsize
+    lines = array('I')
+    lines.frombytes(raw[offset:offset + num * lines.itemsize])
+    _little_endian(rules)
+    _little_endian(lines)
+
+    warnings = [rule_name(r) for r in rules]
+    warning_list = [{'Rule': r, 'Line': l} for r, l in zip(warnings, lines)]
+    return {'lloc': lloc, 'warnings': warnings, 'warning_list': warning_list, 'rule_ids': rules}
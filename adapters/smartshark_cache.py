@@ -0,0 +1,97 @@
+"""Per commit store for the SmartSHARK cache.
+
+The SmartSHARK connector used to pickle its whole cache into one file which had to be loaded
+completely at startup (several GB for the biggest projects) and was never extended afterwards.
+Here every cache entry (warning density per commit, static features per commit and parent) is one
+row in a SQLite file, reads are lazy and only the last few entries are kept in memory.
+"""
+
+import os
+import pickle
+import sqlite3
+import zlib
+import logging
+from collections import OrderedDict
+
+
+class SmartSharkCache():
+    """Dict like access to the SmartSHARK cache of one project."""
+
+    def __init__(self, project_name, is_test=False, memory_size=64):
+        self._log = logging.getLogger('jit.smartshark.cache')
+        db_file = os.path.abspath('./cache/{}_smartshark.sqlite'.format(project_name))
+        if is_test:
+            db_file = ':memory:'
+
+        # the timeout allows multiple pre-cache worker processes to write into the same file
+        self._con = sqlite3.connect(db_file, timeout=120)
+        self._con.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key         varchar(255) PRIMARY KEY,
+            data        blob NOT NULL
+        )""")
+        self._con.commit()
+
+        self._memory_size = memory_size
+        self._memory = OrderedDict()
+
+    def __del__(self):
+        self._con.close()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Return the value of key from memory or the database, default if it is in neither."""
+        if key in self._memory.keys():
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        r = self._con.execute("SELECT data FROM entries WHERE key = ?", (key,)).fetchone()
+        if not r:
+            return default
+        value = pickle.loads(zlib.decompress(r[0]))
+        self._remember(key, value)
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, KeyError)
+        if value is KeyError:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        if key in self._memory.keys():
+            return True
+        r = self._con.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        return r is not None
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def update(self, entries):
+        """Write all entries in one transaction."""
+        rows = ((k, zlib.compress(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL))) for k, v in entries.items())
+        self._con.executemany("INSERT OR REPLACE INTO entries (key, data) VALUES (?, ?)", rows)
+        self._con.commit()
+        for k, v in entries.items():
+            self._remember(k, v)
+
+    def keys(self):
+        """Return all keys in the database."""
+        return set(r[0] for r in self._con.execute("SELECT key FROM entries"))
+
+    def __len__(self):
+        return self._con.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def import_pickle(self, cache_file):
+        """Import the cache of the previous pickle format, returns the number of entries."""
+        with open(cache_file, 'rb') as f:
+            cache = pickle.load(f)
+        keys = list(cache.keys())
+        for i in range(0, len(keys), 1000):
+            self.update({k: cache[k] for k in keys[i:i + 1000]})
+        self._memory.clear()
+        return len(keys)
@@ -8,6 +8,8 @@ import logging
 import os
 import sqlite3
 
+from adapters.codec import encode_lint_data, decode_lint_data
+
 
 class SQLiteDatabaseAdapter():
     """Handles the cache for the PMDConnector.
@@ -21,11 +23,13 @@ class SQLiteDatabaseAdapter():
         if config.is_test:
             db_file = ':memory:'
 
-        self._con = sqlite3.connect(db_file)
+        # the timeout allows multiple pre-lint worker processes to write into the same file
+        self._con = sqlite3.connect(db_file, timeout=120)
         self._install_db()
 
         self._con.row_factory = sqlite3.Row
         self._project_id = self.get_project_id(config.project)
+        self._load_rules()
 
     def __del__(self):
         self._con.close()
@@ -47,9 +51,38 @@ class SQLiteDatabaseAdapter():
             id          integer PRIMARY KEY,
             project_id  integer REFERENCES projects (id) ON DELETE CASCADE,
             path        text NOT NULL,
-            pmd_data    text
+            pmd_data    text,
+            lint_data   blob
         )""")
 
+        # rule dictionary for the compact lint_data encoding
+        c.execute("""CREATE TABLE IF NOT EXISTS rules (
+            id          integer PRIMARY KEY,
+            name        text NOT NULL UNIQUE
+        )""")
+
+        # system level sums per commit and filename filter, so that we do not need to load all files
+        c.execute("""CREATE TABLE IF NOT EXISTS aggregates (
+            commit_id         integer REFERENCES commits (id) ON DELETE CASCADE,
+            filter_key        varchar(255) NOT NULL,
+            warnings          integer NOT NULL,
+            lloc              integer NOT NULL,
+            default_warnings  integer NOT NULL,
+            files             integer NOT NULL,
+            UNIQUE (commit_id, filter_key)
+        )""")
+
+        # lloc only depends on the file content so we can share it between commits (and projects)
+        c.execute("""CREATE TABLE IF NOT EXISTS lloc (
+            blob        varchar(40) PRIMARY KEY,
+            lloc        integer NOT NULL
+        )""")
+
+        # caches created before the compact encoding only have pmd_data
+        c.execute("PRAGMA table_info(files)")
+        if 'lint_data' not in [col[1] for col in c.fetchall()]:
+            c.execute("ALTER TABLE files ADD COLUMN lint_data blob")
+
         c.execute("""CREATE TABLE IF NOT EXISTS files_to_commits (
             commit_id   integer REFERENCES commits (id) ON DELETE CASCADE,
             file_id     integer REFERENCES files (id) ON DELETE RESTRICT
@@ -79,63 +112,219 @@ class SQLiteDatabaseAdapter():
         p = c.fetchone()
         return p['id']
 
+    def _load_rules(self):
+        self._rule_ids = {}
+        self._rule_names = {}
+        c = self._con.cursor()
+        c.execute("SELECT id, name FROM rules")
+        for r in c.fetchall():
+            self._rule_ids[r['name']] = r['id']
+            self._rule_names[r['id']] = r['name']
+        c.close()
+
+    def get_rule_id(self, rule_name):
+        """Return the id of the rule from the rule dictionary, new rules are added.
+
+        New rules are not committed here, they are part of the transaction of the caller.
+        """
+        if rule_name not in self._rule_ids.keys():
+            c = self._con.cursor()
+            c.execute("INSERT OR IGNORE INTO rules (name) VALUES (?)", (rule_name,))
+            c.execute("SELECT id FROM rules WHERE name=?", (rule_name,))
+            rule_id = c.fetchone()['id']
+            c.close()
+            self._rule_ids[rule_name] = rule_id
+            self._rule_names[rule_id] = rule_name
+        return self._rule_ids[rule_name]
+
+    def rule_dictionary(self):
+        """Return the current rule dictionary (rule name -> id) of the rule ids in the lint data."""
+        return self._rule_ids
+
+    def get_rule_name(self, rule_id):
+        """Return the rule name for the id from the rule dictionary."""
+        if rule_id not in self._rule_names.keys():
+            self._load_rules()  # another process may have added the rule
+        return self._rule_names[rule_id]
+
+    def _decode(self, f):
+        if f['lint_data'] is not None:
+            return decode_lint_data(f['lint_data'], self.get_rule_name)
+        fdata = json.loads(f['pmd_data'])
+        return {'lloc': fdata['lloc'],
+                'warning_list': fdata['warning_list'],
+                'warnings': fdata['warnings']}
+
+    def get_lloc(self, blobs):
+        """Return dict blob -> lloc for all blobs which are in the database."""
+        ret = {}
+        blobs = list(blobs)
+        c = self._con.cursor()
+        for i in range(0, len(blobs), 500):  # sqlite has a limit on host parameters
+            chunk = blobs[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            c.execute("SELECT blob, lloc FROM lloc WHERE blob IN ({})".format(placeholders), chunk)
+            for r in c.fetchall():
+                ret[r['blob']] = r['lloc']
+        c.close()
+        return ret
+
+    def save_lloc(self, llocs):
+        """Save dict blob -> lloc."""
+        c = self._con.cursor()
+        c.executemany("INSERT OR IGNORE INTO lloc (blob, lloc) VALUES (?, ?)", llocs.items())
+        self._con.commit()
+        c.close()
+
+    def has_commit(self, revision_hash):
+        """Return True if the commit is already in the database."""
+        c = self._con.cursor()
+        c.execute("SELECT count(c.revision_hash) as num_ref FROM commits as c "
+                  "WHERE c.project_id = ? AND c.revision_hash = ?", (self._project_id, revision_hash))
+        res = c.fetchone()
+        c.close()
+        return res['num_ref'] > 0
+
     def get_commit(self, revision_hash):
         """Read commit from the database."""
         ret = {}
         c = self._con.cursor()
         c.execute("SELECT f.* FROM projects p, commits c, files f, files_to_commits ftc WHERE p.id = c.project_id AND c.id = ftc.commit_id AND ftc.file_id = f.id AND p.id = ? AND c.revision_hash = ?", (self._project_id, revision_hash))
         for f in c.fetchall():
-            fdata = json.loads(f['pmd_data'])
-            ret[f['path']] = {'lloc': fdata['lloc'], 'warning_list': fdata['warning_list'], 'warnings': fdata['warnings']}
+            ret[f['path']] = self._decode(f)
         return ret
 
-    def save_commit(self, revision_hash, files):
-        """Save the commit to the database."""
+    def get_commit_files(self, revision_hash, paths):
+        """Read only the given paths of the commit from the database."""
+        ret = {}
+        paths = list(paths)
         c = self._con.cursor()
-        c.execute("SELECT count(c.revision_hash) as num_ref FROM commits as c, projects as p WHERE c.project_id = p.id AND p.id = ? AND c.revision_hash = ?", (self._project_id, revision_hash))
-        res = c.fetchone()
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            c.execute("SELECT f.* FROM commits c, files f, files_to_commits ftc "
+                      "WHERE c.id = ftc.commit_id AND ftc.file_id = f.id AND c.project_id = ? "
+                      "AND c.revision_hash = ? AND f.path IN ({})".format(placeholders),
+                      [self._project_id, revision_hash] + chunk)
+            for f in c.fetchall():
+                ret[f['path']] = self._decode(f)
         c.close()
+        return ret
 
-        if res['num_ref'] == 0:
-            self._log.debug('[%s] commit does not exit in table, creating', revision_hash)
+    def get_aggregates(self, revision_hash, filter_key):
+        """Return the system level sums of the commit for the filter_key, None if we do not have them."""
+        c = self._con.cursor()
+        c.execute("SELECT a.warnings, a.lloc, a.default_warnings, a.files FROM commits c, aggregates a "
+                  "WHERE c.id = a.commit_id AND c.project_id = ? AND c.revision_hash = ? AND a.filter_key = ?",
+                  (self._project_id, revision_hash, filter_key))
+        r = c.fetchone()
+        c.close()
+        if not r:
+            return None
+        return {'warnings': r['warnings'],
+                'lloc': r['lloc'],
+                'default_warnings': r['default_warnings'],
+                'files': r['files']}
 
-            # 0. commit does not exist insert it
-            c = self._con.cursor()
-            c.execute("INSERT INTO commits (project_id, revision_hash) VALUES (?, ?)", (self._project_id, revision_hash))
+    def save_aggregates(self, revision_hash, filter_key, aggregates):
+        """Save the system level sums of the commit, the commit itself has to be saved already."""
+        c = self._con.cursor()
+        c.execute("SELECT id FROM commits WHERE project_id = ? AND revision_hash = ?",
+                  (self._project_id, revision_hash))
+        commit = c.fetchone()
+        if commit:
+            c.execute("INSERT OR REPLACE INTO aggregates "
+                      "(commit_id, filter_key, warnings, lloc, default_warnings, files) VALUES (?, ?, ?, ?, ?, ?)",
+                      (commit['id'], filter_key, aggregates['warnings'], aggregates['lloc'],
+                       aggregates['default_warnings'], aggregates['files']))
             self._con.commit()
-            c.close()
+        c.close()
+
+    def convert_legacy(self, batch_size=10000):
+        """Convert JSON pmd_data rows of older caches to the compact lint_data encoding.
+
+        The rows are read and converted in batches by id, so only one batch of JSON is in memory.
+
+        :param batch_size: number of rows which are converted and committed together
+        :return: number of converted rows
+        """
+        c = self._con.cursor()
+        c.execute("SELECT count(id) as num FROM files "
+                  "WHERE lint_data IS NULL AND pmd_data IS NOT NULL")
+        total = c.fetchone()['num']
+        c.close()
 
+        converted = 0
+        last_id = -1
+        while True:
             c = self._con.cursor()
-            c.execute("SELECT * FROM commits WHERE project_id=? AND revision_hash=?", (self._project_id, revision_hash))
-            commit = c.fetchone()
+            c.execute("SELECT id, pmd_data FROM files WHERE lint_data IS NULL AND pmd_data IS NOT NULL "
+                      "AND id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            rows = c.fetchall()
+            if not rows:
+                c.close()
+                break
+
+            for f in rows:
+                blob = encode_lint_data(json.loads(f['pmd_data']), self.get_rule_id)
+                c.execute("UPDATE files SET lint_data=?, pmd_data=NULL WHERE id=?", (blob, f['id']))
             c.close()
+            self._con.commit()
+            converted += len(rows)
+            last_id = rows[-1]['id']
+            self._log.info('converted %s/%s files', converted, total)
+
+        # give the space back to the filesystem
+        self._con.execute("VACUUM")
+        return converted
+
+    def save_commit(self, revision_hash, files):
+        """Save the commit to the database.
+
+        Everything is written in one transaction and the commit row is inserted after its files,
+        so a commit is never cached with only a part of its files, e.g., if a pre-lint worker
+        is killed.
+        """
+        c = self._con.cursor()
+        try:
+            # the write lock makes the existence check and the inserts atomic between workers
+            if not self._con.in_transaction:
+                c.execute("BEGIN IMMEDIATE")
+            c.execute("SELECT count(c.revision_hash) as num_ref FROM commits as c "
+                      "WHERE c.project_id = ? AND c.revision_hash = ?", (self._project_id, revision_hash))
+            if c.fetchone()['num_ref'] > 0:
+                self._con.rollback()
+                return
+
+            self._log.debug('[%s] commit does not exit in table, creating', revision_hash)
 
             # 1. insert files only if data does not change
+            file_ids = []
             for path, data in files.items():
+                blob = encode_lint_data(data, self.get_rule_id)
+
                 # 1.1. check if files are already in the data with the same values
-                c = self._con.cursor()
-                c.execute("SELECT f.id as id FROM files f WHERE f.path = ? AND f.pmd_data = ? AND f.project_id = ?", (path, json.dumps(data), self._project_id))
+                c.execute("SELECT f.id as id FROM files f WHERE f.path = ? AND f.lint_data = ? AND f.project_id = ?",
+                          (path, blob, self._project_id))
                 f = c.fetchone()
-                c.close()
                 if f:
-                    file_id = f['id']
-                    # self._log.debug('File %s exist in table files without changes, using id', path)
+                    file_ids.append(f['id'])
                 else:
                     self._log.debug('[%s] File %s does not exist without changes, creating', revision_hash, path)
-                    c = self._con.cursor()
-                    c.execute("INSERT INTO files (path, project_id, pmd_data) VALUES (?, ?, ?)", (path, self._project_id, json.dumps(data)))
-                    self._con.commit()
-                    last_id = c.lastrowid
-                    c.close()
-
-                    c = self._con.cursor()
-                    c.execute("SELECT id FROM files WHERE id=?", (last_id,))
-                    f = c.fetchone()
-                    file_id = f['id']
-                    c.close()
-
-                # 2. add file_ids from all files in files.keys()
-                c = self._con.cursor()
-                c.execute("INSERT INTO files_to_commits (file_id, commit_id) VALUES (?, ?)", (file_id, commit['id']))
-                self._con.commit()
-                c.close()
+                    c.execute("INSERT INTO files (path, project_id, lint_data) VALUES (?, ?, ?)",
+                              (path, self._project_id, blob))
+                    file_ids.append(c.lastrowid)
+
+            # 2. the commit and the links to all files in files.keys()
+            c.execute("INSERT INTO commits (project_id, revision_hash) VALUES (?, ?)",
+                      (self._project_id, revision_hash))
+            commit_id = c.lastrowid
+            c.executemany("INSERT INTO files_to_commits (file_id, commit_id) VALUES (?, ?)",
+                          ((file_id, commit_id) for file_id in file_ids))
+            self._con.commit()
+        except BaseException:
+            self._con.rollback()
+            self._load_rules()  # new rule ids of this transaction are gone
+            raise
+        finally:
+            c.close()
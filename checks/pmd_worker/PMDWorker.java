@@ -0,0 +1,41 @@
+import java.io.BufferedReader;
+import java.io.InputStreamReader;
+import java.nio.charset.StandardCharsets;
+
+import net.sourceforge.pmd.PMD;
+
+/**
+ * Long-lived PMD process for Gierlappen.
+ *
+ * Reads one PMD command line per line from stdin (arguments separated by tabs),
+ * runs PMD inside of this JVM and prints "PMDWORKER_DONE status" when finished.
+ * The report has to be written to a file via -r, stdout is only used for the protocol.
+ *
+ * Started via the Java source launcher (Java 11+):
+ * java -cp "checks/pmd/lib/*" checks/pmd_worker/PMDWorker.java
+ */
+public class PMDWorker {
+
+    public static void main(String[] args) throws Exception {
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        System.out.println("PMDWORKER_READY");
+        System.out.flush();
+
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.isEmpty()) {
+                continue;
+            }
+
+            int status;
+            try {
+                status = PMD.run(line.split("\t"));
+            } catch (Exception e) {
+                e.printStackTrace();
+                status = 1;
+            }
+            System.out.println("PMDWORKER_DONE " + status);
+            System.out.flush();
+        }
+    }
+}
@@ -4,57 +4,56 @@ import logging
 import subprocess
 import shutil
 import pickle
+import hashlib
+import tempfile
+import timeit
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import networkx as nx
 from lxml import etree
 
 from const import DEFAULT_RULES_MAVEN, PMD_OLD_RULESETS
+from util.git import BlobReader, ls_tree, commits_changing
+from util.git import add_worktree, checkout_worktree, remove_worktree
+from util.profile import Profiler
+from connectors.pom import PomPomError, parse_pom, parse_pom_data, get_modules, get_parent_artifact
+from connectors.pom_resolver import PomResolver, ResolverError
 
-POM_NS = {'m' : 'http://maven.apache.org/POM/4.0.0'}
 BUILD_FILES = ['/pom.xml', '/project.xml']
 
+# mvn -U updates the shared local repository, concurrent updates of an artifact can corrupt it
+UPDATE_LOCK = threading.Lock()
 
-class PomPomError(Exception):
-    """Encapsulate and differntiate between possible PomPom errors.
-
-    We need to know what error was due to missing parent, parse errors etc.
-    """
-    def __init__(self, output):
-        self.output = output
-        self.type = 'unknown'
-        self.line = ''
-
-        error_types = {
-            'unknown': None,
-            'version_missing': 'dependencies.dependency.version',
-            'plugin_missing': 'Plugin not found in any plugin repository',
-            'unique': 'duplicate declaration of version',
-            'parse': 'Non-parseable POM',
-            'parent': 'Non-resolvable parent POM for',
-            'malformed': 'Malformed POM',
-            'buildext': 'Unresolvable build extension',
-            'child': 'Child module',
-            'unknown_packaging': 'Unknown packaging',
-        }
-
-        for k, v in error_types.items():
-            if v and v in output:
-                self.type = k
-
-        for line in output.split('\n'):
-            if error_types[self.type] and error_types[self.type] in line:
-                self.line = line
-
-        super().__init__('mvn help:effective-pom error')
+# errors which only depend on the build files, other errors
+# (e.g., a parent which can not be downloaded) may be gone in the next run
+CACHED_ERRORS = {'parse', 'malformed', 'child', 'unique'}
 
 
 class PomPom():
     """Maven buildfile parser for repository mining."""
 
-    def __init__(self, project_root):
+    def __init__(self, project_root, offline=False, workers=1, resolver=False, profiler=None):
+        """
+        :param offline: try mvn in offline mode first, requires a pre-populated local repository
+        :param workers: number of concurrent mvn calls for multiple main poms and the pre-evaluation
+        :param resolver: create the effective poms with the PomResolver,
+                         mvn is only used if a parent is not in the repository
+        :param profiler: util.profile.Profiler which measures get_build
+        """
         self.poms = {}
+        self._offline = offline
+        self._resolver = resolver
+        self._workers = workers or 1
         self._cache = {}
+        # build digest -> effective pom output per main pom or the error output
+        self._effective_poms = {}
+        self._pom_blobs = {}  # pom.xml blob -> parent artifact and modules
+        self.cache_hits = 0  # revisions with known build files
+        self.cache_misses = 0
+        self._profiler = profiler or Profiler()
         self._build_information = {}
+        self._source_index = {}  # path component trie over the source directories of the builds
         self._log = logging.getLogger('jit.build')
         self._project_root = project_root
         if self._project_root.endswith('/'):
@@ -62,11 +61,21 @@ class PomPom():
 
     def load_cache(self, cache_file):
         with open(cache_file, 'rb') as f:
-            self._cache = pickle.load(f)
+            data = pickle.load(f)
+
+        # older caches only contain the build information per revision
+        if 'effective_poms' not in data.keys():
+            data = {'revisions': data, 'effective_poms': {}}
+        self._cache = data['revisions']
+        # older caches also contain errors which may not happen again
+        self._effective_poms = {}
+        for k, v in data['effective_poms'].items():
+            if 'error' not in v.keys() or PomPomError(v['error']).type in CACHED_ERRORS:
+                self._effective_poms[k] = v
 
     def save_cache(self, cache_file):
         with open(cache_file, 'wb') as f:
-            pickle.dump(self._cache, f)
+            pickle.dump({'revisions': self._cache, 'effective_poms': self._effective_poms}, f)
 
     def get_file_metrics(self, file_path):
         tmp = {'use_maven': False,
@@ -74,20 +83,47 @@ class PomPom():
                'use_checkstyle': False,
                'use_findbugs': False,
                'use_custom_rules': False,
-               'custom_rules': set()}
+               'custom_rules': frozenset()}
 
         if self._build_information:
             tmp['use_maven'] = True
 
-        for build_source, values in self._build_information.items():
-            if file_path.startswith(build_source):
-                tmp['use_pmd'] = values['use_pmd']
-                tmp['use_findbugs'] = values['use_findbugs']
-                tmp['use_checkstyle'] = values['use_checkstyle']
-                tmp['use_custom_rules'] = len(values['custom_rule_files']) > 0
-                tmp['custom_rules'] = values['rules']
+        values = self._find_source(file_path)
+        if values:
+            tmp['use_pmd'] = values['use_pmd']
+            tmp['use_findbugs'] = values['use_findbugs']
+            tmp['use_checkstyle'] = values['use_checkstyle']
+            tmp['use_custom_rules'] = len(values['custom_rule_files']) > 0
+            tmp['custom_rules'] = values['rules']
         return tmp
 
+    def _set_build_information(self, build_information):
+        """Set the build information and index the source directories by path component.
+
+        The values of a source directory are stored under the None key of its last component.
+        The rules are frozen once here, they are used as key for the rule set masks of every file.
+        """
+        self._build_information = build_information
+        self._source_index = {}
+        for build_source, values in build_information.items():
+            if build_source is None:
+                continue
+            node = self._source_index
+            for part in build_source.rstrip('/').split('/') if build_source else []:
+                node = node.setdefault(part, {})
+            node[None] = dict(values, rules=frozenset(values['rules']))
+
+    def _find_source(self, file_path):
+        """Return the build values of the longest source directory containing file_path or None."""
+        node = self._source_index
+        found = node.get(None)
+        for part in file_path.split('/')[:-1]:
+            node = node.get(part)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
     def add_commit(self, commit):
         """Connector method, called from tracking."""
         revision_hash = commit.hash
@@ -105,7 +141,8 @@ class PomPom():
 
         try:
             self._log.info('[%s] detected build change, extracting new build status', revision_hash)
-            self._build_information = self.get_build(revision_hash)
+            with self._profiler.call('get_build'):
+                self._set_build_information(self.get_build(revision_hash))
             self._log.debug('extract build information from commit %s', revision_hash)
         except PomPomError as e:
             if e.type == 'child':
@@ -128,11 +165,8 @@ class PomPom():
         self._cache[revision_hash] = {}
 
         self.poms = {}
-        poms = {}
+        poms = self.get_effective_poms(revision_hash)
         double_poms = set()
-        for pom in self.get_main_poms():
-            out, replacements = self.create_effective_pom(self._project_root + pom)
-            poms[pom] = {'out': out, 'replacements': replacements}
 
         for poma, v in poms.items():
             all_idents = set()
@@ -168,31 +202,127 @@ class PomPom():
                 self._cache[revision_hash][values['source_directory']] = values
         return self._cache[revision_hash]
 
-    def _get_modules(self, xml):
-        module_names = []
-        modules = xml.xpath('m:modules/m:module', namespaces=POM_NS)
-        for module in modules:
-            module_names.append(module.text)
-        return module_names
+    def build_digest(self, revision_hash):
+        """Return a digest of the paths and contents of all build files of the revision.
 
-    def _get_parent_artifact(self, xml):
-        artifact_id = ''
-        parent = xml.xpath('m:parent', namespaces=POM_NS)
-        if not parent:
-            return artifact_id
-        artifact = parent[0].find('m:artifactId', namespaces=POM_NS)
-        if artifact is not None:
-            artifact_id = artifact.text
-        return artifact_id
-
-    def _parse(self, filepath):
-        data = ''
-        with open(filepath, 'rb') as f:
-            for line in f.readlines():
-                if line.decode('utf-8', 'ignore'):
-                    data += line.decode('utf-8', 'ignore')
+        The effective poms only depend on the build files (the parent replacements are derived
+        from them), so commits with the same digest share the Maven result regardless of their
+        branch.
+        """
+        h = hashlib.sha1()
+        for _, blob, path in ls_tree(self._project_root, revision_hash):
+            if ('/' + path).endswith(tuple(BUILD_FILES)):
+                h.update('{}\0{}\n'.format(path, blob).encode('utf-8'))
+        return h.hexdigest()
 
-        return etree.fromstring(data.encode('utf-8'))
+    def get_effective_pom_cache(self):
+        """Return build digest -> effective pom output per main pom or the error output.
+
+        This contains all build files which were evaluated so far.
+        """
+        return self._effective_poms
+
+    def get_effective_poms(self, revision_hash):
+        """Return dict main pom -> effective pom output and replacements for the revision.
+
+        Maven is only called if we have not seen the same build files before,
+        errors which only depend on the build files are also remembered.
+        """
+        digest = self.build_digest(revision_hash)
+        if digest not in self._effective_poms.keys():
+            self.cache_misses += 1
+            poms = {}
+            main_poms = sorted(self.get_main_poms(revision_hash))
+            self._copy_project_xml()
+            try:
+                # multiple main poms are independent of each other
+                if self._workers > 1 and len(main_poms) > 1:
+                    paths = [self._project_root + pom for pom in main_poms]
+                    workers = min(self._workers, len(main_poms))
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        results = list(executor.map(self.create_effective_pom, paths))
+                else:
+                    results = [self.create_effective_pom(self._project_root + pom)
+                               for pom in main_poms]
+                for pom, (out, replacements) in zip(main_poms, results):
+                    poms[pom] = {'out': out, 'replacements': replacements}
+            except PomPomError as e:
+                if e.type in CACHED_ERRORS:
+                    self._effective_poms[digest] = {'error': e.output}
+                raise
+            self._effective_poms[digest] = {'poms': poms}
+        else:
+            self.cache_hits += 1
+            self._log.debug('[%s] build files unchanged (%s), using cached effective poms',
+                            revision_hash, digest)
+
+        if 'error' in self._effective_poms[digest].keys():
+            raise PomPomError(self._effective_poms[digest]['error'])
+        return dict(self._effective_poms[digest]['poms'])
+
+    def _pre_evaluate_worker(self, revisions):
+        """Create the effective poms for the revisions in a separate worktree.
+
+        Returns build digest -> cache entry.
+        """
+        worktree = tempfile.mkdtemp(prefix='gierlappen_build_')
+        add_worktree(self._project_root, worktree, revisions[0])
+        try:
+            pompom = self.__class__(worktree, offline=self._offline, resolver=self._resolver)
+            for revision_hash in revisions:
+                checkout_worktree(worktree, revision_hash)
+                try:
+                    pompom.get_effective_poms(revision_hash)
+                except PomPomError as e:
+                    self._log.debug('[%s] pre-evaluation error %s', revision_hash, e.type)
+                except etree.XMLSyntaxError as e:
+                    self._log.warning('[%s] XML Syntax error "%s" in pre-evaluation',
+                                      revision_hash, e)
+        finally:
+            remove_worktree(self._project_root, worktree)
+            shutil.rmtree(worktree, ignore_errors=True)
+
+        # the effective poms contain absolute paths
+        ret = {}
+        worktree_path = worktree.encode('utf-8')
+        project_path = self._project_root.encode('utf-8')
+        for digest, entry in pompom.get_effective_pom_cache().items():
+            if 'poms' in entry.keys():
+                entry = {'poms': {pom: {'out': v['out'].replace(worktree_path, project_path),
+                                        'replacements': v['replacements']}
+                                  for pom, v in entry['poms'].items()}}
+            ret[digest] = entry
+        return ret
+
+    def pre_evaluate(self, need_commits):
+        """Create the effective poms of every distinct build configuration before the traversal.
+
+        Only commits which change a build file need them, every worker evaluates its configurations
+        in its own git worktree.
+        """
+        commits = commits_changing(self._project_root, BUILD_FILES).intersection(need_commits)
+        todo = {}
+        for revision_hash in sorted(commits):
+            digest = self.build_digest(revision_hash)
+            if digest not in self._effective_poms.keys() and digest not in todo.keys():
+                todo[digest] = revision_hash
+
+        self._log.info('pre-evaluating %s build configurations of %s commits with %s workers',
+                       len(todo), len(commits), self._workers)
+        if not todo:
+            return
+
+        start = timeit.default_timer()
+        revisions = list(todo.values())
+        chunks = [revisions[i::self._workers] for i in range(self._workers)
+                  if revisions[i::self._workers]]
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            futures = [executor.submit(self._pre_evaluate_worker, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                self._effective_poms.update(future.result())
+                done = len(set(todo.keys()) & set(self._effective_poms.keys()))
+                self._log.info('pre-evaluated %s/%s build configurations in %.1fs',
+                               done, len(todo), timeit.default_timer() - start)
 
     def _replace_parent_in_pom(self, pomfile):
         ns = {'m': 'http://maven.apache.org/POM/4.0.0'}
@@ -295,14 +425,36 @@ class PomPom():
                 f.write(etree.tostring(doc))
         return replacement
 
+    def _run_effective_pom(self, basedir):
+        """Run mvn help:effective-pom, offline first if configured.
+
+        We mostly need what is already in the local repository. Only the offline runs are parallel,
+        the worker threads share the local repository so runs with updates are serialized.
+        """
+        if self._offline:
+            r = subprocess.run(['mvn', 'help:effective-pom', '-B', '-o'], cwd=basedir,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if r.returncode == 0:
+                return r
+            self._log.debug('offline effective pom in "%s" failed, retrying with updates', basedir)
+        with UPDATE_LOCK:
+            return subprocess.run(['mvn', 'help:effective-pom', '-B', '-U'], cwd=basedir,
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
     def create_effective_pom(self, pom_file):
         """Create effective POM.
         This uses Maven which automatically includes parent POMS from maven central.
         """
+        if self._resolver:
+            try:
+                return PomResolver().effective_pom(pom_file), []
+            except ResolverError as e:
+                self._log.debug('%s, using mvn', e)
+
         basedir = os.path.dirname(pom_file)
 
         # call help:effective-pom to generate the effective pom the project uses
-        r = subprocess.run(['mvn', 'help:effective-pom', '-B', '-U'], cwd=basedir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        r = self._run_effective_pom(basedir)
         replacements = []
         out = r.stdout
 
@@ -317,7 +469,7 @@ class PomPom():
             self._log.warning('effective pom %s in "%s" exited with status %s and error %s and stdout %s', pom_file, basedir, r.returncode, r.stderr, r.stdout)
             # but only in the main pom.xml
             replacements = self._replace_parent_in_pom(pom_file)
-            r2 = subprocess.run(['mvn', 'help:effective-pom', '-B', '-U'], cwd=basedir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            r2 = self._run_effective_pom(basedir)
             out = r2.stdout
             # if we still error we bail
             if r2.returncode != 0:
@@ -327,48 +479,94 @@ class PomPom():
 
         return out, replacements
 
-    def get_main_poms(self):
-        """Returns the main pom.xml
-
-        Get all pom.xml in projec dir and build a tree, return only roots (there can be multiple roots).
-        """
-        main_poms = set()
-
+    def _copy_project_xml(self):
         if not os.path.isfile(os.path.join(self._project_root, 'pom.xml')) and os.path.isfile(os.path.join(self._project_root, 'project.xml')):
             self._log.warning('rename project.xml -> pom.xml')
             shutil.copyfile(os.path.join(self._project_root, 'project.xml'), os.path.join(self._project_root, 'pom.xml'))
 
-        # if we are here we need to look for the main pom.xml
-        # it should be the file to which others link the most as parent
-        g = nx.DiGraph()
+    def _pom_links(self, xml):
+        return get_parent_artifact(xml), get_modules(xml)
+
+    def _worktree_poms(self):
+        """Return dict pom.xml path -> (parent artifact, modules) and an existence check.
+
+        The pom.xml files are read from the checked out files.
+        """
+        self._copy_project_xml()
+
+        poms = {}
         for root, dirs, files in os.walk(self._project_root):
             for filepath in files:
                 absolute_filepath = os.path.join(root, filepath)
                 relative_filepath = absolute_filepath.replace(self._project_root, '')
 
                 if relative_filepath.endswith('/pom.xml'):
-                    folder = '.'.join(os.path.dirname(relative_filepath[1:]).split('/'))
-                    g.add_node(absolute_filepath)
+                    poms[absolute_filepath] = self._pom_links(parse_pom(absolute_filepath))
+        return poms, os.path.exists
+
+    def _tree_poms(self, revision_hash):
+        """Return dict pom.xml path -> (parent artifact, modules) and an existence check.
+
+        The existence check is for the tree of the revision. The pom.xml files are read from
+        the object database, parent and modules are kept per blob so that unchanged pom.xml
+        files are not read and parsed again.
+        """
+        tree = {'{}/{}'.format(self._project_root, path): blob
+                for _, blob, path in ls_tree(self._project_root, revision_hash)}
+        if self._project_root + '/pom.xml' not in tree.keys() and \
+           self._project_root + '/project.xml' in tree.keys():
+            tree[self._project_root + '/pom.xml'] = tree[self._project_root + '/project.xml']
+
+        poms = {}
+        reader = None
+        try:
+            for path, blob in tree.items():
+                if not path.endswith('/pom.xml'):
+                    continue
+                if blob not in self._pom_blobs.keys():
+                    if reader is None:
+                        reader = BlobReader(self._project_root)
+                    self._pom_blobs[blob] = self._pom_links(parse_pom_data(reader.read(blob)))
+                poms[path] = self._pom_blobs[blob]
+        finally:
+            if reader:
+                reader.close()
+        return poms, tree.__contains__
+
+    def get_main_poms(self, revision_hash=None):
+        """Returns the main pom.xml
+
+        Get all pom.xml in projec dir and build a tree, return only roots
+        (there can be multiple roots).
+        If revision_hash is given the pom.xml files are read from git instead of the worktree.
+        """
+        main_poms = set()
+
+        if revision_hash:
+            poms, exists = self._tree_poms(revision_hash)
+        else:
+            poms, exists = self._worktree_poms()
+
+        # if we are here we need to look for the main pom.xml
+        # it should be the file to which others link the most as parent
+        g = nx.DiGraph()
+        g.add_nodes_from(poms.keys())
 
         # now establish the links between parents and childs for the builld tree
-        for node in g:
-            xml = self._parse(node)
+        for node, (artifact, modules) in poms.items():
             # look for parent references and potential modules to identify main pom.xml files
-            artifact = self._get_parent_artifact(xml)
-            modules = self._get_modules(xml)
-
             relative_filepath = node.replace(self._project_root, '')
             folder = '.'.join(os.path.dirname(relative_filepath[1:]).split('/'))
 
             # do we have a local parent?
             parent_path = node.replace(folder, artifact)
-            if artifact and os.path.exists(parent_path):
+            if artifact and exists(parent_path):
                 g.add_edge(parent_path, node)
 
             # modules should always be local
             for child in modules:
                 child_path = node.replace('/pom.xml', '/{}/pom.xml'.format(child.replace('.', '/')))
-                if os.path.exists(child_path):
+                if exists(child_path):
                     g.add_edge(node, child_path)
                     # self._log.debug('found child %s for %s', child_path, node)
                 else:
@@ -1,11 +1,68 @@
 """Basic linter connector, communicate with tracking/traversal and other connectors (PMD, pylint)"""
 
+import os
+import posixpath
 import logging
-import glob
+import copy
+import shutil
+import tempfile
+import timeit
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from pygount import SourceAnalysis
 from connectors.pmd_db import PMDConnector
 from connectors.pylint import PylintConnector
+from util.git import first_parents, topo_order, add_worktree, checkout_worktree, remove_worktree
+from util.git import ls_tree, BlobReader
+from util.misc import split
+from util.profile import Profiler
+
+
+def _count_lloc(files):
+    """Count the lloc of a list of (file name, content) with pygount.
+
+    The file name is used by pygount to guess the lexer.
+    """
+    tmpdir = tempfile.mkdtemp(prefix='gierlappen_lloc_')
+    ret = []
+    try:
+        for name, content in files:
+            path = os.path.join(tmpdir, name)
+            with open(path, 'wb') as f:
+                f.write(content)
+            ret.append(SourceAnalysis.from_file(path, 'pygount').code_count)
+            os.remove(path)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return ret
+
+
+def _pre_lint_worker(args, commits):
+    """Lint the commits in a separate worktree, the results are written to the cache database.
+
+    This runs in a separate process, every worker has its own worktree, linter connector
+    and database connection.
+    """
+    log = logging.getLogger('jit.linter')
+    worktree = tempfile.mkdtemp(prefix='gierlappen_lint_')
+
+    wargs = copy.copy(args)
+    wargs.path = worktree
+    wargs.connector = None
+
+    add_worktree(args.path, worktree, commits[0])
+    try:
+        con = LinterConnector(wargs)
+        for num, revision_hash in enumerate(commits):
+            checkout_worktree(worktree, revision_hash)
+            con.run_linter(revision_hash)
+            log.debug('[%s] pre-linted in %s (%s/%s)',
+                      revision_hash, worktree, num + 1, len(commits))
+        con.close()
+    finally:
+        remove_worktree(args.path, worktree)
+        shutil.rmtree(worktree, ignore_errors=True)
+    return len(commits)
 
 
 class LinterConnector():
@@ -16,38 +73,203 @@ class LinterConnector():
         self._args = args
         self._files = {}
         self._wd_cache = {}
+        self._lloc_cache = {}  # blob -> lloc
+        self._blob_reader = None
+        self._lloc_workers = getattr(args, 'lloc_workers', 1) or 1
+        self._profiler = getattr(args, 'profiler', None) or Profiler()
+        self.cache_hits = 0  # commits which did not need to be linted
+        self.cache_misses = 0
+
+        # system level aggregates depend on the files which are included
+        self._filter_key = '{}_{}'.format(args.language, getattr(args, 'production_only', False))
+
+        # filtered warning counts per commit, we only keep the current and parent commit
+        self._counts = {}
+        self._current_hash = None
+        self._parent_hash = None
 
         # todo: reorganize this next
         if self._args.language == 'python':
             self._extension = 'py'
+            self._build_rules = False  # the build only configures rules for PMD
             self._con = PylintConnector(self, args)
         elif self._args.language == 'java':
             self._extension = 'java'
+            self._build_rules = True
             self._con = PMDConnector(self, args)
 
         if not self._input_path.endswith('/'):
             self._input_path += '/'
 
+    def close(self):
+        """Stop the worker processes of the linter and git, called after the traversal."""
+        self._con.stop()
+        if self._blob_reader:
+            self._blob_reader.close()
+            self._blob_reader = None
 
-    def extract_lloc(self):
-        files = {}  # needs to reset here
-        for check in glob.glob('{}/**/*.{}'.format(self._input_path, self._extension), recursive=True):
-            source_analysis = SourceAnalysis.from_file(check, "pygount")
-            relpath = source_analysis.path.replace(self._input_path, '')
-
-            if relpath.startswith('/'):
-                relpath = relpath[1:]
+    def pre_lint(self, need_commits, workers):
+        """Lint all needed commits (and their first parents) which are not yet cached in parallel.
 
-            if relpath not in files.keys():
-                files[relpath] = {'warnings': [], 'lloc': source_analysis.code_count, 'warning_list': []}
+        Lint results only depend on the tree of the commit, so we can do this before the traversal.
+        Every worker uses its own git worktree and writes to the cache database, the traversal
+        then only reads the cached results.
+        """
+        parents = first_parents(self._input_path)
+        commits = set(need_commits)
+        commits.update(parents[c] for c in need_commits if parents.get(c))
+
+        # contiguous ranges in topological order, neighbouring commits share most files
+        # which keeps the worktree checkouts and the PMD cache of every worker small
+        missing = [c for c in topo_order(self._input_path)
+                   if c in commits and not self._con.is_cached(c)]
+        self._log.info('pre-linting %s of %s commits with %s workers',
+                       len(missing), len(commits), workers)
+        if not missing:
+            return
+
+        start = timeit.default_timer()
+        chunks = split(missing, workers)
+        done = 0
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            futures = [executor.submit(_pre_lint_worker, self._args, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                done += future.result()
+                self._log.info('pre-linted %s/%s commits in %.1fs',
+                               done, len(missing), timeit.default_timer() - start)
+
+    def _tree_files(self, commit_hash):
+        """Return dict path -> blob of all files with our extension in the commit.
+
+        Symlinks are resolved inside of the tree.
+        """
+        files = {}
+        links = {}
+        blobs = {}
+        for mode, blob, path in ls_tree(self._input_path, commit_hash):
+            blobs[path] = blob
+            # glob did not include hidden files and directories
+            if not path.endswith('.{}'.format(self._extension)):
+                continue
+            if any(p.startswith('.') for p in path.split('/')):
+                continue
+            if mode == '120000':
+                links[path] = blob
+            else:
+                files[path] = blob
+
+        for path, blob in links.items():
+            link = self._read_blob(blob).decode('utf-8', 'ignore')
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(path), link))
+            if target in blobs.keys():
+                files[path] = blobs[target]
         return files
 
-    def _get_line_numbers(self, modifications, file_name):
-        # find files that only changed in this commit, take the changed lines numbers and compare them with those reported by PMD
-        for _, new_path, _, _, _, _, added_line_numbers, deleted_line_numbers in modifications:
-            if file_name == new_path:
-                return added_line_numbers, deleted_line_numbers
-        return {}, {}
+    def _read_blob(self, blob):
+        if not self._blob_reader:
+            self._blob_reader = BlobReader(self._input_path)
+        return self._blob_reader.read(blob)
+
+    def _update_lloc_cache(self, files):
+        """Make sure the lloc of every blob in files (path -> blob) is in the cache.
+
+        Lookup order is memory, database, then the blob is counted with pygount.
+        """
+        missing = set(files.values()) - set(self._lloc_cache.keys())
+        if not missing:
+            return
+
+        db = self._con.get_db()
+        self._lloc_cache.update(db.get_lloc(missing))
+        missing -= set(self._lloc_cache.keys())
+        if not missing:
+            return
+
+        names = {}
+        for path, blob in files.items():
+            names[blob] = os.path.basename(path)
+        todo = sorted(missing)
+        items = [(names[blob], self._read_blob(blob)) for blob in todo]
+
+        # starting a pool only pays off for a lot of files, e.g., the first commit
+        if self._lloc_workers > 1 and len(items) >= 100:
+            chunks = [items[i::self._lloc_workers] for i in range(self._lloc_workers)]
+            with ProcessPoolExecutor(max_workers=self._lloc_workers) as executor:
+                results = list(executor.map(_count_lloc, chunks))
+            llocs = {}
+            for i, res in enumerate(results):
+                llocs.update(zip(todo[i::self._lloc_workers], res))
+        else:
+            llocs = dict(zip(todo, _count_lloc(items)))
+
+        self._log.debug('counted lloc for %s new blobs', len(llocs))
+        self._lloc_cache.update(llocs)
+        db.save_lloc(llocs)
+
+    def extract_lloc(self, commit_hash):
+        """Return the initial per file dict with the lloc of every file of the commit.
+
+        The lloc is cached per blob and read via git cat-file, we do not need to touch the worktree.
+        """
+        tree = self._tree_files(commit_hash)
+        self._update_lloc_cache(tree)
+        return {path: {'warnings': [], 'lloc': self._lloc_cache[blob], 'warning_list': []}
+                for path, blob in tree.items()}
+
+    def _cached_count(self, commit_hash, key, func):
+        if commit_hash not in self._counts.keys():
+            self._counts[commit_hash] = {}
+        if key not in self._counts[commit_hash].keys():
+            self._counts[commit_hash][key] = func()
+        return self._counts[commit_hash][key]
+
+    def _count_default(self, commit_hash, fname, data):
+        """Number of default rule warnings of the file in the commit."""
+        return self._cached_count(commit_hash, (fname, 'default'),
+                                  lambda: self._con.count_default_warnings(data))
+
+    def _count_effective(self, commit_hash, fname, data, custom_rules_data):
+        """Number of effective rule warnings of the file in the commit for the build."""
+        if not self._build_rules:
+            return self._cached_count(commit_hash, (fname, 'effective'),
+                                      lambda: self._con.count_effective_warnings(data))
+        # no copy, the build hands out frozen rule sets
+        rules = frozenset(custom_rules_data['custom_rules'])
+        key = (fname, 'effective', custom_rules_data['use_pmd'], rules)
+        return self._cached_count(
+            commit_hash, key, lambda: self._con.count_effective_warnings(data, custom_rules_data))
+
+    def _aggregate(self, files):
+        """Sum up warnings, lloc, default warnings and number of the files passing the filter."""
+        agg = {'warnings': 0, 'lloc': 0, 'default_warnings': 0, 'files': 0}
+        for fname in self._args.filter_paths(files.keys()):  # we need the full state, all files
+            pmdval = files[fname]
+            agg['warnings'] += len(pmdval['warnings'])
+            agg['lloc'] += pmdval['lloc']
+            agg['default_warnings'] += self._con.count_default_warnings(pmdval)
+            agg['files'] += 1
+        return agg
+
+    def run_linter(self, commit_hash, paths=None):
+        """Return the system level aggregates, the per file linter results and if they were cached.
+
+        If the aggregates are in the cache only paths are loaded, otherwise the commit is linted
+        (or fully loaded) and the aggregates are saved. If paths is None all files are returned.
+        """
+        db = self._con.get_db()
+        agg = db.get_aggregates(commit_hash, self._filter_key)
+        if agg is not None and paths is not None:
+            return agg, db.get_commit_files(commit_hash, paths), True
+
+        files, cached = self._con.run_linter(commit_hash)
+        if agg is None:
+            agg = self._aggregate(files)
+            # does nothing if linting failed and the commit is not saved
+            db.save_aggregates(commit_hash, self._filter_key, agg)
+
+        if paths is not None:
+            files = {p: files[p] for p in paths if p in files.keys()}
+        return agg, files, cached
 
     def add_commit(self, global_state, commit):
         """Called from tracking, runs PMD on the commit.
@@ -55,49 +277,61 @@ class LinterConnector():
         Also we sadly have to take care of a lot of aggregations here.
         This should be refactored.
         """
-        self._current_warnings = self._con.run_linter(commit.hash)
+        # we only need the files of this commit, for the system level we have the aggregates
+        paths = set()
+        for _, new_path, old_path, _, _, _, _, _ in global_state.modifications:
+            paths.update(p for p in (new_path, old_path) if p)
+
+        # effective warnings need the build information of every file
+        if hasattr(global_state, '_build'):
+            paths = None
+
+        self._current_hash = commit.hash
+        self._parent_hash = commit.parents[0] if commit.parents else None
+        self._counts = {k: v for k, v in self._counts.items()
+                        if k in (self._current_hash, self._parent_hash)}
+
+        with self._profiler.call('run_linter'):
+            current, self._current_warnings, cached = self.run_linter(commit.hash, paths)
+        if cached:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
         self._parent_warnings = {}
 
+        parent = None
         if len(commit.parents) > 0:
-            self._parent_warnings = self._con.run_linter(commit.parents[0])
+            with self._profiler.call('run_linter'):
+                parent, self._parent_warnings, _ = self.run_linter(commit.parents[0], paths)
 
         self._parent_system_wd = 0
-        self._sum_current_warnings = 0
-        self._sum_current_lloc = 0
+        self._sum_current_warnings = current['warnings']
+        self._sum_current_lloc = current['lloc']
         self._added_warning_lines = {}
         self._deleted_warning_lines = {}
-        self._sum_filtered_warnings = 0
+        self._sum_filtered_warnings = current['default_warnings']
         self._parent_system_default_wd = 0
         self._effective_system_wd = 0  # only effective rules, either emtpy, default rules from maven pmd or custom defined rules
         self._parent_effective_system_wd = 0
         self._sum_effective_warnings = 0
-        self._num_files = 0
-        for fname, pmdval in self._current_warnings.items():
-            if self._args.filename_filter(fname): # we need the full state, all files
-                self._sum_current_warnings += len(pmdval['warnings'])
-                self._sum_current_lloc += pmdval['lloc']
-                self._sum_filtered_warnings += len(self._con.filter_default_warnings(pmdval['warnings']))
-                self._num_files += 1
-                if hasattr(global_state, '_build'):
-                    self._sum_effective_warnings += len(self._con.filter_effective_warnings(pmdval['warnings'], global_state._build.get_file_metrics(fname)))
-
-                added_line_numbers, _ = self._get_line_numbers(global_state.modifications, fname)
-                if fname not in self._added_warning_lines.keys():
-                    self._added_warning_lines[fname] = []
-                for w in pmdval['warning_list']:
-                    if int(w['Line']) in added_line_numbers:
-                        self._added_warning_lines[fname].append(w['Rule'])
-
-        # now we want the deleted warnings
-        for fname, pmdval in self._parent_warnings.items():
-            if self._args.filename_filter(fname):
-
-                _, deleted_line_numbers = self._get_line_numbers(global_state.modifications, fname)
-                if fname not in self._deleted_warning_lines.keys():
-                    self._deleted_warning_lines[fname] = []
-                for w in pmdval['warning_list']:
-                    if int(w['Line']) in deleted_line_numbers:
-                        self._deleted_warning_lines[fname].append(w['Rule'])
+        self._num_files = current['files']
+        if hasattr(global_state, '_build'):
+            for fname, pmdval in self._current_warnings.items():
+                if self._args.filename_filter(fname):
+                    build = global_state._build.get_file_metrics(fname)
+                    self._sum_effective_warnings += self._count_effective(commit.hash, fname,
+                                                                          pmdval, build)
+
+        # only modified files can have added or deleted warnings
+        for fname, (added, deleted) in global_state.modified_lines.items():
+            if fname in self._current_warnings.keys() and self._args.filename_filter(fname):
+                warning_list = self._current_warnings[fname]['warning_list']
+                self._added_warning_lines[fname] = [w['Rule'] for w in warning_list
+                                                    if int(w['Line']) in added]
+            if fname in self._parent_warnings.keys() and self._args.filename_filter(fname):
+                warning_list = self._parent_warnings[fname]['warning_list']
+                self._deleted_warning_lines[fname] = [w['Rule'] for w in warning_list
+                                                      if int(w['Line']) in deleted]
 
         wd = 0
         if self._sum_current_lloc > 0:
@@ -112,10 +346,13 @@ class LinterConnector():
         self._wd_cache[commit.hash] = (wd, self._sum_current_warnings, self._current_system_default_wd, self._effective_system_wd)
 
         if commit.parents:
-            self._parent_system_wd = self._wd_cache[commit.parents[0]][0]
-            self._parent_warning_sum = self._wd_cache[commit.parents[0]][1]
-            self._parent_system_default_wd = self._wd_cache[commit.parents[0]][2]
-            self._parent_effective_system_wd = self._wd_cache[commit.parents[0]][3]
+            self._parent_warning_sum = parent['warnings']
+            if parent['lloc'] > 0:
+                self._parent_system_wd = parent['warnings'] / parent['lloc']
+                self._parent_system_default_wd = parent['default_warnings'] / parent['lloc']
+            # effective warnings are not in the aggregates, they depend on the build information
+            if commit.parents[0] in self._wd_cache.keys():
+                self._parent_effective_system_wd = self._wd_cache[commit.parents[0]][3]
 
         # authors change in warning density, independent of files, we need only the change
         author = global_state.get_author(commit)
@@ -175,9 +412,13 @@ class LinterConnector():
             tmp['linter_warning_list'] = self._current_warnings[original_name]['warnings']
             if self._current_warnings[original_name]['lloc']:
                 tmp['current_WD'] = tmp['linter_warnings'] / self._current_warnings[original_name]['lloc']
-                tmp['current_default_WD'] = len(self._con.filter_default_warnings(self._current_warnings[original_name]['warnings'])) / self._current_warnings[original_name]['lloc']
+                current = self._current_warnings[original_name]
+                tmp['current_default_WD'] = self._count_default(self._current_hash, original_name,
+                                                                current) / current['lloc']
                 if hasattr(global_state, '_build'):  # this only works if we have the build information about custom rules
-                    tmp['current_effective_WD'] = len(self._con.filter_effective_warnings(self._current_warnings[original_name]['warnings'], global_state._build.get_file_metrics(original_name))) / self._current_warnings[original_name]['lloc']
+                    build = global_state._build.get_file_metrics(original_name)
+                    tmp['current_effective_WD'] = self._count_effective(self._current_hash, original_name,
+                                                                        current, build) / current['lloc']
 
         # no parent for effective and default because we do not have the build information of the parent at hand
         if self._parent_system_wd:
@@ -185,7 +426,9 @@ class LinterConnector():
             tmp['parent_system_warning_sum'] = self._parent_warning_sum
             if original_name in self._parent_warnings.keys() and self._parent_warnings[original_name]['lloc']:
                 tmp['parent_WD'] = len(self._parent_warnings[original_name]['warnings']) / self._parent_warnings[original_name]['lloc']
-                tmp['parent_default_WD'] = len(self._con.filter_default_warnings(self._parent_warnings[original_name]['warnings'])) / self._parent_warnings[original_name]['lloc']
+                parent = self._parent_warnings[original_name]
+                tmp['parent_default_WD'] = self._count_default(self._parent_hash, original_name,
+                                                               parent) / parent['lloc']
 
         if self._current_system_wd:
             # we may have to create these
@@ -16,6 +16,8 @@ from pygount import SourceAnalysis
 from pycoshark.utils import java_filename_filter
 
 from adapters.sqlite import SQLiteDatabaseAdapter
+from connectors.pmd_worker import PMDWorker, PMDWorkerError
+from connectors.rule_filter import RuleFilter
 #from adapters.postgres import PostgresDatabaseAdapter
 from const import MVN_DEFAULT
 
@@ -30,6 +32,7 @@ class PMDConnector():
         self._args = args
         self._con = con
         self._files = {}
+        self._default_rules = frozenset(MVN_DEFAULT)
 
         if not self._input_path.endswith('/'):
             self._input_path += '/'
@@ -40,57 +43,91 @@ class PMDConnector():
 
         # SQLITE = DEFAULT, also for tests
         self._db = SQLiteDatabaseAdapter(args)
+        self._rule_filter = RuleFilter(self._db.rule_dictionary)
+
+        # one persistent JVM for all commits, if that does not work we fall back to run.sh
+        self._worker = None
+        if getattr(args, 'pmd_worker', False):
+            worker = PMDWorker(self._pmd_path)
+            if worker.start():
+                self._worker = worker
 
         # if we have pg_sql username we connect
         #if args.pg_user:
         #    self._db = PostgresDatabaseAdapter(args)
 
-    def filter_default_warnings(self, warnings):
-        """Return only maven pmd plugin default warnings."""
-        filtered = []
-        for w in warnings:
-            if w in MVN_DEFAULT:
-                filtered.append(w)
-        return filtered
-
-    def filter_effective_warnings(self, warnings, custom_rules_data):
-        """Return only maven pmd plugin default warnings."""
-        filtered = []
+    def count_default_warnings(self, data):
+        """Return the number of maven pmd plugin default warnings of the file data."""
+        return self._rule_filter.count(data, self._default_rules)
+
+    def count_effective_warnings(self, data, custom_rules_data):
+        """Return the number of warnings of the file data for the effective rules of the build."""
         if not custom_rules_data['use_pmd']:
-            return filtered
+            return 0
+        return self._rule_filter.count(data, custom_rules_data['custom_rules'])
+
+    def stop(self):
+        """Stop the PMD worker JVM if we have one."""
+        if self._worker:
+            self._worker.stop()
+            self._worker = None
+
+    def _run_pmd(self, pmd_args):
+        """Run PMD in the persistent worker if we have one, otherwise start a new PMD process."""
+        if self._worker:
+            try:
+                returncode, stdout = self._worker.run(pmd_args)
+                return returncode, stdout, b''
+            except PMDWorkerError as e:
+                self._log.warning('PMD worker failed, falling back to run.sh: %s', e)
+                self.stop()
+
+        cmds = ['{}/bin/run.sh'.format(self._pmd_path), 'pmd'] + pmd_args
+        r = subprocess.run(cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=self._input_path)
+        return r.returncode, r.stdout, r.stderr
 
-        custom_rules = custom_rules_data['custom_rules']
-        for w in warnings:
-            if w in custom_rules:
-                filtered.append(w)
-        return filtered
+    def get_db(self):
+        """Return the database adapter of the linter results."""
+        return self._db
+
+    def is_cached(self, commit_hash):
+        """Return True if the linter results of the commit are already cached."""
+        return self._db.has_commit(commit_hash)
 
     def run_linter(self, commit_hash):
-        """Check out the given commit, then run pmd and pygount on all files."""
+        """Check out the given commit, then run pmd and pygount on all files.
+
+        Returns the files and if they were already cached.
+        """
         data = self._db.get_commit(commit_hash)
         if data:
-            return data
+            return data, True
 
-        cmds = ['{}/bin/run.sh'.format(self._pmd_path), 'pmd', '-d', self._input_path, '-f', 'csv', '-cache', '{}'.format(self._cache_file), '-R', '{}/all_rules.xml'.format(self._pmd_path)]
+        pmd_args = ['-d', self._input_path, '-f', 'csv', '-cache', '{}'.format(self._cache_file),
+                    '-R', '{}/all_rules.xml'.format(self._pmd_path)]
 
-        r = subprocess.run(cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=self._input_path)
+        returncode, stdout, stderr = self._run_pmd(pmd_args)
 
-        if r.returncode != 0 and r.returncode != 4:
-            self._log.error('error running pmd %s', (r.stderr.decode('utf-8')))
-            return self._files
+        if returncode != 0 and returncode != 4:
+            self._log.error('error running pmd %s', (stderr.decode('utf-8')))
+            return self._files, False
 
-        reader = csv.DictReader(r.stdout.decode('utf-8').splitlines(), quoting=csv.QUOTE_ALL)
+        reader = csv.DictReader(stdout.decode('utf-8').splitlines(), quoting=csv.QUOTE_ALL)
 
         # extract lloc
-        self._files = self._con.extract_lloc()
+        self._files = self._con.extract_lloc(commit_hash)
 
         for line in reader:
             relpath = line['File'].replace(self._input_path, '')
             if relpath.startswith('/'):
                 relpath = relpath[1:]
 
-            if relpath not in self._files.keys():  # this is critical, we are missing something
-                raise Exception('{} not in {}'.format(relpath, self._files.keys()))
+            # PMD scans the worktree, files which are not in the tree of the commit
+            # (e.g., untracked) are not part of it
+            if relpath not in self._files.keys():
+                self._log.debug('[%s] skipping PMD warning for %s, it is not in the tree',
+                                commit_hash, relpath)
+                continue
 
             # files has to exist because of lloc
             self._files[relpath]['warnings'].append(line['Rule'])
@@ -102,4 +139,4 @@ class PMDConnector():
         # self._cache[commit.hash] = self._files  # deepcopy?
         self._db.save_commit(commit_hash, self._files)
 
-        return self._files
+        return self._files, False
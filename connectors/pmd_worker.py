@@ -0,0 +1,116 @@
+"""Long-lived PMD process which is reused for every commit of a traversal.
+
+Starting the JVM for every commit via run.sh adds a lot of fixed overhead.
+The worker (checks/pmd_worker/PMDWorker.java) keeps one JVM running and reads
+PMD command lines from stdin, the report is written into a temporary file.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import logging
+
+WORKER_SOURCE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
+                                             'checks', 'pmd_worker', 'PMDWorker.java'))
+
+
+class PMDWorkerError(Exception):
+    """The PMD worker process could not be started or died."""
+
+
+class PMDWorker():
+    """Runs PMD inside of one persistent JVM."""
+
+    # seconds the JVM gets to exit after stdin is closed before it is killed
+    STOP_TIMEOUT = 30
+
+    def __init__(self, pmd_path):
+        self._pmd_path = pmd_path
+        self._log = logging.getLogger('jit.linter.pmd.worker')
+        self._proc = None
+        self._report_file = None
+        self._stderr_file = None
+
+    def start(self):
+        """Start the JVM.
+
+        Returns False if that is not possible so that the caller can fall back to run.sh.
+        """
+        java = shutil.which('java')
+        if not java or not os.path.isfile(WORKER_SOURCE):
+            self._log.warning('java or %s not found, can not start PMD worker', WORKER_SOURCE)
+            return False
+
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.csv') as f:
+            self._report_file = f.name
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.log') as f:
+            self._stderr_file = f.name
+
+        cmds = [java, '-cp', '{}/lib/*'.format(self._pmd_path), WORKER_SOURCE]
+        with open(self._stderr_file, 'wb') as stderr:
+            self._proc = subprocess.Popen(cmds, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          stderr=stderr)
+
+        try:
+            self._read_until('PMDWORKER_READY')
+        except PMDWorkerError as e:
+            self._log.warning('PMD worker did not start: %s', e)
+            self.stop()
+            return False
+        self._log.info('started PMD worker (pid %s)', self._proc.pid)
+        return True
+
+    def stop(self):
+        """Stop the JVM and remove the report and stderr files."""
+        if self._proc:
+            self._proc.stdin.close()
+            try:
+                self._proc.wait(timeout=self.STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self._log.warning('PMD worker (pid %s) did not exit, killing it', self._proc.pid)
+                self._proc.kill()
+                self._proc.wait()
+            self._proc = None
+
+        for name in (self._report_file, self._stderr_file):
+            if name and os.path.exists(name):
+                os.remove(name)
+        self._report_file = None
+        self._stderr_file = None
+
+    def _stderr(self):
+        with open(self._stderr_file, 'rb') as f:
+            return f.read().decode('utf-8', 'ignore')
+
+    def _read_until(self, needle):
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                raise PMDWorkerError('PMD worker exited with {}: {}'.format(self._proc.poll(),
+                                                                            self._stderr()))
+            line = line.decode('utf-8', 'ignore').strip()
+            if line.startswith(needle):
+                return line[len(needle):].strip()
+
+    def run(self, args):
+        """Run PMD with the given arguments (without -r).
+
+        Returns the exit code and the report like subprocess.run would.
+        """
+        if not self._proc:
+            raise PMDWorkerError('PMD worker is not running')
+
+        # truncate last report
+        open(self._report_file, 'w', encoding='utf-8').close()
+
+        try:
+            line = '\t'.join(args + ['-r', self._report_file]) + '\n'
+            self._proc.stdin.write(line.encode('utf-8'))
+            self._proc.stdin.flush()
+        except BrokenPipeError as e:
+            raise PMDWorkerError('PMD worker exited: {}'.format(self._stderr())) from e
+
+        status = int(self._read_until('PMDWORKER_DONE'))
+        with open(self._report_file, 'rb') as f:
+            return status, f.read()
@@ -0,0 +1,70 @@
+"""POM namespace, errors and parse helpers which are shared by PomPom and the PomResolver."""
+from lxml import etree
+
+POM_NS = {'m' : 'http://maven.apache.org/POM/4.0.0'}
+
+
+class PomPomError(Exception):
+    """Encapsulate and differntiate between possible PomPom errors.
+
+    We need to know what error was due to missing parent, parse errors etc.
+    """
+    def __init__(self, output):
+        self.output = output
+        self.type = 'unknown'
+        self.line = ''
+
+        error_types = {
+            'unknown': None,
+            'version_missing': 'dependencies.dependency.version',
+            'plugin_missing': 'Plugin not found in any plugin repository',
+            'unique': 'duplicate declaration of version',
+            'parse': 'Non-parseable POM',
+            'parent': 'Non-resolvable parent POM for',
+            'malformed': 'Malformed POM',
+            'buildext': 'Unresolvable build extension',
+            'child': 'Child module',
+            'unknown_packaging': 'Unknown packaging',
+        }
+
+        for k, v in error_types.items():
+            if v and v in output:
+                self.type = k
+
+        for line in output.split('\n'):
+            if error_types[self.type] and error_types[self.type] in line:
+                self.line = line
+
+        super().__init__('mvn help:effective-pom error')
+
+
+def get_modules(xml):
+    """Return the module names of the parsed POM."""
+    module_names = []
+    modules = xml.xpath('m:modules/m:module', namespaces=POM_NS)
+    for module in modules:
+        module_names.append(module.text)
+    return module_names
+
+
+def get_parent_artifact(xml):
+    """Return the artifactId of the parent of the parsed POM or an empty string."""
+    artifact_id = ''
+    parent = xml.xpath('m:parent', namespaces=POM_NS)
+    if not parent:
+        return artifact_id
+    artifact = parent[0].find('m:artifactId', namespaces=POM_NS)
+    if artifact is not None:
+        artifact_id = artifact.text
+    return artifact_id
+
+
+def parse_pom(filepath):
+    """Parse the POM file, invalid utf-8 is ignored."""
+    with open(filepath, 'rb') as f:
+        return parse_pom_data(f.read())
+
+
+def parse_pom_data(data):
+    """Parse the POM from bytes, invalid utf-8 is ignored."""
+    return etree.fromstring(data.decode('utf-8', 'ignore').encode('utf-8'))
@@ -0,0 +1,342 @@
+"""In-process creation of effective POMs for local builds.
+
+Used by PomPom instead of mvn if possible.
+"""
+import os
+import re
+import copy
+
+from lxml import etree
+
+from connectors.pom import POM_NS, PomPomError, parse_pom, get_modules, get_parent_artifact
+
+
+class ResolverError(Exception):
+    """The POM can not be resolved in-process, e.g., because its parent is not in the repository."""
+
+
+class PomResolver():
+    """Creates the effective POM of a local build in-process with lxml.
+
+    We only need plugin configurations, rulesets and source directories from the effective POM.
+    This merges local parent and module POMs, applies profiles which are active by default,
+    resolves properties and sets the source directory defaults of the super POM.
+    The output has the format of mvn help:effective-pom so that parse_ident and parse_effective_pom
+    work unchanged, everything that needs a remote repository raises ResolverError.
+    """
+
+    # elements which are not inherited from the parent
+    NOT_INHERITED = {'artifactId', 'modules', 'parent', 'packaging', 'profiles', 'prerequisites'}
+    PLUGIN_GROUP = 'org.apache.maven.plugins'
+    PROPERTY = re.compile(r'\$\{([^}]+)\}')
+
+    def __init__(self):
+        self._models = {}  # pom path -> model merged with its parents, properties are not resolved
+        self._resolving = set()
+
+    def _tag(self, name):
+        return '{%s}%s' % (POM_NS['m'], name)
+
+    def _name(self, el):
+        return etree.QName(el).localname
+
+    def _text(self, el, path):
+        found = el.find(path, namespaces=POM_NS)
+        if found is None or not found.text:
+            return None
+        return found.text
+
+    def _inherited_text(self, model, name):
+        """Text of the coordinate (groupId, version) of the model, it may be inherited from the parent."""
+        return self._text(model, 'm:' + name) or self._text(model, 'm:parent/m:' + name)
+
+    def _normalize(self, el):
+        """Return a copy of the element without comments and with every tag in the POM namespace.
+
+        Old POMs do not have a namespace.
+        """
+        new = etree.Element(self._tag(self._name(el)), attrib=dict(el.attrib),
+                            nsmap={None: POM_NS['m']})
+        if el.text and el.text.strip():
+            new.text = el.text.strip()
+        for child in el:
+            if isinstance(child.tag, str):
+                new.append(self._normalize(child))
+        return new
+
+    def _read(self, pom_file):
+        try:
+            return self._normalize(parse_pom(pom_file))
+        except etree.XMLSyntaxError as e:
+            raise PomPomError('[ERROR] Non-parseable POM {}: {}'.format(pom_file, e)) from e
+
+    def _plugin_key(self, plugin):
+        return '{}:{}'.format(self._text(plugin, 'm:groupId') or self.PLUGIN_GROUP,
+                              self._text(plugin, 'm:artifactId'))
+
+    def _merge_dom(self, recessive, dominant):
+        """Merge plugin configurations like Maven (Xpp3Dom), the dominant values win."""
+        result = copy.deepcopy(dominant)
+        if dominant.get('combine.self') == 'override':
+            return result
+        if not len(result) and not result.text:
+            result.text = recessive.text
+
+        if dominant.get('combine.children') == 'append':
+            for child in recessive:
+                result.append(copy.deepcopy(child))
+            return result
+
+        for name in dict.fromkeys(self._name(child) for child in recessive):
+            recessive_children = [child for child in recessive if self._name(child) == name]
+            dominant_children = [child for child in result if self._name(child) == name]
+            if not dominant_children:
+                for child in recessive_children:
+                    result.append(copy.deepcopy(child))
+            for rchild, dchild in zip(recessive_children, dominant_children):
+                result.replace(dchild, self._merge_dom(rchild, dchild))
+        return result
+
+    def _merge_plugin(self, recessive, dominant):
+        result = copy.deepcopy(recessive)
+        for el in dominant:
+            name = self._name(el)
+            existing = result.find('m:' + name, namespaces=POM_NS)
+            if existing is None:
+                result.append(copy.deepcopy(el))
+            elif name == 'configuration':
+                result.replace(existing, self._merge_dom(existing, el))
+            elif name in ['executions', 'dependencies']:
+                for item in el:
+                    existing.append(copy.deepcopy(item))
+            else:
+                result.replace(existing, copy.deepcopy(el))
+        return result
+
+    def _merge_plugins(self, recessive, dominant, inherit):
+        """Merge two <plugins> elements by groupId:artifactId."""
+        plugins = {}
+        if recessive is not None:
+            for plugin in recessive:
+                if inherit and self._text(plugin, 'm:inherited') == 'false':
+                    continue
+                plugins[self._plugin_key(plugin)] = copy.deepcopy(plugin)
+        for plugin in dominant:
+            k = self._plugin_key(plugin)
+            if k in plugins.keys():
+                plugins[k] = self._merge_plugin(plugins[k], plugin)
+            else:
+                plugins[k] = copy.deepcopy(plugin)
+
+        result = etree.Element(self._tag('plugins'))
+        for plugin in plugins.values():
+            result.append(plugin)
+        return result
+
+    def _merge_section(self, recessive, dominant, inherit):
+        """Merge <build> or <reporting>, plugins are merged, everything else is replaced."""
+        if recessive is None:
+            return copy.deepcopy(dominant)
+        result = copy.deepcopy(recessive)
+        for el in dominant:
+            name = self._name(el)
+            existing = result.find('m:' + name, namespaces=POM_NS)
+            if name == 'plugins':
+                new = self._merge_plugins(existing, el, inherit)
+            elif name == 'pluginManagement' and existing is not None and \
+                    el.find('m:plugins', namespaces=POM_NS) is not None:
+                new = etree.Element(self._tag('pluginManagement'))
+                new.append(self._merge_plugins(existing.find('m:plugins', namespaces=POM_NS),
+                                               el.find('m:plugins', namespaces=POM_NS), inherit))
+            else:
+                new = copy.deepcopy(el)
+            if existing is not None:
+                result.replace(existing, new)
+            else:
+                result.append(new)
+        return result
+
+    def _inject(self, model, content, inherit):
+        """Merge the elements of content (child POM or profile) into model, content wins."""
+        for el in content:
+            name = self._name(el)
+            existing = model.find('m:' + name, namespaces=POM_NS)
+            if name == 'properties' and existing is not None:
+                for prop in el:
+                    old = existing.find('m:' + self._name(prop), namespaces=POM_NS)
+                    if old is not None:
+                        existing.remove(old)
+                    existing.append(copy.deepcopy(prop))
+                continue
+
+            if name in ['build', 'reporting']:
+                new = self._merge_section(existing, el, inherit)
+            elif name in ['dependencies', 'modules'] and existing is not None:
+                new = copy.deepcopy(existing)
+                for item in el:
+                    new.append(copy.deepcopy(item))
+            else:
+                new = copy.deepcopy(el)
+
+            if existing is not None:
+                model.replace(existing, new)
+            else:
+                model.append(new)
+
+    def _parent_file(self, pom_file, model):
+        """Return the path of the local parent POM.
+
+        Maven looks at relativePath (default ../pom.xml) and checks the coordinates.
+        """
+        parent = model.find('m:parent', namespaces=POM_NS)
+        group_id = self._text(parent, 'm:groupId')
+        artifact_id = get_parent_artifact(model)
+        version = self._text(parent, 'm:version')
+
+        relative_path = '../pom.xml'
+        rnode = parent.find('m:relativePath', namespaces=POM_NS)
+        if rnode is not None:
+            relative_path = rnode.text
+        if relative_path:
+            path = os.path.normpath(os.path.join(os.path.dirname(pom_file), relative_path))
+            if os.path.isdir(path):
+                path = os.path.join(path, 'pom.xml')
+            if os.path.isfile(path):
+                candidate = self._read(path)
+                coordinates = (self._inherited_text(candidate, 'groupId'),
+                               self._text(candidate, 'm:artifactId'),
+                               self._inherited_text(candidate, 'version'))
+                if coordinates == (group_id, artifact_id, version):
+                    return path
+        raise ResolverError('parent {}:{}:{} of {} is not in the repository'.format(
+            group_id, artifact_id, version, pom_file))
+
+    def _model(self, pom_file):
+        if pom_file in self._models.keys():
+            return self._models[pom_file]
+        if pom_file in self._resolving:
+            raise ResolverError('parents of {} form a cycle'.format(pom_file))
+        self._resolving.add(pom_file)
+
+        raw = self._read(pom_file)
+
+        # profiles which are active by default
+        active = 'm:profiles/m:profile[m:activation/m:activeByDefault = "true"]'
+        for profile in raw.xpath(active, namespaces=POM_NS):
+            self._inject(raw, [el for el in profile if self._name(el) not in ['id', 'activation']],
+                         inherit=False)
+
+        if raw.find('m:parent', namespaces=POM_NS) is not None:
+            parent = self._model(self._parent_file(pom_file, raw))
+            model = etree.Element(self._tag('project'), nsmap={None: POM_NS['m']})
+            for el in parent:
+                if self._name(el) not in self.NOT_INHERITED:
+                    model.append(copy.deepcopy(el))
+            self._inject(model, raw, inherit=True)
+        else:
+            model = raw
+
+        self._resolving.remove(pom_file)
+        self._models[pom_file] = model
+        return model
+
+    def _interpolate(self, value, properties):
+        for _ in range(10):  # properties can refer to other properties
+            new = self.PROPERTY.sub(lambda m: properties.get(m.group(1), m.group(0)), value)
+            if new == value:
+                break
+            value = new
+        return value
+
+    def _set_default(self, parent, name, value):
+        el = parent.find('m:' + name, namespaces=POM_NS)
+        if el is None:
+            el = etree.SubElement(parent, self._tag(name))
+        if not el.text:
+            el.text = value
+        return el
+
+    def _effective(self, pom_file):
+        model = copy.deepcopy(self._model(pom_file))
+        basedir = os.path.dirname(pom_file)
+
+        # coordinates are inherited from the parent element
+        self._set_default(model, 'groupId', self._text(model, 'm:parent/m:groupId'))
+        self._set_default(model, 'version', self._text(model, 'm:parent/m:version'))
+
+        # super POM defaults
+        build = model.find('m:build', namespaces=POM_NS)
+        if build is None:
+            build = etree.SubElement(model, self._tag('build'))
+        self._set_default(build, 'sourceDirectory', 'src/main/java')
+        self._set_default(build, 'testSourceDirectory', 'src/test/java')
+
+        properties = {'env.' + k: v for k, v in os.environ.items()}
+        for prop in model.xpath('m:properties/*', namespaces=POM_NS):
+            properties[self._name(prop)] = prop.text or ''
+        project = {'groupId': self._text(model, 'm:groupId'),
+                   'artifactId': self._text(model, 'm:artifactId'),
+                   'version': self._text(model, 'm:version'),
+                   'packaging': self._text(model, 'm:packaging') or 'jar',
+                   'name': self._text(model, 'm:name'),
+                   'basedir': basedir,
+                   'build.directory': os.path.join(basedir, 'target'),
+                   'parent.groupId': self._text(model, 'm:parent/m:groupId'),
+                   'parent.artifactId': self._text(model, 'm:parent/m:artifactId'),
+                   'parent.version': self._text(model, 'm:parent/m:version')}
+        for k, v in project.items():
+            if v is not None:
+                properties['project.' + k] = v
+                properties['pom.' + k] = v
+        properties['basedir'] = basedir
+
+        for el in model.iter():
+            if el.text:
+                el.text = self._interpolate(el.text, properties)
+
+        # source directories are absolute in the effective pom
+        for name in ['sourceDirectory', 'testSourceDirectory']:
+            el = build.find('m:' + name, namespaces=POM_NS)
+            if not os.path.isabs(el.text):
+                el.text = os.path.join(basedir, el.text)
+
+        # pluginManagement configures the plugins of the build
+        managed = build.xpath('m:pluginManagement/m:plugins/m:plugin', namespaces=POM_NS)
+        managed = {self._plugin_key(plugin): plugin for plugin in managed}
+        for plugin in build.xpath('m:plugins/m:plugin', namespaces=POM_NS):
+            k = self._plugin_key(plugin)
+            if k in managed.keys():
+                plugin.getparent().replace(plugin, self._merge_plugin(managed[k], plugin))
+
+        for plugin in model.iter(self._tag('plugin')):
+            if plugin.find('m:groupId', namespaces=POM_NS) is None:
+                group = etree.Element(self._tag('groupId'))
+                group.text = self.PLUGIN_GROUP
+                plugin.insert(0, group)
+        return model
+
+    def _collect(self, pom_file, projects):
+        if pom_file in projects.keys():
+            return
+        projects[pom_file] = self._effective(pom_file)
+        for module in get_modules(self._model(pom_file)):
+            path = os.path.normpath(os.path.join(os.path.dirname(pom_file), module))
+            if os.path.isdir(path):
+                path = os.path.join(path, 'pom.xml')
+            if not os.path.isfile(path):
+                raise PomPomError('[ERROR] Child module {} of {} does not exist'.format(
+                    path, pom_file))
+            self._collect(path, projects)
+
+    def effective_pom(self, pom_file):
+        """Return the effective POM of pom_file and its modules like mvn help:effective-pom."""
+        projects = {}
+        self._collect(os.path.abspath(pom_file), projects)
+
+        if len(projects) == 1:
+            root = list(projects.values())[0]
+        else:
+            root = etree.Element('projects')
+            for project in projects.values():
+                root.append(project)
+        return b'<?xml version="1.0" encoding="UTF-8"?>\n' + etree.tostring(root, pretty_print=True)
@@ -10,6 +10,8 @@ import logging
 import json
 
 from adapters.sqlite import SQLiteDatabaseAdapter
+from connectors.pylint_worker import PylintWorker
+from util.git import ls_tree
 
 
 class PylintConnector():
@@ -29,20 +31,64 @@ class PylintConnector():
         # connect to db (should be values from config object)
         self._db = SQLiteDatabaseAdapter(args)
 
-    def filter_effective_warnings(self, warnings, custom_rules_data):
-        """We skip this for now."""
+        # pylint in one persistent process which only lints files with new blobs
+        self._worker = None
+        if getattr(args, 'pylint_inprocess', False):
+            self._worker = PylintWorker()
+
+    def count_effective_warnings(self, data):
+        """Return the number of warnings of the file data.
+
+        The build only configures rules for PMD, so every warning is effective.
+        """
+        return len(data['warnings'])
+
+    def count_default_warnings(self, data):
+        """Return the number of warnings of the file data.
+
+        Pylint has no default rule set, so every warning counts.
+        """
+        return len(data['warnings'])
+
+    def get_db(self):
+        """Return the database adapter of the linter results."""
+        return self._db
+
+    def is_cached(self, commit_hash):
+        """Return True if the linter results of the commit are already cached."""
+        return self._db.has_commit(commit_hash)
+
+    def stop(self):
+        """Stop the pylint worker process if we have one."""
+        if self._worker:
+            self._worker.stop()
+            self._worker = None
+
+    def _run_worker(self, commit_hash):
+        """Lint all python files of the checked out commit in the worker process.
+
+        Returns None if that fails.
+        """
+        files = [(path, blob) for _, blob, path in ls_tree(self._input_path, commit_hash)
+                 if path.endswith('.py')]
+        self._log.debug('running linter pylint in worker for %s files in %s',
+                        len(files), self._input_path)
+        try:
+            ret = self._worker.lint(self._input_path, files)
+        except Exception as e:
+            self._log.warning('pylint worker failed, falling back to pylint process: %s', e)
+            return None
+
+        warnings = []
+        for path, _ in files:
+            warnings += ret[path]
         return warnings
 
-    def filter_default_warnings(self, warnings):
-        """We skip this for now"""
-        return warnings
-
-    def run_linter(self, commit_hash):
-        """Execute the linter, report back the results"""
-        data = self._db.get_commit(commit_hash)
-        if data:
-            return data
+    def _run_process(self):
+        """Lint all python files of the checked out commit with a pylint process.
 
+        Returns None if that fails.
+        """
         cmds = ['pylint', '-s', 'n', '-f', 'json', './**/*.py']
         self._log.debug('running linter pylint in %s', self._input_path)
         r = subprocess.run(' '.join(cmds), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=self._input_path)
@@ -51,16 +97,38 @@ class PylintConnector():
         if r.returncode == 32:
             self._log.error(' '.join(cmds))
             self._log.error('error running pylint: %s, exit code: %s, stdout: %s', r.stderr.decode('utf-8'), r.returncode, r.stdout.decode('utf-8'))
-            return self._files
+            return None
+
+        return json.loads(r.stdout.decode('utf-8'))
+
+    def run_linter(self, commit_hash):
+        """Execute the linter, report back the results.
+
+        Returns the files and if they were already cached.
+        """
+        data = self._db.get_commit(commit_hash)
+        if data:
+            return data, True
+
+        warnings = None
+        if self._worker:
+            warnings = self._run_worker(commit_hash)
 
-        warnings = json.loads(r.stdout.decode('utf-8'))
+        if warnings is None:
+            warnings = self._run_process()
+        if warnings is None:
+            return self._files, False
 
-        self._files = self._con.extract_lloc()
+        self._files = self._con.extract_lloc(commit_hash)
 
         for w in warnings:
 
-            if w['path'] not in self._files.keys():  # this is critical, we are missing something
-                raise Exception('{} not in {}'.format(w['path'], self._files.keys()))
+            # pylint lints the worktree, files which are not in the tree of the commit
+            # (e.g., untracked) are not part of it
+            if w['path'] not in self._files.keys():
+                self._log.debug('[%s] skipping pylint warning for %s, it is not in the tree',
+                                commit_hash, w['path'])
+                continue
 
             # for consistency with PMD we simple add some aliases into the json
             w['Rule'] = w['message-id']
@@ -70,4 +138,4 @@ class PylintConnector():
 
         self._db.save_commit(commit_hash, self._files)
 
-        return self._files
+        return self._files, False
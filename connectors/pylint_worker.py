@@ -0,0 +1,123 @@
+"""In-process Pylint runner which lives in a separate process for the whole traversal.
+
+Running pylint via the shell for every commit re-imports pylint and re-parses every module.
+The worker keeps pylint (and the astroid cache) loaded and caches the warnings per file blob,
+only files with new blobs are linted again.
+
+Warnings which depend on other modules (e.g., duplicate-code) are only re-computed
+if the file itself changes.
+"""
+
+import os
+import io
+import json
+import logging
+import multiprocessing
+
+
+def _invalidate_astroid(paths):
+    """Remove stale ASTs of the changed files from the astroid cache."""
+    import astroid
+
+    paths = set(paths)
+    for name, module in list(astroid.MANAGER.astroid_cache.items()):
+        if getattr(module, 'file', None) in paths:
+            del astroid.MANAGER.astroid_cache[name]
+
+
+def _lint(input_path, paths):
+    """Run pylint on paths (relative to input_path) in this process.
+
+    Returns dict path -> warnings.
+    """
+    from pylint.lint import Run
+    from pylint.reporters import JSONReporter
+
+    ret = {path: [] for path in paths}
+    if not paths:
+        return ret
+
+    os.chdir(input_path)
+    _invalidate_astroid([os.path.join(input_path, path) for path in paths])
+
+    out = io.StringIO()
+    Run(['-s', 'n'] + list(paths), reporter=JSONReporter(out), exit=False)
+
+    for w in json.loads(out.getvalue() or '[]'):
+        if w['path'] not in ret.keys():
+            ret[w['path']] = []
+        ret[w['path']].append(w)
+    return ret
+
+
+def _worker_main(conn):
+    """Loop of the worker process.
+
+    Receives (input_path, [(path, blob)]) and sends back dict path -> warnings.
+    """
+    blob_cache = {}
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+
+        input_path, files = msg
+        try:
+            new_files = {path: blob for path, blob in files if blob not in blob_cache.keys()}
+            for path, warnings in _lint(input_path, sorted(new_files.keys())).items():
+                if path in new_files.keys():
+                    blob_cache[new_files[path]] = warnings
+
+            ret = {}
+            for path, blob in files:
+                # the same blob can be at another path (copy, rename)
+                ret[path] = [dict(w, path=path) for w in blob_cache[blob]]
+            conn.send((True, ret))
+        except Exception as e:  # send the error back instead of dying silently
+            conn.send((False, repr(e)))
+
+
+class PylintWorker():
+    """Parent side of the worker process."""
+
+    # seconds between checks if the worker process is still alive while we wait for the result
+    POLL_INTERVAL = 1
+
+    def __init__(self):
+        self._log = logging.getLogger('jit.linter.pylint.worker')
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._proc = multiprocessing.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self._proc.start()
+        # only the worker holds the other end, if it dies recv raises EOFError instead of blocking
+        child_conn.close()
+        self._log.info('started pylint worker (pid %s)', self._proc.pid)
+
+    def lint(self, input_path, files):
+        """Lint files, a list of (path, blob), in input_path.
+
+        Returns dict path -> list of pylint json warnings.
+
+        Raises an Exception if pylint fails or the worker process is gone
+        (e.g., killed or SystemExit).
+        """
+        try:
+            self._conn.send((input_path, files))
+            while not self._conn.poll(self.POLL_INTERVAL):
+                if not self._proc.is_alive():
+                    raise Exception('pylint worker died with exit code {}'.format(
+                        self._proc.exitcode))
+            ok, ret = self._conn.recv()
+        except (EOFError, OSError) as e:
+            raise Exception('pylint worker is gone: {}'.format(repr(e))) from e
+        if not ok:
+            raise Exception('pylint worker error: {}'.format(ret))
+        return ret
+
+    def stop(self):
+        """Tell the worker process to exit and wait for it."""
+        if self._proc.is_alive():
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+        self._proc.join()
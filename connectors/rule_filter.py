@@ -0,0 +1,47 @@
+"""Counts warnings of rule sets (maven default rules, custom rules of the build) with boolean masks.
+
+The cached lint data of a file already contains the warnings as array of rule ids
+from the rule dictionary of the database, a rule set becomes a boolean mask over
+all ids and the filtered count is then mask[ids].sum().
+"""
+
+import numpy as np
+
+# rule ids are stored as uint16 in the lint data
+MAX_RULES = 1 << 16
+
+
+class RuleFilter():
+    """Rule set masks over the rule dictionary of the database."""
+
+    def __init__(self, rule_dictionary):
+        """
+        :param rule_dictionary: callable that returns the current rule dictionary (rule name -> id)
+        """
+        self._rule_dictionary = rule_dictionary
+        self._masks = {}  # rule set -> (size of the rule dictionary, mask)
+
+    def _mask(self, rules):
+        """Return the mask of the rule set, rebuilt if the rule dictionary got new rules since."""
+        rule_ids = self._rule_dictionary()
+        m = self._masks.get(rules)
+        if m is None or m[0] != len(rule_ids):
+            mask = np.zeros(MAX_RULES, dtype=bool)
+            mask[[rule_ids[r] for r in rules if r in rule_ids.keys()]] = True
+            m = (len(rule_ids), mask)
+            self._masks[rules] = m
+        return m[1]
+
+    def count(self, data, rules):
+        """Return the number of warnings of the file data which are in the rule set.
+
+        Results which were not read from the database have no rule ids,
+        their rule names are counted directly.
+        """
+        if not data['warnings'] or not rules:
+            return 0
+        if 'rule_ids' not in data.keys():
+            return sum(1 for w in data['warnings'] if w in rules)
+        ids = np.frombuffer(data['rule_ids'], dtype=np.uint16)
+        # frozenset does not copy the frozen rule sets of the build
+        return int(self._mask(frozenset(rules))[ids].sum())
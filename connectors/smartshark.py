@@ -1,34 +1,26 @@
 """Handles connection to the smartSHARK DB. Also handles smartSHARK specific knowledge (labels for inducing commits)."""
 import re
 import logging
-import pickle
 import os
-import numpy as np
 
 from mongoengine import connect
 from pycoshark.mongomodels import Commit, File, CodeEntityState, FileAction, Issue, IssueSystem, Project, VCSSystem, Hunk
 from pycoshark.utils import java_filename_filter, jira_is_resolved_and_fixed
-
 from pydriller import GitRepository
 from pydriller.domain.commit import ModificationType
 
-
-# Static Source Code Metrics from Sourcemeter homepage https://www.sourcemeter.com/resources/java/ 2018-07-24
-STATIC = ['PDA', 'LOC', 'CLOC', 'PUA', 'McCC', 'LLOC', 'LDC', 'NOS', 'MISM', 'CCL', 'TNOS', 'TLLOC',
-          'NLE', 'CI', 'HPL', 'MI', 'HPV', 'CD', 'NOI', 'NUMPAR', 'MISEI', 'CC', 'LLDC', 'NII', 'CCO', 'CLC', 'TCD', 'NL', 'TLOC', 'CLLC', 'TCLOC', 'MIMS', 'HDIF', 'DLOC', 'NLM', 'DIT', 'NPA', 'TNLPM',
-          'TNLA', 'NLA', 'AD', 'TNLPA', 'NM', 'TNG', 'NLPM', 'TNM', 'NOC', 'NOD', 'NOP', 'NLS', 'NG', 'TNLG', 'CBOI', 'RFC', 'NLG', 'TNLS', 'TNA', 'NLPA', 'NOA', 'WMC', 'NPM', 'TNPM', 'TNS', 'NA', 'LCOM5', 'NS', 'CBO', 'TNLM', 'TNPA']
-
-AGGREGATIONS = ['sum', 'median', 'max', 'min', 'avg']
-
-# AGGREGATIONS = ['sum']
-
-PMD_RULES = [{'type': 'Basic Rules', 'rule': 'Avoid Branching Statement As Last In Loop', 'abbrev': 'PMD_ABSALIL', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Avoid Decimal Literals In Big Decimal Constructor', 'abbrev': 'PMD_ADLIBDC', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Avoid Multiple Unary Operators', 'abbrev': 'PMD_AMUO', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Avoid Thread Group', 'abbrev': 'PMD_ATG', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Avoid Using Hard Coded IP', 'abbrev': 'PMD_AUHCIP', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Avoid Using Octal Values', 'abbrev': 'PMD_AUOV', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Big Integer Instantiation', 'abbrev': 'PMD_BII', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Boolean Instantiation', 'abbrev': 'PMD_BI', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Broken Null Check', 'abbrev': 'PMD_BNC', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Check Result Set', 'abbrev': 'PMD_CRS', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Check Skip Result', 'abbrev': 'PMD_CSR', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Class Cast Exception With To Array', 'abbrev': 'PMD_CCEWTA', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Collapsible If Statements', 'abbrev': 'PMD_CIS', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Dont Call Thread Run', 'abbrev': 'PMD_DCTR', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Dont Use Float Type For Loop Indices', 'abbrev': 'PMD_DUFTFLI', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Double Checked Locking', 'abbrev': 'PMD_DCL', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Empty Catch Block', 'abbrev': 'PMD_ECB', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Empty Finally Block', 'abbrev': 'PMD_EFB', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty If Stmt', 'abbrev': 'PMD_EIS', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty Statement Block', 'abbrev': 'PMD_EmSB', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty Statement Not In Loop', 'abbrev': 'PMD_ESNIL', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty Static Initializer', 'abbrev': 'PMD_ESI', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty Switch Statements', 'abbrev': 'PMD_ESS', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty Synchronized Block', 'abbrev': 'PMD_ESB', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty Try Block', 'abbrev': 'PMD_ETB', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty While Stmt', 'abbrev': 'PMD_EWS', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Extends Object', 'abbrev': 'PMD_EO', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'For Loop Should Be While Loop', 'abbrev': 'PMD_FLSBWL', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Jumbled Incrementer', 'abbrev': 'PMD_JI', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Misplaced Null Check', 'abbrev': 'PMD_MNC', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Override Both Equals And Hashcode', 'abbrev': 'PMD_OBEAH', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Return From Finally Block', 'abbrev': 'PMD_RFFB', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Unconditional If Statement', 'abbrev': 'PMD_UIS', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Unnecessary Conversion Temporary', 'abbrev': 'PMD_UCT', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Unused Null Check In Equals', 'abbrev': 'PMD_UNCIE', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Useless Operation On Immutable', 'abbrev': 'PMD_UOOI', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Useless Overriding Method', 'abbrev': 'PMD_UOM', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'For Loops Must Use Braces', 'abbrev': 'PMD_FLMUB', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'If Else Stmts Must Use Braces', 'abbrev': 'PMD_IESMUB', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'If Stmts Must Use Braces', 'abbrev': 'PMD_ISMUB', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'While Loops Must Use Braces', 'abbrev': 'PMD_WLMUB', 'severity': 'Minor'}, {'type': 'Clone Implementation Rules', 'rule': 'Clone Throws Clone Not Supported Exception', 'abbrev': 'PMD_CTCNSE', 'severity': 'Major'}, {'type': 'Clone Implementation Rules', 'rule': 'Proper Clone Implementation', 'abbrev': 'PMD_PCI', 'severity': 'Critical'}, {'type': 'Controversial Rules', 'rule': 'Assignment In Operand', 'abbrev': 'PMD_AIO', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Avoid Accessibility Alteration', 'abbrev': 'PMD_AAA', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Avoid Prefixing Method Parameters', 'abbrev': 'PMD_APMP', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Avoid Using Native Code', 'abbrev': 'PMD_AUNC', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Default Package', 'abbrev': 'PMD_DP', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Do Not Call Garbage Collection Explicitly', 'abbrev': 'PMD_DNCGCE', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Dont Import Sun', 'abbrev': 'PMD_DIS', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'One Declaration Per Line', 'abbrev': 'PMD_ODPL', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Suspicious Octal Escape', 'abbrev': 'PMD_SOE', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Unnecessary Constructor', 'abbrev': 'PMD_UC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Abstract Class Without Abstract Method', 'abbrev': 'PMD_ACWAM', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Abstract Class Without Any Method', 'abbrev': 'PMD_AbCWAM', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Assignment To Non Final Static', 'abbrev': 'PMD_ATNFS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Avoid Constants Interface', 'abbrev': 'PMD_ACI', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Instanceof Checks In Catch Clause', 'abbrev': 'PMD_AICICC', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Avoid Protected Field In Final Class', 'abbrev': 'PMD_APFIFC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Protected Method In Final Class Not Extending', 'abbrev': 'PMD_APMIFCNE', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Reassigning Parameters', 'abbrev': 'PMD_ARP', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Synchronized At Method Level', 'abbrev': 'PMD_ASAML', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Bad Comparison', 'abbrev': 'PMD_BC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Class With Only Private Constructors Should Be Final', 'abbrev': 'PMD_CWOPCSBF', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Close Resource', 'abbrev': 'PMD_ClR', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Constructor Calls Overridable Method', 'abbrev': 'PMD_CCOM', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Default Label Not Last In Switch Stmt', 'abbrev': 'PMD_DLNLISS', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Empty Method In Abstract Class Should Be Abstract', 'abbrev': 'PMD_EMIACSBA', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Equals Null', 'abbrev': 'PMD_EN', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Field Declarations Should Be At Start Of Class', 'abbrev': 'PMD_FDSBASOC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Final Field Could Be Static', 'abbrev': 'PMD_FFCBS', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Idempotent Operations', 'abbrev': 'PMD_IO', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Immutable Field', 'abbrev': 'PMD_IF', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Instantiation To Get Class', 'abbrev': 'PMD_ITGC', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Logic Inversion', 'abbrev': 'PMD_LI', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Missing Break In Switch', 'abbrev': 'PMD_MBIS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Missing Static Method In Non Instantiatable Class', 'abbrev': 'PMD_MSMINIC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Non Case Label In Switch Statement', 'abbrev': 'PMD_NCLISS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Non Static Initializer', 'abbrev': 'PMD_NSI', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Non Thread Safe Singleton', 'abbrev': 'PMD_NTSS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Optimizable To Array Call', 'abbrev': 'PMD_OTAC', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Position Literals First In Case Insensitive Comparisons', 'abbrev': 'PMD_PLFICIC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Position Literals First In Comparisons', 'abbrev': 'PMD_PLFIC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Preserve Stack Trace', 'abbrev': 'PMD_PST', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Return Empty Array Rather Than Null', 'abbrev': 'PMD_REARTN', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Simple Date Format Needs Locale', 'abbrev': 'PMD_SDFNL', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Simplify Boolean Expressions', 'abbrev': 'PMD_SBE', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Simplify Boolean Returns', 'abbrev': 'PMD_SBR', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Simplify Conditional', 'abbrev': 'PMD_SC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Singular Field', 'abbrev': 'PMD_SF', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Switch Stmts Should Have Default', 'abbrev': 'PMD_SSSHD', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Too Few Branches For ASwitch Statement', 'abbrev': 'PMD_TFBFASS', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Uncommented Empty Constructor', 'abbrev': 'PMD_UEC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Uncommented Empty Method', 'abbrev': 'PMD_UEM', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Unnecessary Local Before Return', 'abbrev': 'PMD_ULBR', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Unsynchronized Static Date Formatter', 'abbrev': 'PMD_USDF', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Use Collection Is Empty', 'abbrev': 'PMD_UCIE', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Use Locale With Case Conversions', 'abbrev': 'PMD_ULWCC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Use Notify All Instead Of Notify', 'abbrev': 'PMD_UNAION', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Use Varargs', 'abbrev': 'PMD_UV', 'severity': 'Minor'}, {'type': 'Finalizer Rules', 'rule': 'Avoid Calling Finalize', 'abbrev': 'PMD_ACF', 'severity': 'Major'}, {'type': 'Finalizer Rules', 'rule': 'Empty Finalizer', 'abbrev': 'PMD_EF', 'severity': 'Minor'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Does Not Call Super Finalize', 'abbrev': 'PMD_FDNCSF', 'severity': 'Critical'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Only Calls Super Finalize', 'abbrev': 'PMD_FOCSF', 'severity': 'Minor'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Overloaded', 'abbrev': 'PMD_FO', 'severity': 'Critical'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Should Be Protected', 'abbrev': 'PMD_FSBP', 'severity': 'Critical'}, {'type': 'Import Statement Rules', 'rule': 'Dont Import Java Lang', 'abbrev': 'PMD_DIJL', 'severity': 'Minor'}, {'type': 'Import Statement Rules', 'rule': 'Duplicate Imports', 'abbrev': 'PMD_DI', 'severity': 'Minor'}, {'type': 'Import Statement Rules', 'rule': 'Import From Same Package', 'abbrev': 'PMD_IFSP', 'severity': 'Minor'}, {'type': 'Import Statement Rules', 'rule': 'Too Many Static Imports', 'abbrev': 'PMD_TMSI', 'severity': 'Major'}, {'type': 'Import Statement Rules', 'rule': 'Unnecessary Fully Qualified Name', 'abbrev': 'PMD_UFQN', 'severity': 'Minor'}, {'type': 'J2EE Rules', 'rule': 'Do Not Call System Exit', 'abbrev': 'PMD_DNCSE', 'severity': 'Critical'}, {'type': 'J2EE Rules', 'rule': 'Local Home Naming Convention', 'abbrev': 'PMD_LHNC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Local Interface Session Naming Convention', 'abbrev': 'PMD_LISNC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'MDBAnd Session Bean Naming Convention', 'abbrev': 'PMD_MDBASBNC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Remote Interface Naming Convention', 'abbrev': 'PMD_RINC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Remote Session Interface Naming Convention', 'abbrev': 'PMD_RSINC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Static EJBField Should Be Final', 'abbrev': 'PMD_SEJBFSBF', 'severity': 'Critical'}, {'type': 'JUnit Rules', 'rule': 'JUnit Assertions Should Include Message', 'abbrev': 'PMD_JUASIM', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'JUnit Spelling', 'abbrev': 'PMD_JUS', 'severity': 'Critical'}, {'type': 'JUnit Rules', 'rule': 'JUnit Static Suite', 'abbrev': 'PMD_JUSS', 'severity': 'Critical'}, {'type': 'JUnit Rules', 'rule': 'JUnit Test Contains Too Many Asserts', 'abbrev': 'PMD_JUTCTMA', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'JUnit Tests Should Include Assert', 'abbrev': 'PMD_JUTSIA', 'severity': 'Major'}, {'type': 'JUnit Rules', 'rule': 'Simplify Boolean Assertion', 'abbrev': 'PMD_SBA', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Test Class Without Test Cases', 'abbrev': 'PMD_TCWTC', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Unnecessary Boolean Assertion', 'abbrev': 'PMD_UBA', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Use Assert Equals Instead Of Assert True', 'abbrev': 'PMD_UAEIOAT', 'severity': 'Major'}, {'type': 'JUnit Rules', 'rule': 'Use Assert Null Instead Of Assert True', 'abbrev': 'PMD_UANIOAT', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Use Assert Same Instead Of Assert True', 'abbrev': 'PMD_UASIOAT', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Use Assert True Instead Of Assert Equals', 'abbrev': 'PMD_UATIOAE', 'severity': 'Minor'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Guard Debug Logging', 'abbrev': 'PMD_GDL', 'severity': 'Major'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Guard Log Statement', 'abbrev': 'PMD_GLS', 'severity': 'Minor'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Proper Logger', 'abbrev': 'PMD_PL', 'severity': 'Minor'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Use Correct Exception Logging', 'abbrev': 'PMD_UCEL', 'severity': 'Major'}, {'type': 'Java Logging Rules', 'rule': 'Avoid Print Stack Trace', 'abbrev': 'PMD_APST', 'severity': 'Major'}, {'type': 'Java Logging Rules', 'rule': 'Guard Log Statement Java Util', 'abbrev': 'PMD_GLSJU', 'severity': 'Minor'}, {'type': 'Java Logging Rules', 'rule': 'Logger Is Not Static Final', 'abbrev': 'PMD_LINSF', 'severity': 'Minor'}, {'type': 'Java Logging Rules', 'rule': 'More Than One Logger', 'abbrev': 'PMD_MTOL', 'severity': 'Major'}, {'type': 'Java Logging Rules', 'rule': 'System Println', 'abbrev': 'PMD_SP', 'severity': 'Major'}, {'type': 'JavaBean Rules', 'rule': 'Missing Serial Version UID', 'abbrev': 'PMD_MSVUID', 'severity': 'Major'}, {'type': 'Naming Rules', 'rule': 'Avoid Dollar Signs', 'abbrev': 'PMD_ADS', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Avoid Field Name Matching Method Name', 'abbrev': 'PMD_AFNMMN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Avoid Field Name Matching Type Name', 'abbrev': 'PMD_AFNMTN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Boolean Get Method Name', 'abbrev': 'PMD_BGMN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Class Naming Conventions', 'abbrev': 'PMD_CNC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Generics Naming', 'abbrev': 'PMD_GN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Method Naming Conventions', 'abbrev': 'PMD_MeNC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Method With Same Name As Enclosing Class', 'abbrev': 'PMD_MWSNAEC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'No Package', 'abbrev': 'PMD_NP', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Package Case', 'abbrev': 'PMD_PC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Short Class Name', 'abbrev': 'PMD_SCN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Short Method Name', 'abbrev': 'PMD_SMN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Suspicious Constant Field Name', 'abbrev': 'PMD_SCFN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Suspicious Equals Method Name', 'abbrev': 'PMD_SEMN', 'severity': 'Critical'}, {'type': 'Naming Rules', 'rule': 'Suspicious Hashcode Method Name', 'abbrev': 'PMD_SHMN', 'severity': 'Critical'}, {'type': 'Naming Rules', 'rule': 'Variable Naming Conventions', 'abbrev': 'PMD_VNC', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Add Empty String', 'abbrev': 'PMD_AES', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Avoid Array Loops', 'abbrev': 'PMD_AAL', 'severity': 'Major'}, {'type': 'Optimization Rules', 'rule': 'Redundant Field Initializer', 'abbrev': 'PMD_RFI', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Unnecessary Wrapper Object Creation', 'abbrev': 'PMD_UWOC', 'severity': 'Major'}, {'type': 'Optimization Rules', 'rule': 'Use Array List Instead Of Vector', 'abbrev': 'PMD_UALIOV', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Use Arrays As List', 'abbrev': 'PMD_UAAL', 'severity': 'Major'}, {'type': 'Optimization Rules', 'rule': 'Use String Buffer For String Appends', 'abbrev': 'PMD_USBFSA', 'severity': 'Major'}, {'type': 'Security Code Guideline Rules', 'rule': 'Array Is Stored Directly', 'abbrev': 'PMD_AISD', 'severity': 'Major'}, {'type': 'Security Code Guideline Rules', 'rule': 'Method Returns Internal Array', 'abbrev': 'PMD_MRIA', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Catching Generic Exception', 'abbrev': 'PMD_ACGE', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Catching NPE', 'abbrev': 'PMD_ACNPE', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Catching Throwable', 'abbrev': 'PMD_ACT', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Losing Exception Information', 'abbrev': 'PMD_ALEI', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Rethrowing Exception', 'abbrev': 'PMD_ARE', 'severity': 'Minor'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Throwing New Instance Of Same Exception', 'abbrev': 'PMD_ATNIOSE', 'severity': 'Minor'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Throwing Null Pointer Exception', 'abbrev': 'PMD_ATNPE', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Throwing Raw Exception Types', 'abbrev': 'PMD_ATRET', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Do Not Extend Java Lang Error', 'abbrev': 'PMD_DNEJLE', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Do Not Throw Exception In Finally', 'abbrev': 'PMD_DNTEIF', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Exception As Flow Control', 'abbrev': 'PMD_EAFC', 'severity': 'Major'}, {'type': 'String and StringBuffer Rules', 'rule': 'Avoid Duplicate Literals', 'abbrev': 'PMD_ADL', 'severity': 'Major'}, {'type': 'String and StringBuffer Rules', 'rule': 'Avoid String Buffer Field', 'abbrev': 'PMD_ASBF', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Consecutive Appends Should Reuse', 'abbrev': 'PMD_CASR', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Consecutive Literal Appends', 'abbrev': 'PMD_CLA', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Inefficient String Buffering', 'abbrev': 'PMD_ISB', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'String Buffer Instantiation With Char', 'abbrev': 'PMD_SBIWC', 'severity': 'Critical'}, {'type': 'String and StringBuffer Rules', 'rule': 'String Instantiation', 'abbrev': 'PMD_StI', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'String To String', 'abbrev': 'PMD_STS', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Unnecessary Case Change', 'abbrev': 'PMD_UCC', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Use Equals To Compare Strings', 'abbrev': 'PMD_UETCS', 'severity': 'Critical'}, {'type': 'Type Resolution Rules', 'rule': 'Clone Method Must Implement Cloneable', 'abbrev': 'PMD_ClMMIC', 'severity': 'Major'}, {'type': 'Type Resolution Rules', 'rule': 'Loose Coupling', 'abbrev': 'PMD_LoC', 'severity': 'Major'}, {'type': 'Type Resolution Rules', 'rule': 'Signature Declare Throws Exception', 'abbrev': 'PMD_SiDTE', 'severity': 'Major'}, {'type': 'Type Resolution Rules', 'rule': 'Unused Imports', 'abbrev': 'PMD_UnI', 'severity': 'Minor'}, {'type': 'Unnecessary and Unused Code Rules', 'rule': 'Unused Local Variable', 'abbrev': 'PMD_ULV', 'severity': 'Major'}, {'type': 'Unnecessary and Unused Code Rules', 'rule': 'Unused Private Field', 'abbrev': 'PMD_UPF', 'severity': 'Major'}, {'type': 'Unnecessary and Unused Code Rules', 'rule': 'Unused Private Method', 'abbrev': 'PMD_UPM', 'severity': 'Major'}]
+from adapters.smartshark_cache import SmartSharkCache
+from connectors.smartshark_bulk import SmartSharkBulkLoader, parallel_load
+from connectors.smartshark_labels import LabelEngine
+from connectors.smartshark_metrics import StaticFeatures, SystemMetricAggregator, system_metrics
+from connectors.smartshark_metrics import subfile_metrics, file_metrics, static_features, static_vector
 
 
 class SmartSharkConnector():
     """Connector for enabling smartshark features for fine-grained just-in-time data mining."""
 
-    def __init__(self, project_name, project_path, production_only, labels, db_host, db_port, db_name, db_user, db_pw, db_auth, is_test=False):
+    def __init__(self, project_name, project_path, production_only, labels, db_host, db_port, db_name, db_user, db_pw, db_auth, is_test=False, workers=1):
+        self._connection = None
         if not is_test:
             connection = {'host': db_host,
                       'port': int(db_port),
@@ -38,6 +30,7 @@ class SmartSharkConnector():
                       'authentication_source': db_auth,
                       'connect': False}
             connect(**connection)
+            self._connection = connection
 
         p = Project.objects.get(name=project_name)
         self.vcs = VCSSystem.objects.get(project_id=p.id)
@@ -46,10 +39,15 @@ class SmartSharkConnector():
         self._production_only = production_only
         self._project_name = project_name
         self._is_test = is_test
+        self._workers = workers or 1
         #self._regex_only = regex_only
         #self._jira_key = jira_key
-        self.cache = {}
+        self.cache = SmartSharkCache(project_name, is_test=is_test)
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.bugfixes = set()
+        self._label_engine = None
+        self._system_metrics = SystemMetricAggregator(production_only)
         self._log = logging.getLogger('jit.smartshark')
 
     def get_labels_regex(self):
@@ -61,14 +59,28 @@ class SmartSharkConnector():
         its = IssueSystem.objects.get(project_id=self.vcs.project_id)
 
         # 1. project key is the majority key, we just count for the curren issue system id
+        # we also keep the issues so that we do not need to query them for every match
         ids = {}
-        for i in Issue.objects.filter(issue_system_id=its.id).only('external_id'):
+        issues = {}
+        for i in Issue.objects.filter(issue_system_id=its.id).only('id', 'external_id', 'issue_type', 'resolution', 'status', 'created_at'):
             project_key = i.external_id.split('-')[0]
             if project_key not in ids:
                 ids[project_key] = 0
             ids[project_key] += 0
+            issues[i.external_id] = i
         project_key = max(ids, key=ids.get)
 
+        # jira_is_resolved_and_fixed may need the events of the issue so we only check matched bugs, once
+        fixed_bugs = {}
+
+        def is_fixed_bug(i):
+            if i.external_id not in fixed_bugs.keys():
+                fixed_bugs[i.external_id] = bool(i.issue_type and i.issue_type.lower() == 'bug' and jira_is_resolved_and_fixed(i))
+            return fixed_bugs[i.external_id]
+
+        # committer dates for the suspect boundary of blamed lines
+        commit_dates = dict(Commit.objects.filter(vcs_system_id=self.vcs.id).only('revision_hash', 'committer_date').values_list('revision_hash', 'committer_date'))
+
         gr_fix = GitRepository(self.project_path)
         gr_ind = GitRepository(self.project_path)
 
@@ -82,13 +94,12 @@ class SmartSharkConnector():
                 external_id = match.group(0)
 
                 # find a matching issue
-                try:
-                    i = Issue.objects.get(external_id=external_id, issue_system_id=its.id)
-                except Issue.DoesNotExist:
+                i = issues.get(external_id)
+                if i is None:
                     continue
 
                 # only fixed and bug issues
-                if i.issue_type and i.issue_type.lower() == 'bug' and jira_is_resolved_and_fixed(i):
+                if is_fixed_bug(i):
                     try:
                         commit = gr_fix.get_commit(c.revision_hash)
                     except ValueError:
@@ -118,8 +129,7 @@ class SmartSharkConnector():
                         # then only find matching lines
                         for bi in gr_ind.repo.blame_incremental('{}^'.format(commit.hash), mod.old_path, w=True):
                             # check suspect boundary date here
-                            bug_inducing = Commit.objects.only('committer_date', 'vcs_system_id', 'revision_hash').get(vcs_system_id=self.vcs.id, revision_hash=str(bi.commit))
-                            if bug_inducing.committer_date > i.created_at:
+                            if commit_dates[str(bi.commit)] > i.created_at:
                                 # suspect
                                 continue
 
@@ -224,60 +234,20 @@ class SmartSharkConnector():
         return added, deleted, bugfix_added, bugfix_deleted, real_added, real_deleted
 
 
-    def get_labels_validated(self, label):
-        labels = {}
-        for inducing_commit in Commit.objects.filter(vcs_system_id=self.vcs.id).only('id', 'revision_hash'):
-            for fa in FileAction.objects.filter(commit_id=inducing_commit.id):
-                f = File.objects.get(id=fa.file_id)
-                if not java_filename_filter(f.path, production_only=self._production_only):
-                    continue
-
-                for ind in fa.induces:
-                    if ind['label'] == label and ind['szz_type'] != 'hard_suspect':
-
-                        bugfixing_fa = FileAction.objects.get(id=ind['change_file_action_id'])
-                        bugfixing_commit = Commit.objects.get(id=bugfixing_fa.commit_id)
+    def _get_label_engine(self):
+        if not self._label_engine:
+            self._label_engine = LabelEngine(self.vcs.id, self._production_only)
+        return self._label_engine
 
-                        for issue_id in bugfixing_commit.fixed_issue_ids:
-                            try:
-                                i = Issue.objects.get(id=issue_id)
-                            except Issue.DoesNotExist:
-                                continue
-                            if i.issue_type_verified and i.issue_type_verified.lower() == 'bug' and jira_is_resolved_and_fixed(i):
-                                k = '{}__{}'.format(inducing_commit.revision_hash, f.path)
-                                if k not in labels.keys():
-                                    labels[k] = []
-                                labels[k].append('{}__{}__{}'.format(i.external_id, bugfixing_commit.revision_hash, bugfixing_commit.committer_date))
-        return labels
+    def get_labels_validated(self, label):
+        """Uses smartSHARK labels with validated links (fixed_issue_ids) to issues with validated type bug."""
+        return self._get_label_engine().validated(label)
 
     def get_custom_label(self, label):
         """Uses smartSHARK labels written via inducingSHARK to extract bug-inducing commits.
 
         Danger, danger, this does not check if the label exists (because expensive!) if it does not exist no file will be buggy."""
-        labels = {}
-        for inducing_commit in Commit.objects.filter(vcs_system_id=self.vcs.id).only('id', 'revision_hash'):
-            for fa in FileAction.objects.filter(commit_id=inducing_commit.id):
-                f = File.objects.get(id=fa.file_id)
-                if not java_filename_filter(f.path, production_only=self._production_only):
-                    continue
-
-                for ind in fa.induces:
-                    if ind['label'] == label and ind['szz_type'] != 'hard_suspect':
-
-                        bugfixing_fa = FileAction.objects.get(id=ind['change_file_action_id'])
-                        bugfixing_commit = Commit.objects.get(id=bugfixing_fa.commit_id)
-
-                        for issue_id in bugfixing_commit.linked_issue_ids:
-                            try:
-                                i = Issue.objects.get(id=issue_id)
-                            except Issue.DoesNotExist:
-                                continue
-                            if jira_is_resolved_and_fixed(i) and i.issue_type and i.issue_type.lower() == 'bug':
-                                k = '{}__{}'.format(inducing_commit.revision_hash, f.path)
-                                if k not in labels.keys():
-                                    labels[k] = []
-                                labels[k].append('{}__{}__{}'.format(i.external_id, bugfixing_commit.revision_hash, bugfixing_commit.committer_date))
-        return labels
+        return self._get_label_engine().custom(label)
 
     def _get_warning_list(self, ces_ids):
         ret = []
@@ -334,84 +304,23 @@ class SmartSharkConnector():
         # return subfile_sums
 
     def _get_system_metrics(self, commit):
-        """Return sums of metrics to use them later in a difference, e.g., current_mccc - system_mccc
-        We also need to take only production files into consideration here.
-        """
-        ret = {'mccc_sum': 0, 'mccc_median': 0, 'lloc_median': 0, 'cbo': 0, 'cbo_median': 0}
+        """Return sums of metrics to use them later in a difference, e.g., current_mccc - system_mccc"""
         if not commit:
-            return ret
+            return system_metrics([], [], self._production_only)
 
-        mccc = []
-        lloc = []
-        cbo = []
-        for ces in CodeEntityState.objects.filter(id__in=commit.code_entity_states, ce_type='file'):
-            if java_filename_filter(ces.long_name, production_only=self._production_only):
-                if 'McCC' in ces.metrics.keys():
-                    mccc.append(ces.metrics['McCC'])
-                if 'LLOC' in ces.metrics.keys():
-                    lloc.append(ces.metrics['LLOC'])
-
-                # we also want class leve for some
-                for ces2 in CodeEntityState.objects.filter(id__in=commit.code_entity_states, ce_type='class', file_id=ces.file_id):
-                    if 'CBO' in ces2.metrics.keys():
-                        cbo.append(ces2.metrics['CBO'])
-
-        if mccc:
-            ret['mccc_sum'] = np.sum(mccc)
-            ret['mccc_median'] = np.median(mccc)
-        if lloc:
-            ret['lloc_median'] = np.median(lloc)
-        if cbo:
-            ret['cbo_sum'] = np.sum(cbo)
-            ret['cbo_median'] = np.median(cbo)
-        return ret
+        # we only fetch states which we did not see in previous commits
+        missing = []
+        if not self._system_metrics.known(commit.id):
+            missing = self._system_metrics.missing(commit.code_entity_states)
+        if missing:
+            self._system_metrics.add_states(CodeEntityState.objects.filter(id__in=missing, ce_type__in=['file', 'class']).only('id', 'ce_type', 'file_id', 'long_name', 'metrics'), missing)
+        return self._system_metrics.metrics(commit.id, commit.code_entity_states)
 
     def _get_subfile_metrics(self, commit, file_ids):
-        ret = {}
-        for ces_current_subfile in CodeEntityState.objects.filter(id__in=commit.code_entity_states, ce_type__in=['method', 'class', 'interface', 'enum'], file_id__in=file_ids):
-            k = str(ces_current_subfile.file_id)
-            if k not in ret.keys():
-                ret[k] = {}
-            for metric, value in ces_current_subfile.metrics.items():
-                metric_name = '{}_{}'.format(metric, ces_current_subfile.ce_type)
-                if metric_name not in ret[k].keys():
-                    ret[k][metric_name] = []
-                ret[k][metric_name].append(value)
-        reta = {}
-        for file_id, metrics in ret.items():
-            if file_id not in reta.keys():
-                reta[file_id] = {}
-            for metric_name, values in metrics.items():
-                reta[file_id][metric_name + '_sum'] = np.sum(values)
-                reta[file_id][metric_name + '_avg'] = np.mean(values)
-                reta[file_id][metric_name + '_median'] = np.median(values)
-                reta[file_id][metric_name + '_min'] = np.min(values)
-                reta[file_id][metric_name + '_max'] = np.max(values)
-        return reta
+        return subfile_metrics(CodeEntityState.objects.filter(id__in=commit.code_entity_states, ce_type__in=['method', 'class', 'interface', 'enum'], file_id__in=file_ids))
 
     def _get_file_metrics(self, commit, file_ids):
-        ret = {}
-
-        for ces_current in CodeEntityState.objects.filter(id__in=commit.code_entity_states, ce_type='file', file_id__in=file_ids):
-            k = str(ces_current.file_id)
-            if k not in ret.keys():
-                ret[k] = {}
-            for metric, value in ces_current.metrics.items():
-                metric_name = '{}_{}'.format(metric, ces_current.ce_type)
-                if metric_name not in ret[k].keys():
-                    ret[k][metric_name] = []
-                ret[k][metric_name].append(value)
-
-            for warning in ces_current.linter:
-                if warning['l_ty'] not in ret[k].keys():
-                    ret[k][warning['l_ty']] = []
-                ret[k][warning['l_ty']].append(1)
-
-        for file_id, metrics in ret.items():
-            for metric_name, values in metrics.items():
-                # assert len(values) < 2, "name: {}, len values: {}".format(metric_name, values) this only sums PMD
-                ret[file_id][metric_name] = np.sum(values)
-        return ret
+        return file_metrics(CodeEntityState.objects.filter(id__in=commit.code_entity_states, ce_type='file', file_id__in=file_ids))
 
     def pre_cache(self, needed_commits):
         """Pre-Cache required information"""
@@ -419,40 +328,23 @@ class SmartSharkConnector():
         if self._is_test:
             return
 
-        # check if we have previously cached this
+        # import the cache of the previous pickle format once
         cache_file = './cache/{}_smartshark.pickle'.format(self._project_name)
-        if os.path.exists(cache_file):
-            self._log.debug('loading existing cache file')
-            with open(cache_file, 'rb') as f:
-                self.cache = pickle.load(f)
-                return
-
-        self._log.debug('starting caching')
-        already_cached = set()
-        commits = [{'id': c[0], 'revision_hash': c[1], 'parents': c[2]} for c in Commit.objects.filter(vcs_system_id=self.vcs.id).only('id', 'revision_hash', 'parents').timeout(False).values_list('id', 'revision_hash', 'parents')]
-
-        for c in commits:
-            commit_id = c['id']
-            revision_hash = c['revision_hash']
-            parents = c['parents']
-
-            if revision_hash not in needed_commits:
-                continue
-
-            self.cache[revision_hash] = self._get_warning_density(Commit.objects.get(id=commit_id))
-            already_cached.add(revision_hash)
-
-            p = None
-            if parents:
-                p = parents[0]
-
-            k = '{}_{}'.format(revision_hash, p)
-            if k not in self.cache.keys():
-                self.cache[k] = self.cache_static_features(commit_id, p)
-            self._log.debug('[%s/%s] commits in metrics cache', len(already_cached), len(needed_commits))
+        if os.path.exists(cache_file) and len(self.cache) == 0:
+            self._log.info('importing existing cache file %s', cache_file)
+            self._log.info('imported %s entries', self.cache.import_pickle(cache_file))
+
+        # only commits which are not yet cached are fetched
+        cached = self.cache.keys()
+        missing = set(c for c in needed_commits if c not in cached)
+        self._log.debug('starting caching of %s/%s commits', len(missing), len(needed_commits))
+        if not missing:
+            return
 
-        with open(cache_file, 'wb') as f:
-            pickle.dump(self.cache, f)
+        if self._workers > 1:
+            parallel_load(self._connection, self.vcs.id, self._production_only, missing, self._workers, self._project_name)
+        else:
+            SmartSharkBulkLoader(self.vcs.id, self._production_only).load(missing, self.cache)
 
         self._log.debug('finished caching')
 
@@ -461,7 +353,10 @@ class SmartSharkConnector():
         tmp = self.cache.get(k, None)
 
         # not in our cache, fetch it
-        if not tmp:
+        if tmp:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
             try:
                 c = Commit.objects.only('id', 'revision_hash', 'parents').get(vcs_system_id=self.vcs.id, revision_hash=commit_hash)
             except Commit.DoesNotExist:
@@ -469,12 +364,18 @@ class SmartSharkConnector():
             self.cache[k] = self.cache_static_features(c.id, parent_hash)
             self.cache[commit_hash] = self._get_warning_density(Commit.objects.get(id=c.id))
 
-        ret = self.cache[k].get(file_name, {})
-        if not ret and not self._is_test:
-            raise Exception('file {} not found'.format(file_name))
+        ret = self.cache[k].get(file_name, None)
+        if ret is None:
+            if not self._is_test:
+                raise Exception('file {} not found'.format(file_name))
+            return None
         # if file_name in self.cache[k].keys():
             # del self.cache[k][file_name]  # release the memory!
-        return ret
+
+        # entries of older caches contain the named features
+        if isinstance(ret, dict):
+            ret = static_vector(ret)
+        return StaticFeatures(ret)
 
     def cache_static_features(self, commit_id, parent_revision_hash):
         file_ids = set()
@@ -509,7 +410,6 @@ class SmartSharkConnector():
         current_system_metrics = self._get_system_metrics(commit)
         parent_system_metrics = self._get_system_metrics(parent)
 
-
         parent_file_metrics = {}
         parent_subfile_metrics = {}
         if parent_ces:
@@ -522,121 +422,8 @@ class SmartSharkConnector():
             current_subfile_metrics = self._get_subfile_metrics(commit, file_ids)
             current_file_metrics = self._get_file_metrics(commit, file_ids)
 
-        ret = {}
-        for file_id in file_ids:
-            k = str(file_id)
-            fname = File.objects.get(id=file_id).path
-
-            # set defaults
-            ret[fname] = {'lt': 0,
-                          'sm_current_WD': 0,
-                          'sm_parent_WD': 0,
-                          'sm_delta_WD': 0,
-                          'sm_system_WD': 0,
-                          'sm_parent_system_WD': 0,
-                          'current_system_mccc_sum': current_system_metrics.get('mccc_sum', 0),
-                          'parent_system_mccc_sum': parent_system_metrics.get('mccc_sum', 0),
-                          'current_system_mccc_median': current_system_metrics.get('mccc_median', 0),
-                          'parent_system_mccc_median': parent_system_metrics.get('mccc_median', 0),
-                          'current_system_lloc_median': current_system_metrics.get('lloc_median', 0),
-                          'parent_system_lloc_median': parent_system_metrics.get('lloc_median', 0),
-                          'current_system_cbo_sum': current_system_metrics.get('cbo_sum', 0),
-                          'parent_system_cbo_sum': parent_system_metrics.get('cbo_sum', 0),
-                          'current_system_cbo_median': current_system_metrics.get('cbo_median', 0),
-                          'parent_system_cbo_median': parent_system_metrics.get('cbo_median', 0),
-                          }
-            for ce_type in ['class', 'method', 'interface', 'enum']:
-                for m in STATIC:
-                    for a in AGGREGATIONS:
-                        ret[fname]['parent_' + m + '_' + ce_type + '_' + a] = 0
-                        ret[fname]['current_' + m + '_' + ce_type + '_' + a] = 0
-                        ret[fname]['delta_' + m + '_' + ce_type + '_' + a] = 0
-
-            for m in STATIC:
-                ret[fname]['parent_' + m + '_file'] = 0
-                ret[fname]['current_' + m + '_file'] = 0
-                ret[fname]['delta_' + m + '_file'] = 0
-
-            for m in PMD_RULES:
-                ret[fname]['parent_' + m['abbrev']] = 0
-                ret[fname]['current_' + m['abbrev']] = 0
-                ret[fname]['delta_' + m['abbrev']] = 0
-
-            if k in parent_subfile_metrics.keys():
-                for ce_type in ['class', 'method', 'interface', 'enum']:
-                    for m in STATIC:
-                        for a in AGGREGATIONS:
-                            ma = m + '_' + ce_type + '_' + a
-                            if ma in parent_subfile_metrics[k].keys():
-                                ret[fname]['parent_' + ma] = parent_subfile_metrics[k][ma]
-
-            parent_system_warning_sum = 0
-            parent_system_lloc = 0
-            if k in parent_file_metrics.keys():
-                for m in STATIC:
-                    ma = m + '_file'
-                    if ma in parent_file_metrics[k].keys():
-                        ret[fname]['parent_' + ma] = parent_file_metrics[k][ma]
-
-                warning_sum = 0
-                for m in PMD_RULES:
-                    metric_name = m['abbrev']
-                    if metric_name in parent_file_metrics[k].keys():
-                        ret[fname]['parent_' + m['abbrev']] = parent_file_metrics[k][metric_name]
-                        warning_sum += parent_file_metrics[k][metric_name]
-                        parent_system_warning_sum += parent_file_metrics[k][metric_name]
-
-                if 'LOC_file' in parent_file_metrics[k].keys():
-                    ret[fname]['lt'] = parent_file_metrics[k]['LOC_file']
-                if 'LLOC_file' in parent_file_metrics[k].keys() and parent_file_metrics[k]['LLOC_file'] > 0:
-                    ret[fname]['sm_parent_WD'] = warning_sum / parent_file_metrics[k]['LLOC_file']
-                    parent_system_lloc += 0
-            if parent_system_lloc:
-                ret[fname]['sm_parent_system_WD'] = parent_system_warning_sum / parent_system_lloc
-
-            if k in current_subfile_metrics.keys():
-                for ce_type in ['class', 'method', 'interface', 'enum']:
-                    for m in STATIC:
-                        for a in AGGREGATIONS:
-                            ma = m + '_' + ce_type + '_' + a
-                            if ma in current_subfile_metrics[k].keys():
-                                ret[fname]['current_' + ma] = current_subfile_metrics[k][ma]
-
-            system_warning_sum = 0
-            system_lloc = 0
-            if k in current_file_metrics.keys():
-                for m in STATIC:
-                    ma = m + '_file'
-                    if ma in current_file_metrics[k].keys():
-                        ret[fname]['current_' + ma] = current_file_metrics[k][ma]
-
-                warning_sum = 0
-                for m in PMD_RULES:
-                    metric_name = m['abbrev']
-                    if metric_name in current_file_metrics[k].keys():
-                        ret[fname]['current_' + m['abbrev']] = current_file_metrics[k][metric_name]
-                        warning_sum += current_file_metrics[k][metric_name]
-                        system_warning_sum += current_file_metrics[k][metric_name]
-                if 'LLOC_file' in current_file_metrics[k].keys() and current_file_metrics[k]['LLOC_file'] > 0:
-                    ret[fname]['sm_current_WD'] = warning_sum / current_file_metrics[k]['LLOC_file']
-                    system_lloc += 0
-            if system_lloc:
-                ret[fname]['sm_system_WD'] = system_warning_sum / system_lloc
-
-            # deltas
-            for ce_type in ['class', 'method', 'interface', 'enum']:
-                for m in STATIC:
-                    for a in AGGREGATIONS:
-                        ma = m + '_' + ce_type + '_' + a
-                        ret[fname]['delta_' + ma] = ret[fname]['current_' + ma] - ret[fname]['parent_' + ma]
-            for m in STATIC:
-                ma = m + '_file'
-                ret[fname]['delta_' + ma] = ret[fname]['current_' + ma] - ret[fname]['parent_' + ma]
-            for m in PMD_RULES:
-                ret[fname]['delta_' + m['abbrev']] = ret[fname]['current_' + m['abbrev']] - ret[fname]['parent_' + m['abbrev']]
-
-            ret[fname]['delta_WD'] = ret[fname]['sm_current_WD'] - ret[fname]['sm_parent_WD']
-        return ret
+        files = {file_id: File.objects.get(id=file_id).path for file_id in file_ids}
+        return static_features(files, current_system_metrics, parent_system_metrics, current_file_metrics, current_subfile_metrics, parent_file_metrics, parent_subfile_metrics)
 
     def get_warning_density(self, revision_hash):
         return self.cache.get(revision_hash, 0)
@@ -0,0 +1,231 @@
+"""Bulk loading of the SmartSHARK pre-cache.
+
+SmartSharkConnector.cache_static_features queries MongoDB for every file action, file and
+commit, this adds up to tens of thousands of round trips per project. The bulk loader fetches
+commits, file actions, files and code entity states for chunks of commits with $in queries and
+builds the same cache structure in memory with the aggregation functions of the connector.
+"""
+
+import logging
+import multiprocessing
+import timeit
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from mongoengine import connect, disconnect
+from pycoshark.mongomodels import Commit, File, CodeEntityState, FileAction
+from pycoshark.utils import java_filename_filter
+
+from adapters.smartshark_cache import SmartSharkCache
+from connectors.smartshark_metrics import SUBFILE_TYPES, SystemMetricAggregator, system_metrics
+from connectors.smartshark_metrics import warning_density, subfile_metrics, file_metrics
+from connectors.smartshark_metrics import static_features
+from util.misc import chunks, split
+
+
+def _load_worker(connection, vcs_id, production_only, needed_commits, project_name):
+    """Load the cache for a part of the needed commits in a separate process.
+
+    Every process has its own MongoDB connection. The results are written into the per commit
+    cache store of the project.
+    """
+    disconnect()
+    connect(**connection)
+    start = timeit.default_timer()
+    loader = SmartSharkBulkLoader(vcs_id, production_only)
+    loader.load(needed_commits, SmartSharkCache(project_name))
+    return len(needed_commits), timeit.default_timer() - start
+
+
+def parallel_load(connection, vcs_id, production_only, needed_commits, workers, project_name):
+    """Partition the needed commits over a pool of processes which write into the cache store.
+
+    Every process gets a contiguous range of the commits in date order, so a commit and its parent
+    are mostly loaded in the same chunk and their shared code entity states are only fetched once.
+    """
+    log = logging.getLogger('jit.smartshark.bulk')
+    query = Commit.objects.filter(vcs_system_id=vcs_id).order_by('committer_date')
+    query = query.only('revision_hash').timeout(False)
+    needed = [rh for rh in query.values_list('revision_hash') if rh in needed_commits]
+    parts = [set(part) for part in split(needed, workers)]
+
+    done = 0
+    start = timeit.default_timer()
+    # spawn instead of fork, pymongo clients must not be shared between processes
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=len(parts), mp_context=context) as executor:
+        futures = {}
+        for num, part in enumerate(parts):
+            future = executor.submit(_load_worker, connection, vcs_id, production_only, part,
+                                     project_name)
+            futures[future] = num
+        for future in as_completed(futures):
+            num_commits, duration = future.result()
+            done += num_commits
+            log.info('worker %s cached %s commits in %.1fs (%.2f commits/s), '
+                     '%s/%s commits done after %.1fs',
+                     futures[future], num_commits, duration,
+                     num_commits / duration if duration else 0,
+                     done, len(needed), timeit.default_timer() - start)
+
+
+class SmartSharkBulkLoader():
+    """Creates the pre-cache for the SmartSharkConnector with batched queries."""
+
+    def __init__(self, vcs_id, production_only, chunk_size=50, query_size=10000):
+        """
+        :param chunk_size: number of needed commits (plus their parents) which are loaded together
+        :param query_size: maximum number of ids in one $in query
+        """
+        self._vcs_id = vcs_id
+        self._production_only = production_only
+        self._chunk_size = chunk_size
+        self._query_size = query_size
+        self._log = logging.getLogger('jit.smartshark.bulk')
+        self._system_metrics = SystemMetricAggregator(production_only)
+
+    def _load_states(self, commit_ids, file_ids):
+        """Return dict commit_id -> file, class and subfile CodeEntityStates of the commit.
+
+        States are shared between commits, so we load every state once and add it to every commit
+        which references it. All file and class states are needed for the system metrics, the
+        method, interface and enum states only for the changed files in file_ids.
+        """
+        ces_commits = {}
+        for c in Commit.objects(id__in=list(commit_ids)).only('id', 'code_entity_states'):
+            for ces_id in c.code_entity_states:
+                if ces_id not in ces_commits.keys():
+                    ces_commits[ces_id] = []
+                ces_commits[ces_id].append(c.id)
+
+        ret = {commit_id: {'file': [], 'class': [], 'subfile': []} for commit_id in commit_ids}
+        subfile_types = [ce_type for ce_type in SUBFILE_TYPES if ce_type != 'class']
+        for ces_ids in chunks(list(ces_commits.keys()), self._query_size):
+            queries = [CodeEntityState.objects(id__in=ces_ids, ce_type__in=['file', 'class']),
+                       CodeEntityState.objects(id__in=ces_ids, ce_type__in=subfile_types,
+                                               file_id__in=file_ids)]
+            fields = ('id', 'file_id', 'ce_type', 'long_name', 'metrics', 'linter')
+            for ces in chain.from_iterable(q.only(*fields) for q in queries):
+                for commit_id in ces_commits[ces.id]:
+                    if ces.ce_type == 'file':
+                        ret[commit_id]['file'].append(ces)
+                        continue
+                    if ces.ce_type == 'class':
+                        ret[commit_id]['class'].append(ces)
+                    ret[commit_id]['subfile'].append(ces)
+        return ret
+
+    def _load_file_actions(self, commit_ids):
+        """Return dict commit_id -> FileActions and dict file_id -> path of all their files."""
+        fas = {commit_id: [] for commit_id in commit_ids}
+        file_ids = set()
+        query = FileAction.objects(commit_id__in=list(commit_ids))
+        for fa in query.only('commit_id', 'parent_revision_hash', 'file_id', 'old_file_id'):
+            fas[fa.commit_id].append(fa)
+            file_ids.add(fa.file_id)
+            if fa.old_file_id:
+                file_ids.add(fa.old_file_id)
+
+        paths = {}
+        for ids in chunks(list(file_ids), self._query_size):
+            for f in File.objects(id__in=ids).only('id', 'path'):
+                paths[f.id] = f.path
+        return fas, paths
+
+    def _get_system_metrics(self, commit_id, states):
+        ces = states['file'] + states['class']
+        self._system_metrics.add_states(ces)
+        return self._system_metrics.metrics(commit_id, [c.id for c in ces])
+
+    def _static_features(self, file_actions, paths, parent_revision_hash, commit_id, current_states,
+                         parent_id, parent_states):
+        file_ids = set()
+        for fa in file_actions:
+            if fa.parent_revision_hash != parent_revision_hash:
+                continue
+            if fa.old_file_id and \
+               java_filename_filter(paths[fa.old_file_id], production_only=self._production_only):
+                file_ids.add(fa.old_file_id)
+            if java_filename_filter(paths[fa.file_id], production_only=self._production_only):
+                file_ids.add(fa.file_id)
+
+        parent_system_metrics = system_metrics([], [], self._production_only)
+        if parent_states:
+            parent_system_metrics = self._get_system_metrics(parent_id, parent_states)
+        current_system_metrics = self._get_system_metrics(commit_id, current_states)
+
+        parent_file_metrics = {}
+        parent_subfile_metrics = {}
+        if parent_states:
+            parent_ces = [ces for ces in parent_states['file'] if ces.file_id in file_ids]
+            if parent_ces:
+                parent_subfile_metrics = subfile_metrics([ces for ces in parent_states['subfile']
+                                                          if ces.file_id in file_ids])
+                parent_file_metrics = file_metrics(parent_ces)
+
+        current_file_metrics = {}
+        current_subfile_metrics = {}
+        current_ces = [ces for ces in current_states['file'] if ces.file_id in file_ids]
+        if current_ces:
+            current_subfile_metrics = subfile_metrics([ces for ces in current_states['subfile']
+                                                       if ces.file_id in file_ids])
+            current_file_metrics = file_metrics(current_ces)
+
+        files = {file_id: paths[file_id] for file_id in file_ids}
+        return static_features(files, current_system_metrics, parent_system_metrics,
+                               current_file_metrics, current_subfile_metrics,
+                               parent_file_metrics, parent_subfile_metrics)
+
+    def load(self, needed_commits, cache=None):
+        """Return the cache for the needed commits.
+
+        The cache contains revision_hash -> warning density and
+        revision_hash_parent -> static features.
+
+        :param cache: dict like store the results are written to after every chunk,
+                      default is a new dict
+        """
+        if cache is None:
+            cache = {}
+        # date order, chunks then contain neighbouring commits which share their parents and states
+        query = Commit.objects.filter(vcs_system_id=self._vcs_id).order_by('committer_date')
+        query = query.only('id', 'revision_hash', 'parents').timeout(False)
+        commits = [{'id': c[0], 'revision_hash': c[1], 'parents': c[2]}
+                   for c in query.values_list('id', 'revision_hash', 'parents')]
+        ids = {c['revision_hash']: c['id'] for c in commits}
+
+        todo = [c for c in commits if c['revision_hash'] in needed_commits]
+        for num, chunk in enumerate(chunks(todo, self._chunk_size)):
+            commit_ids = set(c['id'] for c in chunk)
+            for c in chunk:
+                if c['parents'] and c['parents'][0] in ids.keys():
+                    commit_ids.add(ids[c['parents'][0]])
+                elif c['parents']:
+                    self._log.warning('parent %s of commit %s not in the database',
+                                      c['parents'][0], c['revision_hash'])
+
+            fas, paths = self._load_file_actions(set(c['id'] for c in chunk))
+            states = self._load_states(commit_ids, list(paths.keys()))
+
+            entries = {}
+            for c in chunk:
+                entries[c['revision_hash']] = warning_density(states[c['id']]['file'],
+                                                              self._production_only)
+
+                p = None
+                if c['parents']:
+                    p = c['parents'][0]
+
+                parent_states = None
+                parent_id = ids.get(p)
+                if parent_id:
+                    parent_states = states[parent_id]
+
+                k = '{}_{}'.format(c['revision_hash'], p)
+                if k not in entries.keys() and k not in cache:
+                    entries[k] = self._static_features(fas[c['id']], paths, p, c['id'],
+                                                       states[c['id']], parent_id, parent_states)
+            cache.update(entries)
+            self._log.debug('[%s/%s] commits in metrics cache',
+                            min((num + 1) * self._chunk_size, len(todo)), len(todo))
+        return cache
@@ -0,0 +1,133 @@
+"""Bulk loading of the SmartSHARK bug-inducing labels.
+
+Instead of querying the file actions of every commit and then the file, fixing file action,
+fixing commit and issue for every induces entry, we fetch all file actions with induces entries
+of the commits in chunks and resolve everything else with $in queries.
+Issues (and their resolution check) are memoized for all labels.
+"""
+
+import logging
+
+from pycoshark.mongomodels import Commit, File, FileAction, Issue
+from pycoshark.utils import java_filename_filter, jira_is_resolved_and_fixed
+
+from util.misc import chunks
+
+
+class LabelEngine():
+    """Creates the label dicts of SmartSharkConnector.get_labels_validated and get_custom_label."""
+
+    def __init__(self, vcs_id, production_only, query_size=10000):
+        self._vcs_id = vcs_id
+        self._production_only = production_only
+        self._query_size = query_size
+        self._log = logging.getLogger('jit.smartshark.labels')
+
+        # list of (revision_hash, path, induces) in the order of the previous nested queries
+        self._inducing = None
+        self._fixing_commits = {}  # fixing file action id -> fixing commit
+        self._issues = {}  # issue id -> Issue or None
+        self._resolved = {}  # issue id -> jira_is_resolved_and_fixed
+
+    def _load(self):
+        """Fetch all file actions with induces entries and everything they reference."""
+        self._inducing = []
+        commits = list(Commit.objects.filter(vcs_system_id=self._vcs_id)
+                       .only('id', 'revision_hash')
+                       .values_list('id', 'revision_hash'))
+
+        fas = []
+        for chunk in chunks(commits, self._query_size):
+            by_commit = {commit_id: [] for commit_id, _ in chunk}
+            query = FileAction.objects(commit_id__in=list(by_commit), induces__0__exists=True)
+            for fa in query.only('id', 'commit_id', 'file_id', 'induces'):
+                by_commit[fa.commit_id].append(fa)
+            for commit_id, revision_hash in chunk:
+                for fa in by_commit[commit_id]:
+                    fas.append((revision_hash, fa))
+
+        paths = {}
+        for ids in chunks(list(set(fa.file_id for _, fa in fas)), self._query_size):
+            for f in File.objects(id__in=ids).only('id', 'path'):
+                paths[f.id] = f.path
+
+        fixing_fa_ids = set()
+        for revision_hash, fa in fas:
+            path = paths[fa.file_id]
+            if not java_filename_filter(path, production_only=self._production_only):
+                continue
+            self._inducing.append((revision_hash, path, fa.induces))
+            fixing_fa_ids.update(ind['change_file_action_id'] for ind in fa.induces)
+
+        fixing_commit_ids = {}
+        for ids in chunks(list(fixing_fa_ids), self._query_size):
+            for fa in FileAction.objects(id__in=ids).only('id', 'commit_id'):
+                fixing_commit_ids[fa.id] = fa.commit_id
+
+        commits = {}
+        fields = ('id', 'revision_hash', 'committer_date', 'fixed_issue_ids', 'linked_issue_ids')
+        for ids in chunks(list(set(fixing_commit_ids.values())), self._query_size):
+            for c in Commit.objects(id__in=ids).only(*fields):
+                commits[c.id] = c
+        self._fixing_commits = {fa_id: commits[commit_id]
+                                for fa_id, commit_id in fixing_commit_ids.items()}
+        self._log.debug('loaded %s inducing file actions with %s fixing commits',
+                        len(self._inducing), len(commits))
+
+    def _get_issues(self, issue_ids):
+        missing = [issue_id for issue_id in issue_ids if issue_id not in self._issues.keys()]
+        for ids in chunks(missing, self._query_size):
+            for i in Issue.objects(id__in=ids):
+                self._issues[i.id] = i
+            for issue_id in ids:
+                if issue_id not in self._issues.keys():
+                    self._issues[issue_id] = None
+
+    def _is_resolved(self, issue):
+        if issue.id not in self._resolved.keys():
+            self._resolved[issue.id] = jira_is_resolved_and_fixed(issue)
+        return self._resolved[issue.id]
+
+    def _labels(self, label, issue_field, is_bug):
+        if self._inducing is None:
+            self._load()
+
+        # all issues of this label at once
+        induces = [ind for _, _, inds in self._inducing for ind in inds
+                   if ind['label'] == label and ind['szz_type'] != 'hard_suspect']
+        issue_ids = []
+        for ind in induces:
+            issue_ids += getattr(self._fixing_commits[ind['change_file_action_id']], issue_field)
+        self._get_issues(list(dict.fromkeys(issue_ids)))
+
+        labels = {}
+        for revision_hash, path, inds in self._inducing:
+            for ind in inds:
+                if ind['label'] == label and ind['szz_type'] != 'hard_suspect':
+                    bugfixing_commit = self._fixing_commits[ind['change_file_action_id']]
+
+                    for issue_id in getattr(bugfixing_commit, issue_field):
+                        i = self._issues[issue_id]
+                        if i is None:
+                            continue
+                        if is_bug(i):
+                            k = '{}__{}'.format(revision_hash, path)
+                            if k not in labels.keys():
+                                labels[k] = []
+                            labels[k].append('{}__{}__{}'.format(i.external_id,
+                                                                 bugfixing_commit.revision_hash,
+                                                                 bugfixing_commit.committer_date))
+        return labels
+
+    def validated(self, label):
+        """Labels via validated links (fixed_issue_ids) to issues with validated type bug."""
+        def is_bug(i):
+            verified = i.issue_type_verified and i.issue_type_verified.lower() == 'bug'
+            return verified and self._is_resolved(i)
+        return self._labels(label, 'fixed_issue_ids', is_bug)
+
+    def custom(self, label):
+        """Labels via linked_issue_ids to issues of type bug."""
+        def is_bug(i):
+            return self._is_resolved(i) and i.issue_type and i.issue_type.lower() == 'bug'
+        return self._labels(label, 'linked_issue_ids', is_bug)
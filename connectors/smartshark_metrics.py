@@ -0,0 +1,430 @@
+"""Static source code metrics of smartSHARK and their aggregation to the static features.
+
+The aggregation functions are shared by the SmartSharkConnector and the bulk loader of the
+pre-cache, they only work on CodeEntityStates and do not query the database themselves.
+"""
+import math
+import bisect
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+from pycoshark.utils import java_filename_filter
+
+
+# Static Source Code Metrics from Sourcemeter homepage https://www.sourcemeter.com/resources/java/ 2018-07-24
+STATIC = ['PDA', 'LOC', 'CLOC', 'PUA', 'McCC', 'LLOC', 'LDC', 'NOS', 'MISM', 'CCL', 'TNOS', 'TLLOC',
+          'NLE', 'CI', 'HPL', 'MI', 'HPV', 'CD', 'NOI', 'NUMPAR', 'MISEI', 'CC', 'LLDC', 'NII', 'CCO', 'CLC', 'TCD', 'NL', 'TLOC', 'CLLC', 'TCLOC', 'MIMS', 'HDIF', 'DLOC', 'NLM', 'DIT', 'NPA', 'TNLPM',
+          'TNLA', 'NLA', 'AD', 'TNLPA', 'NM', 'TNG', 'NLPM', 'TNM', 'NOC', 'NOD', 'NOP', 'NLS', 'NG', 'TNLG', 'CBOI', 'RFC', 'NLG', 'TNLS', 'TNA', 'NLPA', 'NOA', 'WMC', 'NPM', 'TNPM', 'TNS', 'NA', 'LCOM5', 'NS', 'CBO', 'TNLM', 'TNPA']
+
+AGGREGATIONS = ['sum', 'median', 'max', 'min', 'avg']
+
+# AGGREGATIONS = ['sum']
+
+PMD_RULES = [{'type': 'Basic Rules', 'rule': 'Avoid Branching Statement As Last In Loop', 'abbrev': 'PMD_ABSALIL', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Avoid Decimal Literals In Big Decimal Constructor', 'abbrev': 'PMD_ADLIBDC', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Avoid Multiple Unary Operators', 'abbrev': 'PMD_AMUO', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Avoid Thread Group', 'abbrev': 'PMD_ATG', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Avoid Using Hard Coded IP', 'abbrev': 'PMD_AUHCIP', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Avoid Using Octal Values', 'abbrev': 'PMD_AUOV', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Big Integer Instantiation', 'abbrev': 'PMD_BII', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Boolean Instantiation', 'abbrev': 'PMD_BI', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Broken Null Check', 'abbrev': 'PMD_BNC', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Check Result Set', 'abbrev': 'PMD_CRS', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Check Skip Result', 'abbrev': 'PMD_CSR', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Class Cast Exception With To Array', 'abbrev': 'PMD_CCEWTA', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Collapsible If Statements', 'abbrev': 'PMD_CIS', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Dont Call Thread Run', 'abbrev': 'PMD_DCTR', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Dont Use Float Type For Loop Indices', 'abbrev': 'PMD_DUFTFLI', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Double Checked Locking', 'abbrev': 'PMD_DCL', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Empty Catch Block', 'abbrev': 'PMD_ECB', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Empty Finally Block', 'abbrev': 'PMD_EFB', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty If Stmt', 'abbrev': 'PMD_EIS', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty Statement Block', 'abbrev': 'PMD_EmSB', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty Statement Not In Loop', 'abbrev': 'PMD_ESNIL', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty Static Initializer', 'abbrev': 'PMD_ESI', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Empty Switch Statements', 'abbrev': 'PMD_ESS', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty Synchronized Block', 'abbrev': 'PMD_ESB', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty Try Block', 'abbrev': 'PMD_ETB', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Empty While Stmt', 'abbrev': 'PMD_EWS', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Extends Object', 'abbrev': 'PMD_EO', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'For Loop Should Be While Loop', 'abbrev': 'PMD_FLSBWL', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Jumbled Incrementer', 'abbrev': 'PMD_JI', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Misplaced Null Check', 'abbrev': 'PMD_MNC', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Override Both Equals And Hashcode', 'abbrev': 'PMD_OBEAH', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Return From Finally Block', 'abbrev': 'PMD_RFFB', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Unconditional If Statement', 'abbrev': 'PMD_UIS', 'severity': 'Major'}, {'type': 'Basic Rules', 'rule': 'Unnecessary Conversion Temporary', 'abbrev': 'PMD_UCT', 'severity': 'Minor'}, {'type': 'Basic Rules', 'rule': 'Unused Null Check In Equals', 'abbrev': 'PMD_UNCIE', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Useless Operation On Immutable', 'abbrev': 'PMD_UOOI', 'severity': 'Critical'}, {'type': 'Basic Rules', 'rule': 'Useless Overriding Method', 'abbrev': 'PMD_UOM', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'For Loops Must Use Braces', 'abbrev': 'PMD_FLMUB', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'If Else Stmts Must Use Braces', 'abbrev': 'PMD_IESMUB', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'If Stmts Must Use Braces', 'abbrev': 'PMD_ISMUB', 'severity': 'Minor'}, {'type': 'Brace Rules', 'rule': 'While Loops Must Use Braces', 'abbrev': 'PMD_WLMUB', 'severity': 'Minor'}, {'type': 'Clone Implementation Rules', 'rule': 'Clone Throws Clone Not Supported Exception', 'abbrev': 'PMD_CTCNSE', 'severity': 'Major'}, {'type': 'Clone Implementation Rules', 'rule': 'Proper Clone Implementation', 'abbrev': 'PMD_PCI', 'severity': 'Critical'}, {'type': 'Controversial Rules', 'rule': 'Assignment In Operand', 'abbrev': 'PMD_AIO', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Avoid Accessibility Alteration', 'abbrev': 'PMD_AAA', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Avoid Prefixing Method Parameters', 'abbrev': 'PMD_APMP', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Avoid Using Native Code', 'abbrev': 'PMD_AUNC', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Default Package', 'abbrev': 'PMD_DP', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Do Not Call Garbage Collection Explicitly', 'abbrev': 'PMD_DNCGCE', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Dont Import Sun', 'abbrev': 'PMD_DIS', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'One Declaration Per Line', 'abbrev': 'PMD_ODPL', 'severity': 'Minor'}, {'type': 'Controversial Rules', 'rule': 'Suspicious Octal Escape', 'abbrev': 'PMD_SOE', 'severity': 'Major'}, {'type': 'Controversial Rules', 'rule': 'Unnecessary Constructor', 'abbrev': 'PMD_UC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Abstract Class Without Abstract Method', 'abbrev': 'PMD_ACWAM', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Abstract Class Without Any Method', 'abbrev': 'PMD_AbCWAM', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Assignment To Non Final Static', 'abbrev': 'PMD_ATNFS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Avoid Constants Interface', 'abbrev': 'PMD_ACI', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Instanceof Checks In Catch Clause', 'abbrev': 'PMD_AICICC', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Avoid Protected Field In Final Class', 'abbrev': 'PMD_APFIFC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Protected Method In Final Class Not Extending', 'abbrev': 'PMD_APMIFCNE', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Reassigning Parameters', 'abbrev': 'PMD_ARP', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Avoid Synchronized At Method Level', 'abbrev': 'PMD_ASAML', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Bad Comparison', 'abbrev': 'PMD_BC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Class With Only Private Constructors Should Be Final', 'abbrev': 'PMD_CWOPCSBF', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Close Resource', 'abbrev': 'PMD_ClR', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Constructor Calls Overridable Method', 'abbrev': 'PMD_CCOM', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Default Label Not Last In Switch Stmt', 'abbrev': 'PMD_DLNLISS', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Empty Method In Abstract Class Should Be Abstract', 'abbrev': 'PMD_EMIACSBA', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Equals Null', 'abbrev': 'PMD_EN', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Field Declarations Should Be At Start Of Class', 'abbrev': 'PMD_FDSBASOC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Final Field Could Be Static', 'abbrev': 'PMD_FFCBS', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Idempotent Operations', 'abbrev': 'PMD_IO', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Immutable Field', 'abbrev': 'PMD_IF', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Instantiation To Get Class', 'abbrev': 'PMD_ITGC', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Logic Inversion', 'abbrev': 'PMD_LI', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Missing Break In Switch', 'abbrev': 'PMD_MBIS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Missing Static Method In Non Instantiatable Class', 'abbrev': 'PMD_MSMINIC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Non Case Label In Switch Statement', 'abbrev': 'PMD_NCLISS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Non Static Initializer', 'abbrev': 'PMD_NSI', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Non Thread Safe Singleton', 'abbrev': 'PMD_NTSS', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Optimizable To Array Call', 'abbrev': 'PMD_OTAC', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Position Literals First In Case Insensitive Comparisons', 'abbrev': 'PMD_PLFICIC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Position Literals First In Comparisons', 'abbrev': 'PMD_PLFIC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Preserve Stack Trace', 'abbrev': 'PMD_PST', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Return Empty Array Rather Than Null', 'abbrev': 'PMD_REARTN', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Simple Date Format Needs Locale', 'abbrev': 'PMD_SDFNL', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Simplify Boolean Expressions', 'abbrev': 'PMD_SBE', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Simplify Boolean Returns', 'abbrev': 'PMD_SBR', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Simplify Conditional', 'abbrev': 'PMD_SC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Singular Field', 'abbrev': 'PMD_SF', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Switch Stmts Should Have Default', 'abbrev': 'PMD_SSSHD', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Too Few Branches For ASwitch Statement', 'abbrev': 'PMD_TFBFASS', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Uncommented Empty Constructor', 'abbrev': 'PMD_UEC', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Uncommented Empty Method', 'abbrev': 'PMD_UEM', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Unnecessary Local Before Return', 'abbrev': 'PMD_ULBR', 'severity': 'Minor'}, {'type': 'Design Rules', 'rule': 'Unsynchronized Static Date Formatter', 'abbrev': 'PMD_USDF', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Use Collection Is Empty', 'abbrev': 'PMD_UCIE', 'severity': 'Major'}, {'type': 'Design Rules', 'rule': 'Use Locale With Case Conversions', 'abbrev': 'PMD_ULWCC', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Use Notify All Instead Of Notify', 'abbrev': 'PMD_UNAION', 'severity': 'Critical'}, {'type': 'Design Rules', 'rule': 'Use Varargs', 'abbrev': 'PMD_UV', 'severity': 'Minor'}, {'type': 'Finalizer Rules', 'rule': 'Avoid Calling Finalize', 'abbrev': 'PMD_ACF', 'severity': 'Major'}, {'type': 'Finalizer Rules', 'rule': 'Empty Finalizer', 'abbrev': 'PMD_EF', 'severity': 'Minor'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Does Not Call Super Finalize', 'abbrev': 'PMD_FDNCSF', 'severity': 'Critical'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Only Calls Super Finalize', 'abbrev': 'PMD_FOCSF', 'severity': 'Minor'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Overloaded', 'abbrev': 'PMD_FO', 'severity': 'Critical'}, {'type': 'Finalizer Rules', 'rule': 'Finalize Should Be Protected', 'abbrev': 'PMD_FSBP', 'severity': 'Critical'}, {'type': 'Import Statement Rules', 'rule': 'Dont Import Java Lang', 'abbrev': 'PMD_DIJL', 'severity': 'Minor'}, {'type': 'Import Statement Rules', 'rule': 'Duplicate Imports', 'abbrev': 'PMD_DI', 'severity': 'Minor'}, {'type': 'Import Statement Rules', 'rule': 'Import From Same Package', 'abbrev': 'PMD_IFSP', 'severity': 'Minor'}, {'type': 'Import Statement Rules', 'rule': 'Too Many Static Imports', 'abbrev': 'PMD_TMSI', 'severity': 'Major'}, {'type': 'Import Statement Rules', 'rule': 'Unnecessary Fully Qualified Name', 'abbrev': 'PMD_UFQN', 'severity': 'Minor'}, {'type': 'J2EE Rules', 'rule': 'Do Not Call System Exit', 'abbrev': 'PMD_DNCSE', 'severity': 'Critical'}, {'type': 'J2EE Rules', 'rule': 'Local Home Naming Convention', 'abbrev': 'PMD_LHNC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Local Interface Session Naming Convention', 'abbrev': 'PMD_LISNC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'MDBAnd Session Bean Naming Convention', 'abbrev': 'PMD_MDBASBNC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Remote Interface Naming Convention', 'abbrev': 'PMD_RINC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Remote Session Interface Naming Convention', 'abbrev': 'PMD_RSINC', 'severity': 'Major'}, {'type': 'J2EE Rules', 'rule': 'Static EJBField Should Be Final', 'abbrev': 'PMD_SEJBFSBF', 'severity': 'Critical'}, {'type': 'JUnit Rules', 'rule': 'JUnit Assertions Should Include Message', 'abbrev': 'PMD_JUASIM', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'JUnit Spelling', 'abbrev': 'PMD_JUS', 'severity': 'Critical'}, {'type': 'JUnit Rules', 'rule': 'JUnit Static Suite', 'abbrev': 'PMD_JUSS', 'severity': 'Critical'}, {'type': 'JUnit Rules', 'rule': 'JUnit Test Contains Too Many Asserts', 'abbrev': 'PMD_JUTCTMA', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'JUnit Tests Should Include Assert', 'abbrev': 'PMD_JUTSIA', 'severity': 'Major'}, {'type': 'JUnit Rules', 'rule': 'Simplify Boolean Assertion', 'abbrev': 'PMD_SBA', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Test Class Without Test Cases', 'abbrev': 'PMD_TCWTC', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Unnecessary Boolean Assertion', 'abbrev': 'PMD_UBA', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Use Assert Equals Instead Of Assert True', 'abbrev': 'PMD_UAEIOAT', 'severity': 'Major'}, {'type': 'JUnit Rules', 'rule': 'Use Assert Null Instead Of Assert True', 'abbrev': 'PMD_UANIOAT', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Use Assert Same Instead Of Assert True', 'abbrev': 'PMD_UASIOAT', 'severity': 'Minor'}, {'type': 'JUnit Rules', 'rule': 'Use Assert True Instead Of Assert Equals', 'abbrev': 'PMD_UATIOAE', 'severity': 'Minor'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Guard Debug Logging', 'abbrev': 'PMD_GDL', 'severity': 'Major'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Guard Log Statement', 'abbrev': 'PMD_GLS', 'severity': 'Minor'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Proper Logger', 'abbrev': 'PMD_PL', 'severity': 'Minor'}, {'type': 'Jakarta Commons Logging Rules', 'rule': 'Use Correct Exception Logging', 'abbrev': 'PMD_UCEL', 'severity': 'Major'}, {'type': 'Java Logging Rules', 'rule': 'Avoid Print Stack Trace', 'abbrev': 'PMD_APST', 'severity': 'Major'}, {'type': 'Java Logging Rules', 'rule': 'Guard Log Statement Java Util', 'abbrev': 'PMD_GLSJU', 'severity': 'Minor'}, {'type': 'Java Logging Rules', 'rule': 'Logger Is Not Static Final', 'abbrev': 'PMD_LINSF', 'severity': 'Minor'}, {'type': 'Java Logging Rules', 'rule': 'More Than One Logger', 'abbrev': 'PMD_MTOL', 'severity': 'Major'}, {'type': 'Java Logging Rules', 'rule': 'System Println', 'abbrev': 'PMD_SP', 'severity': 'Major'}, {'type': 'JavaBean Rules', 'rule': 'Missing Serial Version UID', 'abbrev': 'PMD_MSVUID', 'severity': 'Major'}, {'type': 'Naming Rules', 'rule': 'Avoid Dollar Signs', 'abbrev': 'PMD_ADS', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Avoid Field Name Matching Method Name', 'abbrev': 'PMD_AFNMMN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Avoid Field Name Matching Type Name', 'abbrev': 'PMD_AFNMTN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Boolean Get Method Name', 'abbrev': 'PMD_BGMN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Class Naming Conventions', 'abbrev': 'PMD_CNC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Generics Naming', 'abbrev': 'PMD_GN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Method Naming Conventions', 'abbrev': 'PMD_MeNC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Method With Same Name As Enclosing Class', 'abbrev': 'PMD_MWSNAEC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'No Package', 'abbrev': 'PMD_NP', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Package Case', 'abbrev': 'PMD_PC', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Short Class Name', 'abbrev': 'PMD_SCN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Short Method Name', 'abbrev': 'PMD_SMN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Suspicious Constant Field Name', 'abbrev': 'PMD_SCFN', 'severity': 'Minor'}, {'type': 'Naming Rules', 'rule': 'Suspicious Equals Method Name', 'abbrev': 'PMD_SEMN', 'severity': 'Critical'}, {'type': 'Naming Rules', 'rule': 'Suspicious Hashcode Method Name', 'abbrev': 'PMD_SHMN', 'severity': 'Critical'}, {'type': 'Naming Rules', 'rule': 'Variable Naming Conventions', 'abbrev': 'PMD_VNC', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Add Empty String', 'abbrev': 'PMD_AES', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Avoid Array Loops', 'abbrev': 'PMD_AAL', 'severity': 'Major'}, {'type': 'Optimization Rules', 'rule': 'Redundant Field Initializer', 'abbrev': 'PMD_RFI', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Unnecessary Wrapper Object Creation', 'abbrev': 'PMD_UWOC', 'severity': 'Major'}, {'type': 'Optimization Rules', 'rule': 'Use Array List Instead Of Vector', 'abbrev': 'PMD_UALIOV', 'severity': 'Minor'}, {'type': 'Optimization Rules', 'rule': 'Use Arrays As List', 'abbrev': 'PMD_UAAL', 'severity': 'Major'}, {'type': 'Optimization Rules', 'rule': 'Use String Buffer For String Appends', 'abbrev': 'PMD_USBFSA', 'severity': 'Major'}, {'type': 'Security Code Guideline Rules', 'rule': 'Array Is Stored Directly', 'abbrev': 'PMD_AISD', 'severity': 'Major'}, {'type': 'Security Code Guideline Rules', 'rule': 'Method Returns Internal Array', 'abbrev': 'PMD_MRIA', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Catching Generic Exception', 'abbrev': 'PMD_ACGE', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Catching NPE', 'abbrev': 'PMD_ACNPE', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Catching Throwable', 'abbrev': 'PMD_ACT', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Losing Exception Information', 'abbrev': 'PMD_ALEI', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Rethrowing Exception', 'abbrev': 'PMD_ARE', 'severity': 'Minor'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Throwing New Instance Of Same Exception', 'abbrev': 'PMD_ATNIOSE', 'severity': 'Minor'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Throwing Null Pointer Exception', 'abbrev': 'PMD_ATNPE', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Avoid Throwing Raw Exception Types', 'abbrev': 'PMD_ATRET', 'severity': 'Major'}, {'type': 'Strict Exception Rules', 'rule': 'Do Not Extend Java Lang Error', 'abbrev': 'PMD_DNEJLE', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Do Not Throw Exception In Finally', 'abbrev': 'PMD_DNTEIF', 'severity': 'Critical'}, {'type': 'Strict Exception Rules', 'rule': 'Exception As Flow Control', 'abbrev': 'PMD_EAFC', 'severity': 'Major'}, {'type': 'String and StringBuffer Rules', 'rule': 'Avoid Duplicate Literals', 'abbrev': 'PMD_ADL', 'severity': 'Major'}, {'type': 'String and StringBuffer Rules', 'rule': 'Avoid String Buffer Field', 'abbrev': 'PMD_ASBF', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Consecutive Appends Should Reuse', 'abbrev': 'PMD_CASR', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Consecutive Literal Appends', 'abbrev': 'PMD_CLA', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Inefficient String Buffering', 'abbrev': 'PMD_ISB', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'String Buffer Instantiation With Char', 'abbrev': 'PMD_SBIWC', 'severity': 'Critical'}, {'type': 'String and StringBuffer Rules', 'rule': 'String Instantiation', 'abbrev': 'PMD_StI', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'String To String', 'abbrev': 'PMD_STS', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Unnecessary Case Change', 'abbrev': 'PMD_UCC', 'severity': 'Minor'}, {'type': 'String and StringBuffer Rules', 'rule': 'Use Equals To Compare Strings', 'abbrev': 'PMD_UETCS', 'severity': 'Critical'}, {'type': 'Type Resolution Rules', 'rule': 'Clone Method Must Implement Cloneable', 'abbrev': 'PMD_ClMMIC', 'severity': 'Major'}, {'type': 'Type Resolution Rules', 'rule': 'Loose Coupling', 'abbrev': 'PMD_LoC', 'severity': 'Major'}, {'type': 'Type Resolution Rules', 'rule': 'Signature Declare Throws Exception', 'abbrev': 'PMD_SiDTE', 'severity': 'Major'}, {'type': 'Type Resolution Rules', 'rule': 'Unused Imports', 'abbrev': 'PMD_UnI', 'severity': 'Minor'}, {'type': 'Unnecessary and Unused Code Rules', 'rule': 'Unused Local Variable', 'abbrev': 'PMD_ULV', 'severity': 'Major'}, {'type': 'Unnecessary and Unused Code Rules', 'rule': 'Unused Private Field', 'abbrev': 'PMD_UPF', 'severity': 'Major'}, {'type': 'Unnecessary and Unused Code Rules', 'rule': 'Unused Private Method', 'abbrev': 'PMD_UPM', 'severity': 'Major'}]
+
+
+
+def system_metrics(file_states, class_states, production_only):
+    """Return sums of metrics to use them later in a difference, e.g., current_mccc - system_mccc
+    We also need to take only production files into consideration here.
+
+    :param file_states: file level CodeEntityStates of the commit
+    :param class_states: class level CodeEntityStates of the commit
+    """
+    ret = {'mccc_sum': 0, 'mccc_median': 0, 'lloc_median': 0, 'cbo': 0, 'cbo_median': 0}
+
+    classes = {}
+    for ces in class_states:
+        if ces.file_id not in classes.keys():
+            classes[ces.file_id] = []
+        classes[ces.file_id].append(ces)
+
+    mccc = []
+    lloc = []
+    cbo = []
+    for ces in file_states:
+        if java_filename_filter(ces.long_name, production_only=production_only):
+            if 'McCC' in ces.metrics.keys():
+                mccc.append(ces.metrics['McCC'])
+            if 'LLOC' in ces.metrics.keys():
+                lloc.append(ces.metrics['LLOC'])
+
+            # we also want class leve for some
+            for ces2 in classes.get(ces.file_id, []):
+                if 'CBO' in ces2.metrics.keys():
+                    cbo.append(ces2.metrics['CBO'])
+
+    if mccc:
+        ret['mccc_sum'] = np.sum(mccc)
+        ret['mccc_median'] = np.median(mccc)
+    if lloc:
+        ret['lloc_median'] = np.median(lloc)
+    if cbo:
+        ret['cbo_sum'] = np.sum(cbo)
+        ret['cbo_median'] = np.median(cbo)
+    return ret
+
+
+def _median(values):
+    """Median of a sorted list, like np.median."""
+    m = len(values) // 2
+    if len(values) % 2:
+        return float(values[m])
+    return (values[m - 1] + values[m]) / 2
+
+
+class SystemMetricAggregator():
+    """Incremental version of system_metrics() for a sequence of commits.
+
+    Consecutive commits share almost all of their code entity states. We remember the relevant
+    values of every state by its id and only apply the states which were added or removed since
+    the last commit to sorted lists (for the medians), the sums are taken exactly from the lists.
+    Only the states of the last two commits (a commit and its parent) are remembered.
+    Results are also remembered per commit, so the parent metrics of a commit are usually free.
+    """
+
+    def __init__(self, production_only, memory_size=128):
+        self._production_only = production_only
+        # ces id -> (ce_type, file_id, passes filename filter, mccc, lloc, cbo) or None if irrelevant
+        self._states = {}
+        self._ids = set()  # relevant state ids of the last commit
+        self._keep = set()  # all state ids of the last commit
+        self._mccc = []
+        self._lloc = []
+        self._cbo = []
+        self._files = {}  # file_id -> number of file states passing the filter
+        self._classes = {}  # file_id -> cbo values of the class states
+        self._memory_size = memory_size
+        self._results = OrderedDict()
+
+    def known(self, commit_id):
+        """Return True if the result of the commit is remembered, then we need no states for it."""
+        return commit_id in self._results.keys()
+
+    def missing(self, ces_ids):
+        """Return the ids of states we do not know yet."""
+        return [ces_id for ces_id in ces_ids if ces_id not in self._states.keys()]
+
+    def add_states(self, states, ces_ids=()):
+        """Remember file and class states, ces_ids which are not in states are irrelevant."""
+        for ces_id in ces_ids:
+            self._states[ces_id] = None
+        for ces in states:
+            metrics = ces.metrics or {}
+            if ces.ce_type == 'file':
+                passes = java_filename_filter(ces.long_name, production_only=self._production_only)
+                self._states[ces.id] = ('file', ces.file_id, passes, metrics.get('McCC'), metrics.get('LLOC'), None)
+            elif ces.ce_type == 'class':
+                self._states[ces.id] = ('class', ces.file_id, False, None, None, metrics.get('CBO'))
+
+    def _cbo_contribution(self, file_id, add):
+        for value in self._classes.get(file_id, []):
+            for _ in range(self._files.get(file_id, 0)):
+                if add:
+                    bisect.insort(self._cbo, value)
+                else:
+                    del self._cbo[bisect.bisect_left(self._cbo, value)]
+
+    def _apply(self, state, add):
+        ce_type, file_id, passes, mccc, lloc, cbo = state
+        if ce_type == 'class':
+            if cbo is not None:
+                if add:
+                    self._classes.setdefault(file_id, []).append(cbo)
+                else:
+                    self._classes[file_id].remove(cbo)
+            return
+
+        if not passes:
+            return
+        self._files[file_id] = self._files.get(file_id, 0) + (1 if add else -1)
+        if mccc is not None:
+            if add:
+                bisect.insort(self._mccc, mccc)
+            else:
+                del self._mccc[bisect.bisect_left(self._mccc, mccc)]
+        if lloc is not None:
+            if add:
+                bisect.insort(self._lloc, lloc)
+            else:
+                del self._lloc[bisect.bisect_left(self._lloc, lloc)]
+
+    def metrics(self, commit_id, ces_ids):
+        """Return the same dict as system_metrics() for the commit with the (known) state ids."""
+        if commit_id in self._results.keys():
+            self._results.move_to_end(commit_id)
+            return dict(self._results[commit_id])
+
+        ids = set(ces_id for ces_id in ces_ids if self._states.get(ces_id))
+        removed = self._ids - ids
+        added = ids - self._ids
+
+        # the cbo values are joined with the file states, so we re-add them for every touched file
+        touched = set(self._states[ces_id][1] for ces_id in removed | added)
+        for file_id in touched:
+            self._cbo_contribution(file_id, False)
+        for ces_id in removed:
+            self._apply(self._states[ces_id], False)
+        for ces_id in added:
+            self._apply(self._states[ces_id], True)
+        for file_id in touched:
+            self._cbo_contribution(file_id, True)
+        self._ids = ids
+
+        # the states of this and the last commit are needed for the next commit (or its parent),
+        # all others are consumed
+        keep = set(ces_ids)
+        for ces_id in [ces_id for ces_id in self._states.keys()
+                       if ces_id not in keep and ces_id not in self._keep]:
+            del self._states[ces_id]
+        self._keep = keep
+
+        ret = {'mccc_sum': 0, 'mccc_median': 0, 'lloc_median': 0, 'cbo': 0, 'cbo_median': 0}
+        if self._mccc:
+            ret['mccc_sum'] = math.fsum(self._mccc)  # no drift of running float sums
+            ret['mccc_median'] = _median(self._mccc)
+        if self._lloc:
+            ret['lloc_median'] = _median(self._lloc)
+        if self._cbo:
+            ret['cbo_sum'] = math.fsum(self._cbo)
+            ret['cbo_median'] = _median(self._cbo)
+
+        self._results[commit_id] = ret
+        while len(self._results) > self._memory_size:
+            self._results.popitem(last=False)
+        return dict(ret)
+
+
+def warning_density(file_states, production_only):
+    """Return the number of ASAT warnings per lloc of all file level CodeEntityStates.
+
+    Only states which pass the filename filter are counted.
+    """
+    lloc = 0
+    warnings = 0
+    for ces in file_states:
+        if java_filename_filter(ces.long_name, production_only=production_only):
+            if ces.metrics and 'LLOC' in ces.metrics.keys():
+                lloc += ces.metrics['LLOC']
+                warnings += len(ces.linter or [])
+    wd = 0
+    if lloc > 0:
+        wd = warnings / lloc
+    return wd
+
+
+def subfile_metrics(states):
+    """Aggregate metrics of method, class, interface and enum CodeEntityStates per file_id.
+
+    All metric values are collected in one DataFrame and aggregated with one groupby over
+    (file_id, metric). Integer and float metrics are aggregated separately so that sums,
+    minima and maxima keep the type of the metric.
+    """
+    rows = []
+    float_metrics = set()
+    for ces_current_subfile in states:
+        k = str(ces_current_subfile.file_id)
+        for metric, value in ces_current_subfile.metrics.items():
+            metric_name = '{}_{}'.format(metric, ces_current_subfile.ce_type)
+            rows.append((k, metric_name, value))
+            if isinstance(value, float):
+                float_metrics.add(metric_name)
+
+    reta = {}
+    if not rows:
+        return reta
+
+    df = pd.DataFrame(rows, columns=['file_id', 'metric', 'value'])
+    is_float = df['metric'].isin(float_metrics)
+
+    for part, dtype in [(df[~is_float], 'int64'), (df[is_float], 'float64')]:
+        if part.empty:
+            continue
+        groups = part.astype({'value': dtype}).groupby(['file_id', 'metric'], sort=False)
+        agg = groups['value'].agg(['sum', 'mean', 'median', 'min', 'max'])
+        columns = [agg[c].tolist() for c in ['sum', 'mean', 'median', 'min', 'max']]
+        for (file_id, metric_name), vsum, vavg, vmedian, vmin, vmax in zip(agg.index, *columns):
+            if file_id not in reta.keys():
+                reta[file_id] = {}
+            reta[file_id][metric_name + '_sum'] = vsum
+            reta[file_id][metric_name + '_avg'] = vavg
+            reta[file_id][metric_name + '_median'] = vmedian
+            reta[file_id][metric_name + '_min'] = vmin
+            reta[file_id][metric_name + '_max'] = vmax
+    return reta
+
+
+def file_metrics(states):
+    """Sum metrics and ASAT warnings of file level CodeEntityStates per file_id."""
+    ret = {}
+
+    for ces_current in states:
+        k = str(ces_current.file_id)
+        if k not in ret.keys():
+            ret[k] = {}
+        for metric, value in ces_current.metrics.items():
+            metric_name = '{}_{}'.format(metric, ces_current.ce_type)
+            if metric_name not in ret[k].keys():
+                ret[k][metric_name] = []
+            ret[k][metric_name].append(value)
+
+        for warning in ces_current.linter:
+            if warning['l_ty'] not in ret[k].keys():
+                ret[k][warning['l_ty']] = []
+            ret[k][warning['l_ty']].append(1)
+
+    for file_id, metrics in ret.items():
+        for metric_name, values in metrics.items():
+            # assert len(values) < 2, "name: {}, len values: {}".format(metric_name, values) this only sums PMD
+            ret[file_id][metric_name] = np.sum(values)
+    return ret
+
+
+SUBFILE_TYPES = ['class', 'method', 'interface', 'enum']
+
+# Fixed column schema of the static features, every changed file of a commit gets one float32
+# vector: the scalar features followed by the current and the parent values of all metrics.
+# The named columns (including the delta columns) are only created for the export,
+# see StaticFeatures.
+STATIC_SCALARS = ['lt', 'sm_current_WD', 'sm_parent_WD', 'sm_delta_WD', 'sm_system_WD', 'sm_parent_system_WD',
+                  'current_system_mccc_sum', 'parent_system_mccc_sum',
+                  'current_system_mccc_median', 'parent_system_mccc_median',
+                  'current_system_lloc_median', 'parent_system_lloc_median',
+                  'current_system_cbo_sum', 'parent_system_cbo_sum',
+                  'current_system_cbo_median', 'parent_system_cbo_median', 'delta_WD']
+STATIC_METRICS = [m + '_' + ce_type + '_' + a for ce_type in SUBFILE_TYPES for m in STATIC for a in AGGREGATIONS] + \
+                 [m + '_file' for m in STATIC] + \
+                 [m['abbrev'] for m in PMD_RULES]
+STATIC_COLUMNS = STATIC_SCALARS + \
+                 ['current_' + m for m in STATIC_METRICS] + \
+                 ['parent_' + m for m in STATIC_METRICS] + \
+                 ['delta_' + m for m in STATIC_METRICS]
+
+_SCALAR_INDEX = {name: i for i, name in enumerate(STATIC_SCALARS)}
+_METRIC_INDEX = {name: i for i, name in enumerate(STATIC_METRICS)}
+_COLUMN_INDEX = {name: i for i, name in enumerate(STATIC_COLUMNS)}
+_CURRENT = len(STATIC_SCALARS)
+_PARENT = _CURRENT + len(STATIC_METRICS)
+STATIC_VECTOR_SIZE = _PARENT + len(STATIC_METRICS)
+
+
+class StaticFeatures(Mapping):
+    """Read only mapping of the named static feature columns of one vector."""
+
+    __slots__ = ('_vector',)
+
+    def __init__(self, vector):
+        self._vector = vector
+
+    def _values(self):
+        current = self._vector[_CURRENT:_PARENT]
+        parent = self._vector[_PARENT:]
+        return np.concatenate([self._vector, current - parent]).tolist()
+
+    def __getitem__(self, key):
+        i = _COLUMN_INDEX[key]
+        if i < STATIC_VECTOR_SIZE:
+            return self._vector[i].item()
+        i -= STATIC_VECTOR_SIZE
+        return (self._vector[_CURRENT + i] - self._vector[_PARENT + i]).item()
+
+    def __iter__(self):
+        return iter(STATIC_COLUMNS)
+
+    def __len__(self):
+        return len(STATIC_COLUMNS)
+
+    def items(self):
+        return zip(STATIC_COLUMNS, self._values())
+
+
+def static_vector(features):
+    """Convert the named static features of the previous cache format into a vector."""
+    vector = np.zeros(STATIC_VECTOR_SIZE, dtype=np.float32)
+    for name, i in _SCALAR_INDEX.items():
+        vector[i] = features.get(name, 0)
+    for name, i in _METRIC_INDEX.items():
+        vector[_CURRENT + i] = features.get('current_' + name, 0)
+        vector[_PARENT + i] = features.get('parent_' + name, 0)
+    return vector
+
+
+def _set_metrics(vector, offset, metrics):
+    for name, value in metrics.items():
+        i = _METRIC_INDEX.get(name)
+        if i is not None:
+            vector[offset + i] = value
+
+
+def static_features(files, current_system_metrics, parent_system_metrics, current_file_metrics,
+                    current_subfile_metrics, parent_file_metrics, parent_subfile_metrics):
+    """Create the static feature vectors of the files of a commit.
+
+    The vectors are created from the aggregated metrics of the commit and its parent.
+
+    :param files: dict file_id -> path of the files changed in the commit
+    :return: dict path -> float32 vector with the layout of STATIC_SCALARS and STATIC_METRICS
+    """
+    system = np.zeros(STATIC_VECTOR_SIZE, dtype=np.float32)
+    for prefix, metrics in [('current_', current_system_metrics),
+                            ('parent_', parent_system_metrics)]:
+        for m in ['mccc_sum', 'mccc_median', 'lloc_median', 'cbo_sum', 'cbo_median']:
+            system[_SCALAR_INDEX[prefix + 'system_' + m]] = metrics.get(m, 0)
+
+    ret = {}
+    for file_id, fname in files.items():
+        k = str(file_id)
+        vector = system.copy()
+        ret[fname] = vector
+
+        if k in parent_subfile_metrics.keys():
+            _set_metrics(vector, _PARENT, parent_subfile_metrics[k])
+
+        parent_system_warning_sum = 0
+        parent_system_lloc = 0
+        if k in parent_file_metrics.keys():
+            _set_metrics(vector, _PARENT, parent_file_metrics[k])
+
+            warning_sum = 0
+            for m in PMD_RULES:
+                metric_name = m['abbrev']
+                if metric_name in parent_file_metrics[k].keys():
+                    warning_sum += parent_file_metrics[k][metric_name]
+                    parent_system_warning_sum += parent_file_metrics[k][metric_name]
+
+            if 'LOC_file' in parent_file_metrics[k].keys():
+                vector[_SCALAR_INDEX['lt']] = parent_file_metrics[k]['LOC_file']
+            parent_lloc = parent_file_metrics[k].get('LLOC_file', 0)
+            if parent_lloc > 0:
+                vector[_SCALAR_INDEX['sm_parent_WD']] = warning_sum / parent_lloc
+                parent_system_lloc += 0
+        if parent_system_lloc:
+            vector[_SCALAR_INDEX['sm_parent_system_WD']] = (parent_system_warning_sum /
+                                                            parent_system_lloc)
+
+        if k in current_subfile_metrics.keys():
+            _set_metrics(vector, _CURRENT, current_subfile_metrics[k])
+
+        system_warning_sum = 0
+        system_lloc = 0
+        if k in current_file_metrics.keys():
+            _set_metrics(vector, _CURRENT, current_file_metrics[k])
+
+            warning_sum = 0
+            for m in PMD_RULES:
+                metric_name = m['abbrev']
+                if metric_name in current_file_metrics[k].keys():
+                    warning_sum += current_file_metrics[k][metric_name]
+                    system_warning_sum += current_file_metrics[k][metric_name]
+            current_lloc = current_file_metrics[k].get('LLOC_file', 0)
+            if current_lloc > 0:
+                vector[_SCALAR_INDEX['sm_current_WD']] = warning_sum / current_lloc
+                system_lloc += 0
+        if system_lloc:
+            vector[_SCALAR_INDEX['sm_system_WD']] = system_warning_sum / system_lloc
+
+        vector[_SCALAR_INDEX['delta_WD']] = (vector[_SCALAR_INDEX['sm_current_WD']] -
+                                             vector[_SCALAR_INDEX['sm_parent_WD']])
+    return ret
@@ -0,0 +1,53 @@
+"""Convert an existing linter cache (./cache/PROJECT_pmd6.sqlite) to the compact lint_data encoding."""
+
+import os
+import argparse
+import logging
+import sys
+
+from adapters.sqlite import SQLiteDatabaseAdapter
+
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+log = logging.getLogger('jit')
+log.setLevel(logging.DEBUG)
+i = logging.StreamHandler(sys.stdout)
+e = logging.StreamHandler(sys.stderr)
+
+i.setFormatter(formatter)
+e.setFormatter(formatter)
+
+i.setLevel(logging.DEBUG)
+e.setLevel(logging.ERROR)
+
+log.addHandler(i)
+log.addHandler(e)
+
+
+def main(args):
+    args.is_test = False
+    db_file = os.path.abspath('./cache/{}_pmd6.sqlite'.format(args.project))
+
+    if not os.path.exists(db_file):
+        raise Exception('no cache file {}'.format(db_file))
+
+    size_before = os.path.getsize(db_file)
+
+    db = SQLiteDatabaseAdapter(args)
+    converted = db.convert_legacy()
+    del db
+
+    size_after = os.path.getsize(db_file)
+
+    reduction = 0
+    if size_before > 0:
+        reduction = 100 * (1 - size_after / size_before)
+    log.info('converted {} files, {:.1f} MB -> {:.1f} MB ({:.1f}% reduction)'.format(converted, size_before / 1024 / 1024, size_after / 1024 / 1024, reduction))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert linter cache to the compact encoding')
+    parser.add_argument('--project', help='Name of the project whose cache should be converted', required=True)
+    args = parser.parse_args()
+
+    main(args)
@@ -43,19 +43,23 @@ def get_project(args):
 
     c = Config(args)
 
+    c.profiler.start()
+
     # todo: can we do this in a nicer way?
     t = Traversal(c)
-    if args.state_file and os.path.isfile(args.state_file):
-        ts1 = TraversalState.load(args.state_file)
-        ts = t.update_graph(ts1)
-    else:
-        ts = t.create_graph()
+    with c.profiler.phase('graph'):
+        if args.state_file and os.path.isfile(args.state_file):
+            ts1 = TraversalState.load(args.state_file)
+            ts = t.update_graph(ts1)
+        else:
+            ts = t.create_graph()
 
     data = t.traverse(ts)
 
     if args.state_file:
         ts.save(args.state_file)
 
+    c.profiler.save(args.profile)
     return data
 
 if __name__ == '__main__':
@@ -67,6 +71,13 @@ if __name__ == '__main__':
     parser.add_argument('--file-check', help='Check files for each revision against state', required=False, action='store_true')
     parser.add_argument('--production-only', help='Restrict all files to production code', required=False, action='store_true')
     parser.add_argument('--use-linter', help='Collects Linter information for each changed file', required=False, action='store_true')
+    parser.add_argument('--lint-workers', help='Number of processes for linting all commits before the traversal', required=False, type=int, default=1)
+    parser.add_argument('--lloc-workers', help='Number of processes for counting the lloc of new files', required=False, type=int, default=1)
+    parser.add_argument('--pmd-worker', help='Run PMD in one persistent JVM instead of starting it for every commit (requires Java 11+)', required=False, action='store_true')
+    parser.add_argument('--pylint-inprocess', help='Run pylint in one persistent process which only lints changed files instead of starting it for every commit', required=False, action='store_true')
+    parser.add_argument('--profile', help='Write timings and memory usage of the phases and connector calls as JSON to this file', required=False)
+    parser.add_argument('--profile-allocations', help='Also trace all allocations for the top allocating lines of the profile (slow)', required=False, action='store_true')
+    parser.add_argument('--progress-file', help='Periodically rewrite this JSON file with the progress, throughput and cache hit rates of the traversal', required=False)
     args = parser.parse_args()
 
     data = get_project(args)
@@ -1,60 +1,89 @@
 
 import argparse
+import multiprocessing
 import timeit
 import tarfile
-import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from mongoengine import connect
+from mongoengine import connect, disconnect
 from pycoshark.mongomodels import Project, VCSSystem
 
-def main(args):
+# read size for the GridFS stream, GridFS chunks are 255 KB
+STREAM_BUFSIZE = 1024 * 1024
 
-    if not args.path.endswith('/'):
-        args.path += '/'
 
-    start = timeit.default_timer()
+def dump_project(loc, project_name, path):
+    """Extract the repository of one project from GridFS into path.
 
-    loc = {'host': args.db_host,
-           'port': int(args.db_port),
-           'db': args.db_name,
-           'username': args.db_user,
-           'password': args.db_pw,
-           'authentication_source': args.db_auth,
-           'connect': False}
+    The GridFS file is streamed directly into tarfile so we neither need the whole dump in memory nor a temporary tar.gz on disk.
+    """
+    # every worker process needs its own connection
+    disconnect()
     connect(**loc)
 
-    print(args.project, end=' ')
-
-    project = Project.objects.get(name=args.project)
+    start = timeit.default_timer()
+    project = Project.objects.get(name=project_name)
     vcs_system = VCSSystem.objects.get(project_id=project.id)
 
     # fetch file
     repository = vcs_system.repository_file
 
     if repository.grid_id is None:
-        raise Exception('no repository file for project!')
+        raise Exception('no repository file for project {}!'.format(project_name))
+
+    # extract from the gridfs stream
+    with tarfile.open(fileobj=repository.get(), mode='r|gz', bufsize=STREAM_BUFSIZE) as tar_gz:
+        tar_gz.extractall(path)
 
-    fname = '{}.tar.gz'.format(args.project)
+    return timeit.default_timer() - start
 
-    # extract from gridfs
-    with open(fname, 'wb') as f:
-        f.write(repository.read())
 
-    # extract tarfile
-    with tarfile.open(fname, "r:gz") as tar_gz:
-        tar_gz.extractall(args.path)
+def main(args):
+
+    if not args.path.endswith('/'):
+        args.path += '/'
+
+    start = timeit.default_timer()
+
+    loc = {'host': args.db_host,
+           'port': int(args.db_port),
+           'db': args.db_name,
+           'username': args.db_user,
+           'password': args.db_pw,
+           'authentication_source': args.db_auth,
+           'connect': False}
 
-    # remove tarfile
-    os.remove(fname)
+    projects = [p.strip() for p in args.project.split(',') if p.strip()]
+
+    if len(projects) == 1 or args.workers <= 1:
+        for project_name in projects:
+            print(project_name, end=' ')
+            end = dump_project(loc, project_name, args.path)
+            print('finished in {:.5f}'.format(end))
+        return
+
+    # batch mode, spawn instead of fork as pymongo clients must not be shared between processes
+    failed = []
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(projects)), mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(dump_project, loc, project_name, args.path): project_name for project_name in projects}
+        for future in as_completed(futures):
+            try:
+                print('{} finished in {:.5f}'.format(futures[future], future.result()))
+            except Exception as e:
+                print('{} failed: {}'.format(futures[future], e))
+                failed.append(futures[future])
 
     end = timeit.default_timer() - start
-    print('finished in {:.5f}'.format(end))
+    print('{}/{} projects finished in {:.5f}'.format(len(projects) - len(failed), len(projects), end))
+    if failed:
+        raise Exception('extraction failed for {}'.format(','.join(failed)))
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Extract repository dumps from the SmartSHARK database.')
-    parser.add_argument('--project', help='Name of the project to extract', required=True)
+    parser.add_argument('--project', help='Name of the project to extract, multiple projects can be separated by comma', required=True)
     parser.add_argument('--path', help='Path to which the repository should be extracted (without the project, e.g., /srv/repos/)', required=True)
+    parser.add_argument('--workers', help='Number of projects which are extracted concurrently', type=int, default=1)
 
     parser.add_argument('--db-host', help='Database host', required=True)
     parser.add_argument('--db-port', help='Database port', required=True)
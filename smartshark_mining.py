@@ -41,7 +41,7 @@ def get_project(args):
     keywords = ["fix", "bug", "repair", "issue", "error"]  # Keywords used by Pascarella et al.
     to_date = datetime.datetime(2017, 12, 31, 23, 59, 59)
 
-    con = SmartSharkConnector(args.project, args.path, args.production_only, args.labels, args.db_host, args.db_port, args.db_name, args.db_user, args.db_pw, args.db_auth)
+    con = SmartSharkConnector(args.project, args.path, args.production_only, args.labels, args.db_host, args.db_port, args.db_name, args.db_user, args.db_pw, args.db_auth, workers=args.cache_workers)
 
     args.all_branches = False
     args.is_test = False
@@ -55,10 +55,15 @@ def get_project(args):
         args.pmd_path = os.path.abspath('./checks/pmd/')
 
     c = Config(args)
+    c.profiler.start()
 
     t = Traversal(c)
-    ts = t.create_graph()
-    return t.traverse(ts)
+    with c.profiler.phase('graph'):
+        ts = t.create_graph()
+    data = t.traverse(ts)
+
+    c.profiler.save(args.profile)
+    return data
 
 
 if __name__ == '__main__':
@@ -67,11 +72,22 @@ if __name__ == '__main__':
     parser.add_argument('--path', help='Full path of the repository of the project to extract', required=True)
     parser.add_argument('--file-check', help='Check files for each revision against state', required=False, action='store_true')
     parser.add_argument('--use-maven', help='Include Maven information', required=False, action='store_true')
+    parser.add_argument('--build-offline', help='Run mvn help:effective-pom offline first, requires a pre-populated local Maven repository', required=False, action='store_true')
+    parser.add_argument('--pom-resolver', help='Create effective poms in-process, mvn is only used for parents which are not in the repository', required=False, action='store_true')
+    parser.add_argument('--build-workers', help='Number of concurrent mvn calls for evaluating all build configurations before the traversal', required=False, type=int, default=1)
     parser.add_argument('--use-linter', help='Collects PMD information for each changed file', required=False, action='store_true')
+    parser.add_argument('--lint-workers', help='Number of processes for linting all commits before the traversal', required=False, type=int, default=1)
+    parser.add_argument('--lloc-workers', help='Number of processes for counting the lloc of new files', required=False, type=int, default=1)
+    parser.add_argument('--pmd-worker', help='Run PMD in one persistent JVM instead of starting it for every commit (requires Java 11+)', required=False, action='store_true')
+    parser.add_argument('--pylint-inprocess', help='Run pylint in one persistent process which only lints changed files instead of starting it for every commit', required=False, action='store_true')
+    parser.add_argument('--profile', help='Write timings and memory usage of the phases and connector calls as JSON to this file', required=False)
+    parser.add_argument('--profile-allocations', help='Also trace all allocations for the top allocating lines of the profile (slow)', required=False, action='store_true')
+    parser.add_argument('--progress-file', help='Periodically rewrite this JSON file with the progress, throughput and cache hit rates of the traversal', required=False)
 
     # additional smartshark related information
     parser.add_argument('--production-only', help='Restrict all files to production code', required=False, action='store_true')
     parser.add_argument('--labels', help='Smartshark labels for bug-inducing, can be comma separated, e.g., JL+R,JLMIV+R', required=True, default='JL+R,JLMIV+R')
+    parser.add_argument('--cache-workers', help='Number of processes for caching the SmartSHARK features before the traversal', required=False, type=int, default=1)
 
     parser.add_argument('--db-host', help='Database host', required=True)
     parser.add_argument('--db-port', help='Database port', required=True)
@@ -0,0 +1,33 @@
+#!/bin/bash
+
+# one pom.xml, the second commit only changes a java file, the third one the pom.xml
+cd $1
+
+git init
+git config user.name "Test User"
+git config user.email "test@test.local"
+
+cat << EOF2 > ./pom.xml
+<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://maven.apache.org/POM/4.0.0 http://maven.apache.org/maven-v4_0_0.xsd">
+	<modelVersion>4.0.0</modelVersion>
+	<groupId>local.test</groupId>
+	<artifactId>main</artifactId>
+	<packaging>pom</packaging>
+	<version>1.0</version>
+	<name>main</name>
+</project>
+EOF2
+git add pom.xml
+git commit -m "init"
+
+cat << EOF2 > ./Main.java
+public class Main {
+}
+EOF2
+git add Main.java
+git commit -m "no build change"
+
+sed -i 's/<version>1.0<\/version>/<version>1.1<\/version>/' pom.xml
+git add pom.xml
+git commit -m "build change"
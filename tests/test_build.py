@@ -6,9 +6,16 @@ import logging
 import sys
 import os
 import lxml
+import shutil
+import threading
+import time
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
 
 from pprint import pprint
-from connectors.build import PomPom, PomPomError
+from connectors.build import PomPom
+from connectors.pom import PomPomError, parse_pom, get_modules
+from connectors.pom_resolver import PomResolver, ResolverError
 
 # disable logging for tests
 logging.disable(logging.CRITICAL)
@@ -26,6 +33,19 @@ log.addHandler(i)
 log.addHandler(e)
 
 
+class CountingPomPom(PomPom):
+    """Uses the pom.xml instead of Maven for the effective pom and counts the calls."""
+
+    def __init__(self, project_root, **kwargs):
+        super().__init__(project_root, **kwargs)
+        self.calls = 0
+
+    def create_effective_pom(self, pom_file):
+        self.calls += 1
+        with open(pom_file, 'rb') as f:
+            return f.read(), []
+
+
 class TestPomPom(unittest.TestCase):
     """Test basic PomPom implementation."""
 
@@ -62,8 +82,8 @@ class TestPomPom(unittest.TestCase):
             self.assertEqual(r.returncode, 0)
 
             p = PomPom(tmpdirname)
-            xml = p._parse(tmpdirname + '/pom.xml')
-            modules = p._get_modules(xml)
+            xml = parse_pom(tmpdirname + '/pom.xml')
+            modules = get_modules(xml)
 
             wants = ['package3', 'package1']
             self.assertEqual(modules, wants)
@@ -178,3 +198,225 @@ class TestPomPom(unittest.TestCase):
             self.assertEqual(poms[main_ident]['source_directory'], 'src/main/java')
             self.assertEqual(poms[main_ident]['test_source_directory'], 'src/test/java')
             self.assertEqual(poms[pmd_ident]['custom_rule_files'], {'{}/package3/pmd-ruleset.xml'.format(tmpdirname)})
+
+    def test_effective_pom_cache(self):
+        """Effective poms are only created again if a build file changes."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/build_digest.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+            revisions = subprocess.run(['git', 'rev-list', '--reverse', 'HEAD'], cwd=tmpdirname, stdout=subprocess.PIPE).stdout.decode('utf-8').split()
+
+            p = CountingPomPom(tmpdirname)
+            self.assertEqual(p.build_digest(revisions[0]), p.build_digest(revisions[1]))
+            self.assertNotEqual(p.build_digest(revisions[1]), p.build_digest(revisions[2]))
+
+            p.get_effective_poms(revisions[0])
+            p.get_effective_poms(revisions[1])
+            self.assertEqual(p.calls, 1)
+            p.get_effective_poms(revisions[2])
+            self.assertEqual(p.calls, 2)
+
+            # the effective poms survive saving and loading the cache
+            cache_file = os.path.join(tmpdirname, 'build.pickle')
+            p.save_cache(cache_file)
+            p2 = CountingPomPom(tmpdirname)
+            p2.load_cache(cache_file)
+            self.assertEqual(p2.get_effective_poms(revisions[1]), p.get_effective_poms(revisions[1]))
+            self.assertEqual(p2.calls, 0)
+
+    def test_effective_pom_errors(self):
+        """Only errors which depend on the build files are cached, e.g., a parent may be downloadable in the next run."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/build_digest.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+            revisions = subprocess.run(['git', 'rev-list', '--reverse', 'HEAD'], cwd=tmpdirname, stdout=subprocess.PIPE).stdout.decode('utf-8').split()
+
+            p = CountingPomPom(tmpdirname)
+            errors = {revisions[0]: '[ERROR] Non-resolvable parent POM for a:b:1.0', revisions[2]: '[ERROR] Non-parseable POM /pom.xml'}
+            for revision_hash, output in errors.items():
+                with mock.patch.object(CountingPomPom, 'create_effective_pom', side_effect=PomPomError(output)):
+                    with self.assertRaises(PomPomError):
+                        p.get_effective_poms(revision_hash)
+
+            # the parent error is tried again, the parse error is cached
+            self.assertEqual(len(p.get_effective_poms(revisions[0])), 1)
+            self.assertEqual(p.calls, 1)
+            with self.assertRaises(PomPomError) as cm:
+                p.get_effective_poms(revisions[2])
+            self.assertEqual(cm.exception.type, 'parse')
+            self.assertEqual(p.calls, 1)
+
+            # errors of other types in older caches are dropped on loading
+            cache_file = os.path.join(tmpdirname, 'build.pickle')
+            p._effective_poms[p.build_digest(revisions[0])] = {'error': errors[revisions[0]]}
+            p.save_cache(cache_file)
+            p2 = CountingPomPom(tmpdirname)
+            p2.load_cache(cache_file)
+            self.assertEqual(len(p2.get_effective_poms(revisions[0])), 1)
+            self.assertEqual(p2.calls, 1)
+
+    def test_update_serial(self):
+        """Offline mvn runs are concurrent, runs which update the shared local repository are not."""
+        running = {'-o': 0, '-U': 0}
+        maximum = {'-o': 0, '-U': 0}
+        lock = threading.Lock()
+
+        def run(cmds, **kwargs):
+            mode = cmds[-1]
+            with lock:
+                running[mode] += 1
+                maximum[mode] = max(maximum[mode], running[mode])
+            time.sleep(0.05)
+            with lock:
+                running[mode] -= 1
+            return subprocess.CompletedProcess(cmds, 1 if mode == '-o' else 0, b'', b'')
+
+        p = PomPom('/tmp/', offline=True, workers=4)
+        with mock.patch('connectors.build.subprocess.run', side_effect=run):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(p._run_effective_pom, ['/tmp/'] * 8))
+        self.assertEqual(maximum['-U'], 1)
+        self.assertGreater(maximum['-o'], 1)
+
+    def test_main_poms_from_git(self):
+        """Main poms from the git objects are the same as from the checked out files, unchanged poms are parsed once."""
+        for script in ['build1.sh', 'build2.sh', 'build3.sh']:
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                dirname = os.path.split(os.path.basename(tmpdirname))[-1]
+                r = subprocess.run(['/bin/bash', './tests/scripts/{}'.format(script), '{}'.format(tmpdirname), dirname], stdout=subprocess.PIPE)
+                self.assertEqual(r.returncode, 0)
+                for cmd in [['git', 'init'], ['git', 'add', '-A'], ['git', '-c', 'user.name=Test User', '-c', 'user.email=test@test.local', 'commit', '-m', 'init']]:
+                    subprocess.run(cmd, cwd=tmpdirname, stdout=subprocess.PIPE, check=True)
+                revision_hash = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=tmpdirname, stdout=subprocess.PIPE).stdout.decode('utf-8').strip()
+
+                p = PomPom(tmpdirname)
+                self.assertEqual(p.get_main_poms(revision_hash), p.get_main_poms(), script)
+                num_blobs = len(p._pom_blobs)
+                self.assertTrue(num_blobs > 0)
+
+                # the worktree is not needed
+                os.remove(os.path.join(tmpdirname, p.get_main_poms(revision_hash).pop()[1:]))
+                p.get_main_poms(revision_hash)
+                self.assertEqual(len(p._pom_blobs), num_blobs)
+
+    def test_file_metrics_source_directory(self):
+        """Files get the build information of the longest source directory containing them."""
+        def values(use_pmd, rules):
+            return {'use_pmd': use_pmd, 'use_findbugs': False, 'use_checkstyle': False, 'custom_rule_files': set(), 'rules': rules}
+
+        p = PomPom('/tmp/project')
+        self.assertFalse(p.get_file_metrics('src/main/java/A.java')['use_maven'])
+
+        p._set_build_information({'module/sub/src/main/java': values(True, {'sub'}),
+                                  'src/main/java/': values(False, {'main'}),
+                                  'module/src/main/java': values(True, {'module'})})
+        self.assertEqual(p.get_file_metrics('src/main/java/org/A.java')['custom_rules'], {'main'})
+        self.assertEqual(p.get_file_metrics('module/src/main/java/org/A.java')['custom_rules'], {'module'})
+        self.assertEqual(p.get_file_metrics('module/sub/src/main/java/org/A.java')['custom_rules'], {'sub'})
+
+        tmp = p.get_file_metrics('module/src/test/java/org/ATest.java')
+        self.assertTrue(tmp['use_maven'])
+        self.assertFalse(tmp['use_pmd'])
+        self.assertEqual(tmp['custom_rules'], set())
+
+    def test_pre_evaluate(self):
+        """The pre-evaluation creates the effective poms of every distinct build configuration in worktrees."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/build_digest.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+            revisions = subprocess.run(['git', 'rev-list', '--reverse', 'HEAD'], cwd=tmpdirname, stdout=subprocess.PIPE).stdout.decode('utf-8').split()
+
+            p = CountingPomPom(tmpdirname, workers=2)
+            p.pre_evaluate(revisions)
+            self.assertEqual(len(p._effective_poms), 2)
+
+            for revision_hash in revisions:
+                self.assertEqual(list(p.get_effective_poms(revision_hash).keys()), ['/pom.xml'])
+            self.assertEqual(p.calls, 0)
+
+    def test_resolver(self):
+        """Test the in-process effective pom with local parents, modules and properties."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            dirname = os.path.split(os.path.basename(tmpdirname))[-1]
+            r = subprocess.run(['/bin/bash', './tests/scripts/build2.sh', '{}'.format(tmpdirname), dirname], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            p = PomPom(tmpdirname, resolver=True)
+            output, replacements = p.create_effective_pom(tmpdirname + p.get_main_poms().pop())
+            self.assertEqual(replacements, [])
+            poms = p.parse_effective_pom(output)
+
+            pmd_ident = 'local.test.{}:package3-1.0-SNAPSHOT'.format(dirname)
+            self.assertEqual(set(poms.keys()), {'local.test.{0}:{0}-1.0'.format(dirname), pmd_ident, 'local.test.{}:package1-1.0-SNAPSHOT'.format(dirname)})
+            self.assertEqual(poms[pmd_ident]['version'], '3.8')
+            self.assertEqual(poms[pmd_ident]['source_directory'], 'package3/src/main/java')
+            self.assertEqual(poms[pmd_ident]['custom_rule_files'], {tmpdirname + '/package3/pmd-ruleset.xml'})
+            self.assertFalse('UselessParentheses' in poms[pmd_ident]['rules'])
+
+    def test_resolver_build_information(self):
+        """The in-process effective pom results in the build information the Maven tests expect, also without Maven."""
+        def resolve(script):
+            tmpdirname = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, tmpdirname)
+            dirname = os.path.split(os.path.basename(tmpdirname))[-1]
+            r = subprocess.run(['/bin/bash', './tests/scripts/{}'.format(script), '{}'.format(tmpdirname), dirname], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            p = PomPom(tmpdirname, resolver=True)
+            poms = p.get_main_poms()
+            self.assertEqual(len(poms), 1)
+            output, replacements = p.create_effective_pom(tmpdirname + poms.pop())
+            self.assertEqual(replacements, [])
+            return tmpdirname, dirname, p.parse_effective_pom(output)
+
+        # single pom without plugins
+        _, _, poms = resolve('build1.sh')
+        self.assertEqual(list(poms.keys()), ['local.test:main-1.0'])
+        self.assertFalse(poms['local.test:main-1.0']['use_pmd'])
+        self.assertEqual(poms['local.test:main-1.0']['source_directory'], 'src/main/java')
+        self.assertEqual(poms['local.test:main-1.0']['test_source_directory'], 'src/test/java')
+
+        # main pom in a sub directory with a module
+        _, dirname, poms = resolve('build3.sh')
+        main_ident = 'local.test.{}:main-1.0'.format(dirname)
+        p1_ident = 'local.test.{}:package1-1.0-SNAPSHOT'.format(dirname)
+        self.assertEqual(set(poms.keys()), {main_ident, p1_ident})
+        self.assertEqual(poms[main_ident]['source_directory'], 'main/src/main/java')
+        self.assertEqual(poms[p1_ident]['source_directory'], 'main/package1/src/main/java')
+        self.assertEqual(poms[p1_ident]['test_source_directory'], 'main/package1/src/test/java')
+
+        # custom rules, basic is expanded and DuplicateImport is excluded
+        tmpdirname, dirname, poms = resolve('build_custom_rule_parsing.sh')
+        main = poms['local.test.{}:main-1.0'.format(dirname)]
+        self.assertTrue(main['use_pmd'])
+        self.assertEqual(main['custom_rule_files'], {tmpdirname + '/pmd-ruleset.xml'})
+        self.assertTrue('CheckResultSet' in main['rules'])
+        self.assertFalse('DuplicateImport' in main['rules'])
+        self.assertTrue('DontImportJavaLang' in main['rules'])
+
+    def test_resolver_remote_parent(self):
+        """Parents which are not in the repository need Maven."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            dirname = os.path.split(os.path.basename(tmpdirname))[-1]
+            r = subprocess.run(['/bin/bash', './tests/scripts/build_missing_parent.sh', '{}'.format(tmpdirname), dirname], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            p = PomPom(tmpdirname)
+            with self.assertRaises(ResolverError):
+                PomResolver().effective_pom(tmpdirname + p.get_main_poms().pop())
+
+    @unittest.skipUnless(shutil.which('mvn'), 'requires Maven')
+    def test_resolver_maven_comparison(self):
+        """The in-process effective pom has to result in the same build information as Maven."""
+        for script in ['build1.sh', 'build2.sh', 'build3.sh', 'build_custom_rule_parsing.sh']:
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                dirname = os.path.split(os.path.basename(tmpdirname))[-1]
+                r = subprocess.run(['/bin/bash', './tests/scripts/{}'.format(script), '{}'.format(tmpdirname), dirname], stdout=subprocess.PIPE)
+                self.assertEqual(r.returncode, 0)
+
+                maven = PomPom(tmpdirname)
+                resolver = PomPom(tmpdirname, resolver=True)
+                for pom in maven.get_main_poms():
+                    output, _ = maven.create_effective_pom(tmpdirname + pom)
+                    resolved, _ = resolver.create_effective_pom(tmpdirname + pom)
+                    self.assertEqual(maven.parse_effective_pom(output), resolver.parse_effective_pom(resolved), script)
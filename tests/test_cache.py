@@ -0,0 +1,140 @@
+"""Tests for the linter cache."""
+import unittest
+import json
+import os
+import glob
+import tempfile
+import subprocess
+import pickle
+from array import array
+
+from pygount import SourceAnalysis
+
+from adapters.sqlite import SQLiteDatabaseAdapter
+from adapters.smartshark_cache import SmartSharkCache
+from connectors.linter import LinterConnector
+
+
+class Args():
+    """Default config object we use for these tests."""
+    project = 'tmp'
+    is_test = True
+
+
+class TestCache(unittest.TestCase):
+
+    def test_compact_encoding(self):
+        """Test that saved linter data is returned with rules and lines."""
+        db = SQLiteDatabaseAdapter(Args())
+
+        warning_list = [{'Problem': '1', 'Package': 'p', 'File': '/tmp/a/A.java', 'Priority': '3', 'Line': '2', 'Description': 'desc', 'Rule set': 'Design', 'Rule': 'UseUtilityClass'},
+                        {'Problem': '2', 'Package': 'p', 'File': '/tmp/a/A.java', 'Priority': '3', 'Line': '10', 'Description': 'desc', 'Rule set': 'Code Style', 'Rule': 'NoPackage'}]
+        files = {'A.java': {'lloc': 5, 'warnings': ['UseUtilityClass', 'NoPackage'], 'warning_list': warning_list},
+                 'B.java': {'lloc': 0, 'warnings': [], 'warning_list': []}}
+        db.save_commit('abc', files)
+
+        data = db.get_commit('abc')
+        self.assertEqual(data['A.java']['lloc'], 5)
+        self.assertEqual(data['A.java']['warnings'], ['UseUtilityClass', 'NoPackage'])
+        self.assertEqual([int(w['Line']) for w in data['A.java']['warning_list']], [2, 10])
+        self.assertEqual([db.get_rule_name(r) for r in data['A.java']['rule_ids']], ['UseUtilityClass', 'NoPackage'])
+        self.assertEqual(data['B.java'], {'lloc': 0, 'warnings': [], 'warning_list': [], 'rule_ids': array('H')})
+
+    def test_save_commit_atomic(self):
+        """A commit which fails to save is not cached partially and its new rules are not kept."""
+        db = SQLiteDatabaseAdapter(Args())
+
+        files = {'a.py': {'lloc': 5, 'warnings': ['C0111'], 'warning_list': [{'Rule': 'C0111', 'Line': 1}]},
+                 'b.py': {'lloc': 3, 'warnings': ['W0611'], 'warning_list': [{'Rule': 'W0611'}]}}  # no line
+        with self.assertRaises(KeyError):
+            db.save_commit('abc', files)
+        self.assertFalse(db.has_commit('abc'))
+        self.assertEqual(db.get_commit('abc'), {})
+        self.assertEqual(db._con.execute("SELECT count(*) FROM files").fetchone()[0], 0)
+        self.assertEqual(db._con.execute("SELECT count(*) FROM rules").fetchone()[0], 0)
+
+        files['b.py']['warning_list'][0]['Line'] = 2
+        db.save_commit('abc', files)
+        self.assertTrue(db.has_commit('abc'))
+        self.assertEqual(set(db.get_commit('abc').keys()), {'a.py', 'b.py'})
+
+    def test_aggregates(self):
+        """Test that system level aggregates and single files can be loaded without the whole commit."""
+        db = SQLiteDatabaseAdapter(Args())
+
+        files = {'a.py': {'lloc': 5, 'warnings': ['C0111'], 'warning_list': [{'Rule': 'C0111', 'Line': 1}]},
+                 'b.py': {'lloc': 3, 'warnings': [], 'warning_list': []}}
+        agg = {'warnings': 1, 'lloc': 8, 'default_warnings': 1, 'files': 2}
+
+        self.assertIsNone(db.get_aggregates('abc', 'python_True'))
+        db.save_aggregates('abc', 'python_True', agg)  # commit not saved yet, nothing happens
+        self.assertIsNone(db.get_aggregates('abc', 'python_True'))
+
+        db.save_commit('abc', files)
+        db.save_aggregates('abc', 'python_True', agg)
+        self.assertEqual(db.get_aggregates('abc', 'python_True'), agg)
+        self.assertIsNone(db.get_aggregates('abc', 'python_False'))
+        self.assertEqual(db.get_commit_files('abc', ['a.py', 'c.py']), {'a.py': dict(files['a.py'], rule_ids=array('H', [db.get_rule_id('C0111')]))})
+
+    def test_convert_legacy(self):
+        """Test conversion of JSON rows into the compact encoding."""
+        db = SQLiteDatabaseAdapter(Args())
+
+        data = {'lloc': 3, 'warnings': ['C0111'], 'warning_list': [{'message-id': 'C0111', 'line': 1, 'Rule': 'C0111', 'Line': 1}]}
+        c = db._con.cursor()
+        c.execute("INSERT INTO commits (project_id, revision_hash) VALUES (?, ?)", (db._project_id, 'abc'))
+        commit_id = c.lastrowid
+        for path in ['a.py', 'b.py', 'c.py']:
+            c.execute("INSERT INTO files (path, project_id, pmd_data) VALUES (?, ?, ?)", (path, db._project_id, json.dumps(data)))
+            c.execute("INSERT INTO files_to_commits (file_id, commit_id) VALUES (?, ?)", (c.lastrowid, commit_id))
+        db._con.commit()
+
+        # more rows than one batch
+        self.assertEqual(db.convert_legacy(batch_size=2), 3)
+        expected = {'lloc': 3, 'warnings': ['C0111'], 'warning_list': [{'Rule': 'C0111', 'Line': 1}], 'rule_ids': array('H', [db.get_rule_id('C0111')])}
+        self.assertEqual(db.get_commit('abc'), {'a.py': expected, 'b.py': expected, 'c.py': expected})
+        self.assertEqual(db.convert_legacy(), 0)
+
+    def test_lloc_cache(self):
+        """Test that the lloc from the object database matches pygount on the checked out files."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/pylint1.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            args = Args()
+            args.path = tmpdirname
+            args.language = 'python'
+            con = LinterConnector(args)
+
+            expected = {}
+            for path in glob.glob('{}/**/*.py'.format(tmpdirname), recursive=True):
+                expected[os.path.relpath(path, tmpdirname)] = SourceAnalysis.from_file(path, 'pygount').code_count
+
+            files = con.extract_lloc('HEAD')
+            self.assertEqual({path: f['lloc'] for path, f in files.items()}, expected)
+
+            # second call is served from the cache
+            self.assertEqual(len(con._con._db.get_lloc(con._lloc_cache.keys())), len(set(con._lloc_cache.keys())))
+            self.assertEqual(con.extract_lloc('HEAD'), files)
+
+    def test_smartshark_cache(self):
+        """Test the per commit SmartSHARK store and the import of the pickle cache."""
+        cache = SmartSharkCache('tmp', is_test=True, memory_size=1)
+        cache['abc'] = 0.5
+        cache.update({'abc_def': {'A.java': {'lt': 3}}, 'def': 0})
+
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.keys(), {'abc', 'abc_def', 'def'})
+        self.assertIn('abc', cache)  # not in memory anymore
+        self.assertEqual(cache['abc'], 0.5)
+        self.assertEqual(cache.get('abc_def')['A.java'], {'lt': 3})
+        self.assertIsNone(cache.get('xyz'))
+        with self.assertRaises(KeyError):
+            cache['xyz']
+
+        with tempfile.NamedTemporaryFile(suffix='.pickle') as f:
+            pickle.dump({'ghi': 1.0, 'ghi_abc': {}}, f)
+            f.flush()
+            self.assertEqual(cache.import_pickle(f.name), 2)
+        self.assertEqual(cache['ghi'], 1.0)
+        self.assertEqual(len(cache), 5)
@@ -1,6 +1,10 @@
 import unittest
 import datetime
 import os
+import copy
+import pickle
+
+from pycoshark.utils import java_filename_filter
 
 from util.config import Config
 
@@ -31,3 +35,31 @@ class ConfigTest(unittest.TestCase):
 
         self.assertEqual(b.language, 'python')
         self.assertEqual(b.extensions, ['.py'])
+
+    def test_filename_filter(self):
+        args = Args()
+        args.language = 'java'
+        args.production_only = True
+        b = Config(args)
+
+        paths = ['src/main/java/org/A.java', 'src/test/java/org/ATest.java', 'Tests/B.java', 'docs/C.java', 'src/main/java/org/package-info.java',
+                 'gen-java/D.java', 'src/main/resources/E.xml', 'examples/F.java', 'src/main/java/org/testing/G.java', 'src-test/H.java']
+        for production_only in [True, False]:
+            for path in paths:
+                self.assertEqual(b.java_filename_filter(path, production_only), java_filename_filter(path, production_only), path)
+
+        self.assertEqual(b.filter_paths(paths + ['']), [path for path in paths if java_filename_filter(path)])
+        self.assertEqual(b.filter_misses, len(paths))
+        self.assertEqual(b.filter_hits, 0)
+
+        self.assertTrue(b.filename_filter('src/main/java/org/A.java'))
+        self.assertEqual(b.filter_hits, 1)
+        self.assertEqual(b.filter_hit_rate(), 1 / (len(paths) + 1))
+
+    def test_copy(self):
+        """Copies of the config (e.g., for the pre-lint workers) do not change the original."""
+        b = Config(Args())
+        c = copy.copy(b)
+        c.path = '/tmp/worktree/'
+        self.assertEqual(b.path, '/tmp/')
+        self.assertEqual(pickle.loads(pickle.dumps(b)).path, '/tmp/')
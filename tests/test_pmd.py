@@ -6,10 +6,13 @@ import subprocess
 import logging
 import datetime
 import sys
+import re
+import shutil
 
 from pprint import pprint
 from util.traversal import Traversal
 from util.config import Config
+from connectors.pmd_worker import PMDWorker
 
 # usually we want silence in here
 # log = logging.getLogger('none')
@@ -44,6 +47,19 @@ class Args():
     pmd_path = os.path.abspath('./checks/pmd/')
 
 
+def java_version():
+    """Return the major version of the installed java or 0 if there is none."""
+    if not shutil.which('java'):
+        return 0
+    r = subprocess.run(['java', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    m = re.search(r'version "(\d+)(?:\.(\d+))?', r.stderr.decode('utf-8', 'ignore'))
+    if not m:
+        return 0
+    if m.group(1) == '1':  # 1.8 -> 8
+        return int(m.group(2))
+    return int(m.group(1))
+
+
 class TestPMD(unittest.TestCase):
 
     def test_pmd6(self):
@@ -90,3 +106,38 @@ class TestPMD(unittest.TestCase):
             self.assertEqual(files[2]['author_delta_sum_WD'], (step2_system_wd - step2_parent_system_wd))  # this is by another author
             self.assertEqual(files[4]['author_delta_sum_WD'], (system_wd - 0) + (3.0 - 2.625))  # this is the same as the first author
             self.assertEqual(files[4]['decayed_author_delta_sum_WD'], ((system_wd - 0)/2) + ((3.0 - 2.625)/1))
+
+    @unittest.skipUnless(java_version() >= 11 and os.path.isdir(os.path.join(Args.pmd_path, 'lib')), 'requires Java 11+ and PMD')
+    def test_pmd_worker(self):
+        """The persistent worker reports the same warnings as run.sh."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/features2.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            pmd_args = ['-d', tmpdirname, '-f', 'csv', '-R', '{}/all_rules.xml'.format(Args.pmd_path)]
+
+            r = subprocess.run(['{}/bin/run.sh'.format(Args.pmd_path), 'pmd'] + pmd_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=tmpdirname)
+
+            worker = PMDWorker(Args.pmd_path)
+            self.assertTrue(worker.start())
+            try:
+                # twice, the second run has to be independent of the first one
+                for _ in range(2):
+                    status, report = worker.run(pmd_args)
+                    self.assertEqual(status, r.returncode)
+                    self.assertEqual(sorted(report.decode('utf-8').splitlines()), sorted(r.stdout.decode('utf-8').splitlines()))
+            finally:
+                report_file = worker._report_file
+                worker.stop()
+            self.assertFalse(os.path.exists(report_file))
+
+    def test_pmd_worker_stop_timeout(self):
+        """A worker which does not exit after stdin is closed is killed."""
+        worker = PMDWorker(Args.pmd_path)
+        worker.STOP_TIMEOUT = 0.1
+        # ignores its stdin like a JVM which hangs in PMD or GC
+        proc = subprocess.Popen(['sleep', '60'], stdin=subprocess.PIPE)
+        worker._proc = proc
+        worker.stop()
+        self.assertIsNone(worker._proc)
+        self.assertIsNotNone(proc.returncode)
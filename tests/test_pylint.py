@@ -6,10 +6,15 @@ import subprocess
 import logging
 import datetime
 import sys
+import json
+from unittest import mock
 
 from pprint import pprint
 from util.traversal import Traversal
 from util.config import Config
+from connectors.linter import LinterConnector
+from connectors.pylint import PylintConnector
+from connectors.pylint_worker import PylintWorker
 
 # usually we want silence in here
 log = logging.getLogger('none')
@@ -62,3 +67,98 @@ class TestPylint(unittest.TestCase):
             # pprint(files)
             self.assertEqual(files[0]['current_WD'], 1.3333333333333333)
             # pprint(files)
+
+    def test_pylint_inprocess(self):
+        """Test pylint in the persistent worker process yields the same result."""
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/pylint1.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            args = Args()
+            args.path = tmpdirname
+            args.pylint_inprocess = True
+            c = Config(args)
+
+            # the pylint process is only the fallback
+            with mock.patch.object(PylintConnector, '_run_process', side_effect=AssertionError('pylint worker was not used')):
+                t = Traversal(c)
+                ts = t.create_graph()
+                files = t.traverse(ts)
+            self.assertEqual(files[0]['current_WD'], 1.3333333333333333)
+
+    def test_pre_lint(self):
+        """Pre-linting with two workers caches the same results as linting the checked out commits one after another."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/pylint1.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+            commits = subprocess.run(['git', 'rev-list', '--reverse', 'HEAD'], cwd=tmpdirname, stdout=subprocess.PIPE).stdout.decode('utf-8').split()
+
+            results = {}
+            for workers in [2, 1]:
+                # the workers need a database file which they share
+                args = Args()
+                args.path = tmpdirname
+                args.project = 'test_pre_lint_{}_{}'.format(workers, os.getpid())
+                args.is_test = False
+                db_file = './cache/{}_pmd6.sqlite'.format(args.project)
+                try:
+                    con = LinterConnector(Config(args))
+                    if workers > 1:
+                        con.pre_lint(commits, workers)
+                    else:
+                        for revision_hash in commits:
+                            subprocess.run(['git', 'checkout', '--force', revision_hash], cwd=tmpdirname, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                            con.run_linter(revision_hash)
+
+                    with mock.patch.object(PylintConnector, '_run_process', side_effect=AssertionError('commit was not cached')):
+                        results[workers] = {revision_hash: con.run_linter(revision_hash) for revision_hash in commits}
+                finally:
+                    if os.path.exists(db_file):
+                        os.remove(db_file)
+
+            self.assertEqual(results[2], results[1])
+            self.assertEqual(len(results[2]), 3)
+
+    def test_cache_hit_rate(self):
+        """Only the lookups of the current commits count for the cache hit rate, not those of the already linted parents."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/pylint1.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            args = Args()
+            args.path = tmpdirname
+            args.progress_file = os.path.join(tmpdirname, 'progress.json')
+            t = Traversal(Config(args))
+            t.traverse(t.create_graph())
+            with open(args.progress_file, 'r') as f:
+                progress = json.load(f)
+            self.assertEqual(progress['cache_hit_rates']['lint'], 0.0)
+
+    def test_untracked_file(self):
+        """Warnings of files which are not in the tree of the commit are ignored."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/pylint1.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+            revision_hash = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=tmpdirname, stdout=subprocess.PIPE).stdout.decode('utf-8').strip()
+            with open(os.path.join(tmpdirname, 'package1', 'untracked.py'), 'w', encoding='utf-8') as f:
+                f.write('import os\n')
+
+            args = Args()
+            args.path = tmpdirname
+            con = LinterConnector(Config(args))
+            _, files, cached = con.run_linter(revision_hash)
+            self.assertFalse(cached)
+            self.assertTrue(con.run_linter(revision_hash)[2])
+            con.close()
+            self.assertNotIn('package1/untracked.py', files.keys())
+            self.assertIn('package1/main.py', files.keys())
+
+    def test_pylint_worker_died(self):
+        """A dead worker raises instead of blocking so that the pylint process is used."""
+        w = PylintWorker()
+        w._proc.kill()
+        w._proc.join()
+        with self.assertRaises(Exception):
+            w.lint('/tmp/', [('a.py', 'abc')])
+        w.stop()
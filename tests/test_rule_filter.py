@@ -0,0 +1,38 @@
+"""Tests for the rule set masks."""
+import unittest
+from array import array
+
+from connectors.rule_filter import RuleFilter
+from const import MVN_DEFAULT
+
+
+def lint_data(warnings, rule_ids):
+    """File data like it is read from the database."""
+    return {'warnings': warnings, 'rule_ids': array('H', [rule_ids[w] for w in warnings])}
+
+
+class TestRuleFilter(unittest.TestCase):
+
+    def test_count(self):
+        """Test that masked counts are the same as filtering the list."""
+        rule_ids = {}
+        for w in ['UnusedFormalParameter', 'NoPackage', 'NotARule', 'CheckResultSet']:
+            rule_ids[w] = len(rule_ids) + 1
+        rf = RuleFilter(lambda: rule_ids)
+        default = frozenset(MVN_DEFAULT)
+        custom = frozenset({'NoPackage', 'UnusedFormalParameter'})
+
+        warnings = ['UnusedFormalParameter', 'NoPackage', 'UnusedFormalParameter', 'NotARule', 'CheckResultSet']
+        for rules in [default, custom, frozenset()]:
+            expected = len([w for w in warnings if w in rules])
+            self.assertEqual(rf.count(lint_data(warnings, rule_ids), rules), expected)
+            self.assertEqual(rf.count({'warnings': warnings}, rules), expected)  # not from the database
+
+        # new rules in the dictionary after the mask was created
+        rule_ids['AnotherRule'] = 5
+        rule_ids['ShortClassName'] = 6
+        warnings2 = ['AnotherRule', 'NoPackage', 'ShortClassName']
+        self.assertEqual(rf.count(lint_data(warnings2, rule_ids), custom), 1)
+        self.assertEqual(rf.count(lint_data(warnings2, rule_ids), frozenset({'ShortClassName'})), 1)
+        self.assertEqual(rf.count(lint_data(warnings2, rule_ids), {'AnotherRule', 'NoPackage'}), 2)
+        self.assertEqual(rf.count(lint_data([], rule_ids), custom), 0)
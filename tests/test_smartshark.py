@@ -3,6 +3,7 @@
 
 import math
 import json
+import os
 import importlib
 import unittest
 import datetime
@@ -10,14 +11,21 @@ import subprocess
 import tempfile
 import logging
 import sys
+from types import SimpleNamespace
+from unittest import mock
+from concurrent.futures import Future
 
 from pprint import pprint
 import mongoengine
 from bson.objectid import ObjectId
+import numpy as np
 
 from pycoshark.mongomodels import VCSSystem, Commit, CodeEntityState, File, FileAction, Issue
 
 from connectors.smartshark import SmartSharkConnector
+from connectors.smartshark_bulk import SmartSharkBulkLoader, parallel_load
+from connectors.smartshark_metrics import StaticFeatures, SystemMetricAggregator, static_vector, subfile_metrics, system_metrics
+from adapters.smartshark_cache import SmartSharkCache
 from util.traversal import Traversal
 from util.config import Config
 
@@ -51,6 +59,24 @@ class Args():
     to_date = datetime.datetime(2020, 12, 31, 23, 59, 59)
 
 
+class InlineExecutor():
+    """Runs the submitted functions directly, the mongomock database can not be shared with worker processes."""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def submit(self, fn, *args):
+        f = Future()
+        f.set_result(fn(*args))
+        return f
+
+
 class TestSmartshark(unittest.TestCase):
     """Test integration via the smartshark DB.
     This creates a mongomock in-memory database which is fed by json fixtures to set the database to a predefined state.
@@ -188,3 +214,180 @@ class TestSmartshark(unittest.TestCase):
 
             self.assertEqual(files[2]['current_WMC_class_sum'], 60)
             self.assertEqual(files[2]['current_DIT_class_sum'], 28)
+
+    def test_bulk_pre_cache(self):
+        """The bulk loader has to create the same cache as the per commit queries."""
+        self._load_fixture('dambros_metrics')
+
+        inducing_commit = Commit.objects.get(revision_hash="0d15e8da21d4c3c36fc84a8991070cc3e1e8591e")
+        parent = Commit.objects.get(revision_hash=inducing_commit.parents[0])
+        inducing_commit.code_entity_states = [CodeEntityState.objects.get(s_key=k).id for k in ['CESCOMMIT2FILEA', 'CESCOMMIT2CLASS1', 'CESCOMMIT2CLASS2']]
+        inducing_commit.save()
+        parent.code_entity_states = [CodeEntityState.objects.get(s_key='CESCOMMIT1FILEA').id]
+        parent.save()
+
+        sms = SmartSharkConnector('Testproject', None, False, 'JL+R', 'localhost', 27017, 'smartshark', 'guest', 'guest', 'smartshark', is_test=True)
+
+        expected = {}
+        for c in Commit.objects.filter(vcs_system_id=sms.vcs.id):
+            p = c.parents[0] if c.parents else None
+            expected[c.revision_hash] = sms._get_warning_density(c)
+            expected['{}_{}'.format(c.revision_hash, p)] = sms.cache_static_features(c.id, p)
+
+        cache = SmartSharkBulkLoader(sms.vcs.id, False, chunk_size=2).load(set(c.revision_hash for c in Commit.objects.all()))
+        self.assertEqual(cache.keys(), expected.keys())
+        for k, v in expected.items():
+            if '_' not in k:  # warning density
+                self.assertEqual(cache[k], v, k)
+                continue
+            self.assertEqual(cache[k].keys(), v.keys(), k)
+            for path, vector in v.items():
+                np.testing.assert_array_equal(cache[k][path], vector)
+        self.assertEqual(StaticFeatures(cache['{}_{}'.format(inducing_commit.revision_hash, parent.revision_hash)]['package1/Main.java'])['current_WMC_class_sum'], 60)
+
+    def test_parallel_load(self):
+        """Partitioning the commits over multiple workers creates the same cache entries as one serial load."""
+        self._load_fixture('dambros_metrics')
+        sms = SmartSharkConnector('Testproject', None, False, 'JL+R', 'localhost', 27017, 'smartshark', 'guest', 'guest', 'smartshark', is_test=True)
+        needed = set(c.revision_hash for c in Commit.objects.all())
+
+        expected = SmartSharkBulkLoader(sms.vcs.id, False, chunk_size=2).load(needed)
+
+        project_name = 'test_parallel_load_{}'.format(os.getpid())
+        db_file = './cache/{}_smartshark.sqlite'.format(project_name)
+        try:
+            with mock.patch('connectors.smartshark_bulk.ProcessPoolExecutor', InlineExecutor), mock.patch('connectors.smartshark_bulk.connect'), mock.patch('connectors.smartshark_bulk.disconnect'):
+                parallel_load({}, sms.vcs.id, False, needed, 2, project_name)
+            cache = SmartSharkCache(project_name)
+            self.assertEqual(cache.keys(), set(expected.keys()))
+            for k, v in expected.items():
+                if '_' not in k:  # warning density
+                    self.assertEqual(cache[k], v, k)
+                    continue
+                self.assertEqual(cache[k].keys(), v.keys(), k)
+                for path, vector in v.items():
+                    np.testing.assert_array_equal(cache[k][path], vector)
+        finally:
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+    def test_bulk_states(self):
+        """Method states are only loaded for the changed files, file and class states for all files."""
+        self._load_fixture('dambros_metrics')
+
+        commit = Commit.objects.get(revision_hash="0d15e8da21d4c3c36fc84a8991070cc3e1e8591e")
+        ces = CodeEntityState.objects.get(s_key='CESCOMMIT2CLASS1')
+        method = CodeEntityState(s_key='CESCOMMIT2METHOD1', long_name=ces.long_name + '.main()', commit_id=commit.id, file_id=ces.file_id, ce_type='method', metrics={'McCC': 2})
+        method.save()
+        commit.code_entity_states = [CodeEntityState.objects.get(s_key=k).id for k in ['CESCOMMIT2FILEA', 'CESCOMMIT2CLASS1']] + [method.id]
+        commit.save()
+
+        loader = SmartSharkBulkLoader(commit.vcs_system_id, False)
+        states = loader._load_states({commit.id}, [])[commit.id]
+        self.assertEqual(len(states['file']), 1)
+        self.assertEqual([c.ce_type for c in states['class']], ['class'])
+        self.assertEqual([c.ce_type for c in states['subfile']], ['class'])
+
+        states = loader._load_states({commit.id}, [ces.file_id])[commit.id]
+        self.assertEqual(sorted(c.ce_type for c in states['subfile']), ['class', 'method'])
+
+    def test_static_features_vector(self):
+        """Named columns of the feature vector, deltas and conversion of the previous dict format."""
+        features = {'lt': 3, 'sm_current_WD': 0.5, 'current_LLOC_file': 5, 'parent_LLOC_file': 4, 'current_PMD_AAA': 2, 'current_WMC_class_sum': 60}
+        columns = dict(StaticFeatures(static_vector(features)).items())
+
+        self.assertEqual(len(columns), len(StaticFeatures(static_vector({}))))
+        self.assertEqual(columns['lt'], 3)
+        self.assertEqual(columns['sm_current_WD'], 0.5)
+        self.assertEqual(columns['delta_LLOC_file'], 1)
+        self.assertEqual(columns['parent_PMD_AAA'], 0)
+        self.assertEqual(columns['delta_PMD_AAA'], 2)
+        self.assertEqual(columns['current_WMC_class_sum'], 60)
+        self.assertEqual(StaticFeatures(static_vector(features))['delta_LLOC_file'], 1)
+
+    def test_subfile_metrics(self):
+        """The grouped aggregation has to return the same keys, values and types as aggregating every list."""
+        states = [SimpleNamespace(file_id='f1', ce_type='method', metrics={'McCC': 1, 'HDIF': 0.5}),
+                  SimpleNamespace(file_id='f1', ce_type='method', metrics={'McCC': 4, 'HDIF': 2.0}),
+                  SimpleNamespace(file_id='f1', ce_type='class', metrics={'WMC': 20}),
+                  SimpleNamespace(file_id='f2', ce_type='method', metrics={'McCC': 3})]
+
+        expected = {}
+        for file_id in ['f1', 'f2']:
+            values = {}
+            for ces in states:
+                if ces.file_id == file_id:
+                    for m, v in ces.metrics.items():
+                        values.setdefault('{}_{}'.format(m, ces.ce_type), []).append(v)
+            expected[file_id] = {}
+            for m, v in values.items():
+                expected[file_id].update({m + '_sum': np.sum(v), m + '_avg': np.mean(v), m + '_median': np.median(v), m + '_min': np.min(v), m + '_max': np.max(v)})
+
+        result = subfile_metrics(states)
+        self.assertEqual(result, expected)
+        self.assertIsInstance(result['f1']['McCC_method_sum'], int)
+        self.assertEqual(subfile_metrics([]), {})
+
+    def test_system_metric_aggregator(self):
+        """The incremental system metrics have to be the same as aggregating all states of every commit."""
+        def ces(i, ce_type, file_id, metrics, long_name='src/main/java/A.java'):
+            return SimpleNamespace(id=i, ce_type=ce_type, file_id=file_id, long_name=long_name, metrics=metrics)
+
+        f1 = ces(1, 'file', 'f1', {'McCC': 3, 'LLOC': 10})
+        f1_changed = ces(2, 'file', 'f1', {'McCC': 5, 'LLOC': 12})
+        f2 = ces(3, 'file', 'f2', {'McCC': 2, 'LLOC': 7}, 'src/main/java/B.java')
+        f3_test = ces(4, 'file', 'f3', {'McCC': 9, 'LLOC': 50}, 'src/test/java/ATest.java')
+        c1 = ces(5, 'class', 'f1', {'CBO': 4})
+        c2 = ces(6, 'class', 'f2', {'CBO': 1})
+        c2_changed = ces(7, 'class', 'f2', {'CBO': 6})
+        c3 = ces(8, 'class', 'f3', {'CBO': 2})
+        method = ces(9, 'method', 'f1', {'McCC': 1})
+
+        commits = [[],
+                   [f1, c1, method],
+                   [f1, c1, f2, c2, f3_test, c3, method],
+                   [f1_changed, c1, f2, c2_changed, f3_test, c3],
+                   [f1_changed, f1, c1, f2, c2_changed],
+                   [f2, c2, c2_changed],
+                   [f1, c1, method]]
+
+        agg = SystemMetricAggregator(production_only=True)
+        for num, states in enumerate(commits):
+            ids = [s.id for s in states]
+            agg.add_states([s for s in states if s.id in agg.missing(ids)])
+            expected = system_metrics([s for s in states if s.ce_type == 'file'], [s for s in states if s.ce_type == 'class'], True)
+            self.assertEqual(agg.metrics(num, ids), expected)
+
+            # only the states of this commit and the last one are kept
+            self.assertLessEqual(set(agg._states.keys()), set(ids) | set(s.id for s in commits[num - 1]))
+
+        # remembered results of previous commits
+        self.assertEqual(agg.metrics(1, [s.id for s in commits[1]]), system_metrics([f1], [c1], True))
+
+        # float sums do not drift when states are added and removed
+        agg = SystemMetricAggregator(production_only=True)
+        values = [0.1, 1e16, 0.2, -1e16, 0.3]
+        for num in range(len(values)):
+            states = [ces(10 + i, 'file', 'f{}'.format(i), {'McCC': values[i], 'LLOC': 1}) for i in range(num, min(num + 3, len(values)))]
+            agg.add_states(states)
+            self.assertEqual(agg.metrics(num, [s.id for s in states])['mccc_sum'], math.fsum(values[num:num + 3]))
+
+    def test_labels(self):
+        """Labels from the bulk label engine, hard suspects and other labels are ignored."""
+        self._load_fixture('dambros_metrics')
+
+        f1 = File.objects.get(path='package1/Main.java')
+        bugfix_commit = Commit.objects.get(revision_hash='01b08853519983cd55fee85daff4ec0723f154e0')
+        inducing_commit = Commit.objects.get(revision_hash="0d15e8da21d4c3c36fc84a8991070cc3e1e8591e")
+        inducing_fa = FileAction.objects.get(commit_id=inducing_commit.id, file_id=f1.id)
+        bugfix_fa = FileAction.objects.get(commit_id=bugfix_commit.id, file_id=f1.id)
+        inducing_fa.induces = [{"change_file_action_id": bugfix_fa.id, "label": "JLMIV+R", "szz_type": "inducing"},
+                               {"change_file_action_id": bugfix_fa.id, "label": "JL+R", "szz_type": "inducing"},
+                               {"change_file_action_id": bugfix_fa.id, "label": "JL+R", "szz_type": "hard_suspect"}]
+        inducing_fa.save()
+
+        sms = SmartSharkConnector('Testproject', None, False, 'JL+R,JLMIV+R', 'localhost', 27017, 'smartshark', 'guest', 'guest', 'smartshark', is_test=True)
+        expected = {'0d15e8da21d4c3c36fc84a8991070cc3e1e8591e__package1/Main.java': ['TESTPROJECT-1__01b08853519983cd55fee85daff4ec0723f154e0__2018-01-31 23:01:01']}
+        self.assertEqual(sms.get_custom_label('JL+R'), expected)
+        self.assertEqual(sms.get_labels_validated('JLMIV+R'), expected)
+        self.assertEqual(sms.get_custom_label('NOTALABEL'), {})
@@ -6,9 +6,11 @@ import logging
 import sys
 import os
 import datetime
+import pickle
 
 from util.traversal import Traversal, TraversalState
 from util.config import Config
+from util.tracking import GlobalState
 
 from pprint import pprint
 
@@ -90,3 +92,17 @@ class TestTraversalState(unittest.TestCase):
             self.assertEqual(files2[0]['adhoc__76c75e92b3ec59e9f053b18afafa6fc2b349ebec__2018-01-03 03:01:01+02:00'], 1)
             self.assertEqual(files2[2]['adhoc__7d85669720bc0272564efc0d8562645723372600__2019-02-04 03:01:01+02:00'], 1)
             # pprint(files2)
+
+    def test_global_state_modified_lines(self):
+        """modified_lines exists before the first commit and after loading a state of an older version."""
+        args = Args()
+        args.path = '/tmp/'
+        gs = GlobalState(Config(args))
+        self.assertEqual(gs.modified_lines, {})
+
+        state = gs.__getstate__()
+        del state['modified_lines']
+        gs2 = GlobalState.__new__(GlobalState)
+        gs2.__setstate__(state)
+        self.assertEqual(gs2.modified_lines, {})
+        self.assertEqual(pickle.loads(pickle.dumps(gs)).modified_lines, {})
@@ -5,6 +5,9 @@ import subprocess
 import logging
 import datetime
 import sys
+import os
+import json
+import tracemalloc
 import pytz
 
 from pprint import pprint
@@ -133,3 +136,70 @@ class TestTraversal(unittest.TestCase):
             files = t.traverse(ts)
             self.assertEqual(files[3]['comm'], 4)  # 4 commits, 2 when named Main.java and 2 after rename to Rubbish.java
             # pprint(files)
+
+    def test_profile(self):
+        """The profiler reports the phases and calls of the traversal."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/rename.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            args = Args()
+            args.path = tmpdirname
+            args.profile = os.path.join(tmpdirname, 'profile.json')
+            args.profile_allocations = True
+            c = Config(args)
+            c.profiler.start()
+
+            t = Traversal(c)
+            with c.profiler.phase('graph'):
+                ts = t.create_graph()
+            t.traverse(ts)
+            c.profiler.save(args.profile)
+
+            with open(args.profile, 'r') as f:
+                report = json.load(f)
+            self.assertEqual(set(report['phases'].keys()), {'graph', 'labels', 'traversal', 'bug_matrix'})
+            self.assertEqual(report['counters']['commits'], len(ts.need_commits))
+            self.assertEqual(report['calls']['checkout']['count'], report['calls']['calculate_metrics']['count'])
+            self.assertTrue(report['samples'][-1]['rss'] > 0)
+            self.assertTrue(report['top_allocations'])
+
+    def test_profile_without_allocations(self):
+        """Allocations are only traced if requested."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            args = Args()
+            args.path = tmpdirname
+            args.profile = os.path.join(tmpdirname, 'profile.json')
+            c = Config(args)
+            c.profiler.start()
+            self.assertFalse(tracemalloc.is_tracing())
+            c.profiler.save(args.profile)
+
+            with open(args.profile, 'r') as f:
+                report = json.load(f)
+            self.assertEqual(report['top_allocations'], [])
+            self.assertTrue('traced' not in report['samples'][-1].keys())
+
+    def test_progress_file(self):
+        """The progress file is written at the end of the traversal."""
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            r = subprocess.run(['/bin/bash', './tests/scripts/rename_on_branch.sh', '{}'.format(tmpdirname)], stdout=subprocess.PIPE)
+            self.assertEqual(r.returncode, 0)
+
+            args = Args()
+            args.path = tmpdirname
+            args.progress_file = os.path.join(tmpdirname, 'progress.json')
+            c = Config(args)
+
+            t = Traversal(c)
+            ts = t.create_graph()
+            files = t.traverse(ts)
+
+            with open(args.progress_file, 'r') as f:
+                progress = json.load(f)
+            self.assertTrue(progress['finished'])
+            self.assertEqual(progress['commits_done'], progress['commits_total'])
+            self.assertEqual(progress['rows'], len(files))
+            self.assertTrue(progress['requeues'] > 0)
+            self.assertEqual(set(progress['cache_hit_rates'].keys()), {'filename_filter'})
+            self.assertFalse(os.path.exists(args.progress_file + '.tmp'))
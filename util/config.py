@@ -1,12 +1,26 @@
 """Config object for shared configuration information and utility functions."""
 
 import os
-from pycoshark.utils import java_filename_filter
+import re
+import sys
+from collections import OrderedDict
+
+from pycoshark.utils import TEST_FILES, DOCUMENTATION_FILES, OTHER_EXCLUSIONS
+
+from util.profile import Profiler
+
+# the exclusions of pycoshark.utils.java_filename_filter in one regex
+JAVA_EXCLUSIONS = re.compile('|'.join('(?:{})'.format(r.pattern)
+                                      for r in [TEST_FILES, DOCUMENTATION_FILES, OTHER_EXCLUSIONS]),
+                             re.IGNORECASE)
 
 
 class Config():
     """Config object shared for all of Gierlappen."""
 
+    # number of filename filter decisions which are kept
+    FILTER_CACHE_SIZE = 100000
+
     def __init__(self, args):
         # self.__dict__.update(args.__dict__)
 
@@ -38,17 +52,49 @@ class Config():
 
         # connectors
         self.use_maven = args.use_maven
+        self.build_offline = getattr(args, 'build_offline', False)
+        self.build_workers = getattr(args, 'build_workers', 1) or 1
+        self.pom_resolver = getattr(args, 'pom_resolver', False)
         self.connector = args.connector  # smartshark
         self.use_linter = args.use_linter
+        self.lint_workers = getattr(args, 'lint_workers', 1) or 1
+        self.lloc_workers = getattr(args, 'lloc_workers', 1) or 1
+        self.pmd_worker = getattr(args, 'pmd_worker', False)
+        self.pylint_inprocess = getattr(args, 'pylint_inprocess', False)
 
         # if we use pmd the path is always this
         self.pmd_path = os.path.abspath('./checks/pmd/')
 
         self.quality_keywords = args.quality_keywords
 
+        # json report of the profiler
+        self.profile = getattr(args, 'profile', None)
+        self.profiler = Profiler(enabled=bool(self.profile),
+                                 trace_allocations=getattr(args, 'profile_allocations', False))
+
+        # periodically rewritten json file with the progress of the traversal
+        self.progress_file = getattr(args, 'progress_file', None)
+
+        self._filter_cache = OrderedDict()
+        self.filter_hits = 0
+        self.filter_misses = 0
 
         self.set_extensions(args.language)
 
+    def __setstate__(self, state):
+        """The config is part of the state file.
+
+        Older state files do not have the filter cache and the profiler.
+        """
+        # copy.copy passes the __dict__ of the original, we must not share it
+        self.__dict__.update(state)
+        self.__dict__.setdefault('_filter_cache', OrderedDict())
+        self.__dict__.setdefault('filter_hits', 0)
+        self.__dict__.setdefault('filter_misses', 0)
+        self.__dict__.setdefault('profile', None)
+        self.__dict__.setdefault('profiler', Profiler())
+        self.__dict__.setdefault('progress_file', None)
+
     def set_extensions(self, language):
         if language == 'java':
             self.extensions = [".java"]  # ".pm"
@@ -75,8 +121,43 @@ class Config():
         # everyone else jump out
         return True
 
+    def java_filename_filter(self, filename, production_only=True):
+        """Same as pycoshark.utils.java_filename_filter with one regex for all exclusions."""
+        if not filename.endswith('.java') or filename.endswith('package-info.java'):
+            return False
+        if production_only:
+            return not JAVA_EXCLUSIONS.search(filename)
+        return True
+
     def filename_filter(self, filename):
+        """Return True if the file is included.
+
+        The decisions for the last FILTER_CACHE_SIZE files are kept.
+        """
+        filename = sys.intern(filename)
+        if filename in self._filter_cache:
+            self.filter_hits += 1
+            self._filter_cache.move_to_end(filename)
+            return self._filter_cache[filename]
+        self.filter_misses += 1
+
+        ret = None
         if self.language == 'java':
-            return java_filename_filter(filename, production_only=self.production_only)
+            ret = self.java_filename_filter(filename, production_only=self.production_only)
         if self.language == 'python':
-            return self.python_filename_filter(filename, production_only=self.production_only)
+            ret = self.python_filename_filter(filename, production_only=self.production_only)
+
+        self._filter_cache[filename] = ret
+        if len(self._filter_cache) > self.FILTER_CACHE_SIZE:
+            self._filter_cache.popitem(last=False)
+        return ret
+
+    def filter_paths(self, paths):
+        """Return the paths which pass the filename filter, empty paths are dropped."""
+        return [path for path in paths if path and self.filename_filter(path)]
+
+    def filter_hit_rate(self):
+        calls = self.filter_hits + self.filter_misses
+        if not calls:
+            return 0.0
+        return self.filter_hits / calls
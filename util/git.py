@@ -0,0 +1,127 @@
+"""Small helpers around the git command line which are not covered by pydriller."""
+
+import os
+import fcntl
+import subprocess
+import logging
+from contextlib import contextmanager
+
+log = logging.getLogger('jit.git')
+
+
+def _git(repo_path, *args):
+    r = subprocess.run(['git'] + list(args), cwd=repo_path, stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE)
+    if r.returncode != 0:
+        raise Exception('git {} failed: {}'.format(' '.join(args),
+                                                   r.stderr.decode('utf-8', 'ignore')))
+    return r.stdout.decode('utf-8', 'ignore')
+
+
+def first_parents(repo_path):
+    """Return a dict revision_hash -> first parent (or None) for all commits in the repository."""
+    ret = {}
+    for line in _git(repo_path, 'log', '--all', '--format=%H %P').splitlines():
+        hashes = line.split()
+        if not hashes:
+            continue
+        ret[hashes[0]] = hashes[1] if len(hashes) > 1 else None
+    return ret
+
+
+def topo_order(repo_path):
+    """Return the hashes of all commits in the repository, parents before their children."""
+    return _git(repo_path, 'rev-list', '--all', '--topo-order', '--reverse').split()
+
+
+def ls_tree(repo_path, revision_hash):
+    """Return a list of (mode, blob, path) for every file in the tree of the revision."""
+    ret = []
+    for line in _git(repo_path, 'ls-tree', '-r', '-z', '--full-tree', revision_hash).split('\0'):
+        if not line:
+            continue
+        meta, path = line.split('\t', 1)
+        mode, obj_type, blob = meta.split()
+        if obj_type != 'blob':  # submodules
+            continue
+        ret.append((mode, blob, path))
+    return ret
+
+
+def commits_changing(repo_path, suffixes):
+    """Return the hashes of all commits which change a file ending with one of the suffixes.
+
+    A suffix is, e.g., /pom.xml.
+    """
+    ret = set()
+    revision_hash = None
+    pathspec = ['*' + suffix.lstrip('/') for suffix in suffixes]
+    output = _git(repo_path, 'log', '--all', '--format=%x00%H', '--name-only', '--', *pathspec)
+    for line in output.splitlines():
+        if line.startswith('\0'):
+            revision_hash = line[1:]
+        elif line and ('/' + line).endswith(tuple(suffixes)):
+            ret.add(revision_hash)
+    return ret
+
+
+@contextmanager
+def _worktree_lock(repo_path):
+    """Serialize git worktree add/remove/prune of parallel workers.
+
+    git does not lock its administrative files of the worktrees.
+    """
+    git_dir = os.path.join(repo_path, _git(repo_path, 'rev-parse', '--git-common-dir').strip())
+    with open(os.path.join(git_dir, 'gierlappen_worktree.lock'), 'w', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def add_worktree(repo_path, worktree_path, revision_hash):
+    """Create a detached worktree of the repository at worktree_path (empty or non-existing)."""
+    with _worktree_lock(repo_path):
+        _git(repo_path, 'worktree', 'add', '--detach', '--force', worktree_path, revision_hash)
+
+
+def checkout_worktree(worktree_path, revision_hash):
+    """Checkout revision_hash inside of an existing worktree."""
+    _git(worktree_path, 'checkout', '--detach', '--force', revision_hash)
+
+
+def remove_worktree(repo_path, worktree_path):
+    """Remove the worktree and its administrative files."""
+    with _worktree_lock(repo_path):
+        try:
+            _git(repo_path, 'worktree', 'remove', '--force', worktree_path)
+        except Exception as e:
+            log.warning('could not remove worktree %s: %s', worktree_path, e)
+        _git(repo_path, 'worktree', 'prune')
+
+
+class BlobReader():
+    """Reads blobs from the object database with one persistent git cat-file --batch process."""
+
+    def __init__(self, repo_path):
+        self._proc = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=repo_path,
+                                      stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, blob):
+        """Return the content of the blob as bytes."""
+        self._proc.stdin.write('{}\n'.format(blob).encode('ascii'))
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline().decode('ascii').split()
+        if len(header) != 3:
+            raise Exception('git cat-file could not read {}: {}'.format(blob, ' '.join(header)))
+        content = self._proc.stdout.read(int(header[2]))
+        self._proc.stdout.read(1)  # trailing newline
+        return content
+
+    def close(self):
+        """Stop the git cat-file process."""
+        if self._proc:
+            self._proc.stdin.close()
+            self._proc.wait()
+            self._proc = None
@@ -0,0 +1,24 @@
+"""Small list helpers shared by the connectors."""
+
+
+def chunks(lst, size):
+    """Yield successive slices of lst with at most size items, e.g., for $in queries."""
+    for i in range(0, len(lst), size):
+        yield lst[i:i + size]
+
+
+def split(lst, parts):
+    """Split lst into at most parts contiguous, non-empty lists of (almost) equal size.
+
+    Contiguous parts keep neighbouring items (e.g., commits in topological order)
+    in the same worker.
+    """
+    size, rest = divmod(len(lst), parts)
+    ret = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < rest else 0)
+        if end > start:
+            ret.append(lst[start:end])
+        start = end
+    return ret
@@ -0,0 +1,146 @@
+"""Optional profiling of a traversal run.
+
+Measures wall and CPU time of the traversal phases and of the expensive connector calls,
+counts events and samples the memory usage. Tracing the allocations with tracemalloc slows
+the run down considerably, so the top allocating lines are a separate opt-in.
+A disabled profiler only passes through so it can always be called.
+"""
+
+import os
+import json
+import time
+import resource
+import tracemalloc
+from contextlib import contextmanager
+
+
+def rss():
+    """Current resident set size in bytes, falls back to the peak if /proc is not available."""
+    try:
+        with open('/proc/self/statm', 'r', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler():
+    """Collects timings, counters and memory samples of one run and writes them as JSON."""
+
+    def __init__(self, enabled=False, trace_allocations=False, sample_every=100,
+                 top_allocations=25):
+        """
+        :param trace_allocations: trace all allocations with tracemalloc for the top allocations
+        :param sample_every: take a memory sample after this many commits
+        :param top_allocations: number of source lines with the largest allocations in the report
+        """
+        self.enabled = enabled
+        self.trace_allocations = enabled and trace_allocations
+        self._sample_every = sample_every
+        self._top_allocations = top_allocations
+
+        self.phases = {}  # name -> timing
+        self.calls = {}  # name -> timing
+        self.counters = {}
+        self.samples = []
+        self._running = {}  # phase name -> (wall, cpu) at the start
+        self._start = None
+
+    def start(self):
+        """Start the overall timing and the allocation tracing."""
+        if not self.enabled:
+            return
+        self._start = (time.perf_counter(), time.process_time())
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.sample('start')
+
+    def _add(self, timings, name, wall, cpu):
+        if name not in timings.keys():
+            timings[name] = {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'max_wall': 0.0}
+        t = timings[name]
+        t['count'] += 1
+        t['wall'] += wall
+        t['cpu'] += cpu
+        t['max_wall'] = max(t['max_wall'], wall)
+
+    def start_phase(self, name):
+        """Start the timing of a phase, e.g., the traversal."""
+        if self.enabled:
+            self._running[name] = (time.perf_counter(), time.process_time())
+
+    def stop_phase(self, name):
+        """Stop the timing of a started phase and take a memory sample."""
+        if not self.enabled or name not in self._running.keys():
+            return
+        wall, cpu = self._running.pop(name)
+        self._add(self.phases, name, time.perf_counter() - wall, time.process_time() - cpu)
+        self.sample(name)
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the enclosed block as phase."""
+        self.start_phase(name)
+        try:
+            yield
+        finally:
+            self.stop_phase(name)
+
+    @contextmanager
+    def call(self, name):
+        """Measure one call, e.g., of a connector."""
+        if not self.enabled:
+            yield
+            return
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self._add(self.calls, name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def count(self, name, num=1):
+        """Increase a counter, every sample_every commits a memory sample is taken."""
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + num
+        if name == 'commits' and self.counters[name] % self._sample_every == 0:
+            self.sample('commits')
+
+    def sample(self, label):
+        """Remember the current memory usage."""
+        if not self.enabled:
+            return
+        s = {'label': label,
+             'wall': time.perf_counter() - self._start[0] if self._start else 0.0,
+             'commits': self.counters.get('commits', 0),
+             'rss': rss()}
+        if self.trace_allocations and tracemalloc.is_tracing():
+            s['traced'], s['traced_peak'] = tracemalloc.get_traced_memory()
+        self.samples.append(s)
+
+    def report(self):
+        """Return the collected timings, counters, samples and top allocations."""
+        ret = {'phases': self.phases,
+               'calls': self.calls,
+               'counters': self.counters,
+               'samples': self.samples,
+               'top_allocations': []}
+        if self._start:
+            ret['wall'] = time.perf_counter() - self._start[0]
+            ret['cpu'] = time.process_time() - self._start[1]
+        if self.trace_allocations and tracemalloc.is_tracing():
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:self._top_allocations]:
+                ret['top_allocations'].append({'location': str(stat.traceback),
+                                               'size': stat.size,
+                                               'count': stat.count})
+        return ret
+
+    def save(self, filename):
+        """Write the report to filename and stop tracing allocations."""
+        if not self.enabled:
+            return
+        self.sample('end')
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        if self.trace_allocations:
+            tracemalloc.stop()
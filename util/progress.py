@@ -0,0 +1,43 @@
+"""Progress of a long traversal run in a JSON file.
+
+The file is rewritten at most every interval seconds so that the progress, throughput
+and cache hit rates of a run can be monitored without reading the log.
+"""
+
+import os
+import json
+import time
+import datetime
+
+
+def hit_rate(hits, misses):
+    """Return the share of hits of all lookups, None if there were no lookups."""
+    if not hits + misses:
+        return None
+    return hits / (hits + misses)
+
+
+class Progress():
+    """Periodically rewrites the progress file, does nothing if there is no file."""
+
+    def __init__(self, filename=None, interval=30):
+        self._filename = filename
+        self._interval = interval
+        self._last = None
+
+    def due(self):
+        """Return True if the file should be written now."""
+        if self._filename is None:
+            return False
+        return self._last is None or time.monotonic() - self._last >= self._interval
+
+    def write(self, values):
+        """Write the values atomically, readers never see a partial file."""
+        if self._filename is None:
+            return
+        self._last = time.monotonic()
+        values = dict(values, updated_at=datetime.datetime.now().isoformat())
+        tmp_file = '{}.tmp'.format(self._filename)
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(values, f, indent=2)
+        os.replace(tmp_file, self._filename)
@@ -65,6 +65,7 @@ class GlobalState:
         self._pmd_con = False
         self._build_con = False
         self._wd_cache = {}
+        self.modified_lines = {}  # path -> (added, deleted line numbers) of the current commit
 
         self.metrics = []
 
@@ -79,6 +80,7 @@ class GlobalState:
         """We need to re-set the _pmd_con"""
         self.__dict__ = state
         self._pmd_con = False
+        self.__dict__.setdefault('modified_lines', {})  # states of older versions
 
     def __getstate__(self):
         """We exclude possible sqlite database connections here from pickling to the state file.
@@ -116,6 +118,15 @@ class GlobalState:
     def set_smartshark_connector(self, sm_con):
         self._sm_con = sm_con
 
+    def set_profiler(self, profiler):
+        """Set the profiler of this run, a loaded state has the config of the previous run."""
+        self._config.profiler = profiler
+
+    def get_connectors(self):
+        """Return the set connectors by name."""
+        connectors = {'lint': self._pmd_con, 'build': self._build_con, 'smartshark': self._sm_con}
+        return {name: con for name, con in connectors.items() if con}
+
     def add_author(self, commit):
         author = self.get_author(commit)
 
@@ -161,6 +172,12 @@ class GlobalState:
             else:
                 self.modifications.append((mod.change_type, mod.new_path, mod.old_path, mod.added, mod.removed, mod.nloc, added_line_numbers, deleted_line_numbers))
 
+        # changed line numbers per path for the linter, the first modification of a path wins
+        self.modified_lines = {}
+        for _, new_path, _, _, _, _, added_line_numbers, deleted_line_numbers in self.modifications:
+            if new_path not in self.modified_lines.keys():
+                self.modified_lines[new_path] = (set(added_line_numbers), set(deleted_line_numbers))
+
         # try to find missing renames
         adds = []
         dels = []
@@ -421,7 +438,9 @@ class GlobalState:
                     self._log.debug('committer date %s <= to_date %s', commit.committer_date, self._config.to_date)
                     # We skip all metrics if we do not have the smartshark data, otherwise we would have missing features
                     try:
-                        tmp.update(**self._sm_con.get_static_features(original_name, commit.hash, parent))
+                        with self._config.profiler.call('get_static_features'):
+                            # expanded into named columns on export
+                            tmp['static_features'] = self._sm_con.get_static_features(original_name, commit.hash, parent)
                         self._log.warning('commit %s not ins smartshark database, skipping', commit.hash)
                     except:
                         return
@@ -6,6 +6,7 @@ import logging
 import hashlib
 import pickle
 import pprint
+import time
 
 from collections import deque
 
@@ -16,6 +17,8 @@ from pydriller.domain.commit import ModificationType
 from connectors.linter import LinterConnector
 from connectors.build import PomPom
 from util.path import OntdekBaan
+from util.profile import rss
+from util.progress import Progress, hit_rate
 from util.tracking import GlobalState, PathState
 
 
@@ -73,7 +76,12 @@ class Traversal:
         self._is_test = args.is_test
         self._production_only = args.production_only
         self._use_linter = args.use_linter
+        self._lint_workers = args.lint_workers
         self._use_maven = args.use_maven
+        self._build_offline = args.build_offline
+        self._build_workers = args.build_workers
+        self._pom_resolver = args.pom_resolver
+        self._profiler = args.profiler
         if args.quality_keywords:
             self._quality_keywords = args.quality_keywords
 
@@ -94,6 +102,7 @@ class Traversal:
         fresh_ts.commit_cache = ts.commit_cache
         #fresh_ts.labels = ts.labels
         fresh_ts.global_state = ts.global_state
+        fresh_ts.global_state.set_profiler(self._profiler)  # the loaded state has the config of the previous run
         fresh_ts.path_state = ts.path_state
         fresh_ts.needs_cache.update(ts.needs_cache)
 
@@ -242,7 +251,7 @@ class Traversal:
 
         # add build connector
         if self._use_maven:
-            pompom = PomPom(self.project_path)
+            pompom = PomPom(self.project_path, offline=self._build_offline, workers=self._build_workers, resolver=self._pom_resolver, profiler=self._profiler)
             ts.global_state.set_build_connector(pompom)
             build_cache_file = './cache/{}_build.pickle'.format(self.project_name)
             if os.path.exists(build_cache_file):
@@ -250,172 +259,198 @@ class Traversal:
 
         # grab inducings
         self._log.info('loading inducing changes')
+        with self._profiler.phase('labels'):
+            # we may need a type of connector architecture here too
+            #if self._use_github_issues:
+            #    pass
+
+            inducings = self.get_adhoc_labels()
+            inducing_commits, inducing_files = self.get_unique_bics()
+
+            ts.global_state.set_adhoc_inducing(inducings)
+            ts.global_state.set_inducing_commits(inducing_commits)
+            ts.global_state.set_inducing_files(inducing_files)
+
+            if self._connector:
+                for label, label_data in self._connector.get_labels().items():
+                    self._log.info('saving labels for %s', label)
+                    ts.global_state.set_its_inducing(label, label_data)
+                    ts.labels.append(label)
+        self._log.info('finished inducing changes')
 
-        # we may need a type of connector architecture here too
-        #if self._use_github_issues:
-        #    pass
-
-        inducings = self.get_adhoc_labels()
-        inducing_commits, inducing_files = self.get_unique_bics()
-
-        ts.global_state.set_adhoc_inducing(inducings)
-        ts.global_state.set_inducing_commits(inducing_commits)
-        ts.global_state.set_inducing_files(inducing_files)
+        # lint everything we need up front in parallel, the traversal then only reads from the cache
+        if self._use_linter and self._lint_workers > 1 and not self._is_test:
+            self._log.info('pre-linting commits')
+            with self._profiler.phase('pre_lint'):
+                linter_con.pre_lint(ts.need_commits, self._lint_workers)
+            self._log.info('finished pre-linting commits')
 
-        if self._connector:
-            for label, label_data in self._connector.get_labels().items():
-                self._log.info('saving labels for %s', label)
-                ts.global_state.set_its_inducing(label, label_data)
-                ts.labels.append(label)
-        self._log.info('finished inducing changes')
+        # evaluate all build configurations up front in parallel
+        if self._use_maven and self._build_workers > 1 and not self._is_test:
+            self._log.info('pre-evaluating build configurations')
+            with self._profiler.phase('pre_build'):
+                pompom.pre_evaluate(ts.need_commits)
+            self._log.info('finished pre-evaluating build configurations')
 
         # pre cache connector
         if self._connector:
             self._log.info('cache commits')
-            self._connector.pre_cache(ts.need_commits)
+            with self._profiler.phase('pre_cache'):
+                self._connector.pre_cache(ts.need_commits)
             self._log.info('finished caching commits')
 
         # traverse paths
-        empty_cycle = 0
-        while len(ts.need_commits) != len(ts.commits):
+        with self._profiler.phase('traversal'):
+            progress = Progress(self._args.progress_file)
+            run = {'start': time.monotonic(), 'commits': len(ts.commits), 'requeues': 0}
+            empty_cycle = 0
+            while len(ts.need_commits) != len(ts.commits):
 
-            gr2 = GitRepository(self.project_path)  # maybe this will help memory leaks with GitPython/subprocess somewhat
+                gr2 = GitRepository(self.project_path)  # maybe this will help memory leaks with GitPython/subprocess somewhat
 
-            for pathnum, (pathkey, que) in enumerate(ts.paths.items()):
+                for pathnum, (pathkey, que) in enumerate(ts.paths.items()):
 
-                # skip if we have nothing to do on this path
-                if len(que) == 0:
-                    self._log.debug('skipping path %s (%s/%s), %s/%s commits, nothing to do', pathnum, ts.initial_path_lengths[pathkey] - len(que), ts.initial_path_lengths[pathkey], len(ts.commits), len(ts.need_commits))
+                    # skip if we have nothing to do on this path
+                    if len(que) == 0:
+                        self._log.debug('skipping path %s (%s/%s), %s/%s commits, nothing to do', pathnum, ts.initial_path_lengths[pathkey] - len(que), ts.initial_path_lengths[pathkey], len(ts.commits), len(ts.need_commits))
 
-                    continue
-
-                self._log.info('starting path %s (%s/%s), %s/%s commits', pathnum, ts.initial_path_lengths[pathkey] - len(que), ts.initial_path_lengths[pathkey], len(ts.commits), len(ts.need_commits))
-                while que:
-
-                    metrics = {}
-                    revision_hash = que.popleft()
-                    c = gr2.get_commit(revision_hash)
+                        continue
 
-                    # we require that we have seen all parents, otherwise we put the commit back on the stack
-                    requeue = False
-                    for parent in c.parents:
-                        if parent not in ts.commits:
-                            self._log.info('[%s] requeue, parent %s is not finished', revision_hash, parent)
+                    self._log.info('starting path %s (%s/%s), %s/%s commits', pathnum, ts.initial_path_lengths[pathkey] - len(que), ts.initial_path_lengths[pathkey], len(ts.commits), len(ts.need_commits))
+                    while que:
+
+                        metrics = {}
+                        revision_hash = que.popleft()
+                        c = gr2.get_commit(revision_hash)
+
+                        # we require that we have seen all parents, otherwise we put the commit back on the stack
+                        requeue = False
+                        for parent in c.parents:
+                            if parent not in ts.commits:
+                                self._log.info('[%s] requeue, parent %s is not finished', revision_hash, parent)
+                                requeue = True
+                                break
+
+                        # next case, if the commit needs cache because it is the first on a path but the cache is not yet filled
+                        # we assume that another path needs to fill the cache first for that commit
+                        # the only exception from this rule are origin commits
+                        if not requeue and revision_hash not in ts.commits and revision_hash in ts.needs_cache and len(c.parents) > 0 and ts.initial_path_lengths[pathkey] == len(que) + 1:
+                            self._log.info('[%s] requeue, the commit is the first on path %s and not an orphan commit but the cache is not yet filled', revision_hash, pathnum)
                             requeue = True
-                            break
 
-                    # next case, if the commit needs cache because it is the first on a path but the cache is not yet filled
-                    # we assume that another path needs to fill the cache first for that commit
-                    # the only exception from this rule are origin commits
-                    if not requeue and revision_hash not in ts.commits and revision_hash in ts.needs_cache and len(c.parents) > 0 and ts.initial_path_lengths[pathkey] == len(que) + 1:
-                        self._log.info('[%s] requeue, the commit is the first on path %s and not an orphan commit but the cache is not yet filled', revision_hash, pathnum)
-                        requeue = True
-
-                    # if we could use the commit (cache is filled and parent is finished) we set the min_path_date
-                    if not requeue and revision_hash not in ts.commits and not requeue and c.committer_date < ts.min_path_date:
-                        ts.min_path_date = c.committer_date
-
-                    # we want to traverse all paths in date order, if the current commit is not the next in date order we put it back on the stack
-                    if not requeue and revision_hash not in ts.commits and c.committer_date != ts.dates[0]:
-                        self._log.info('[%s] requeue, commit date is unequal to next date in date-order list %s != %s', revision_hash, c.committer_date, ts.dates[0])
-                        # set min date we want to use if we have multiple passes
-                        if ts.min_date > c.committer_date:
-                            ts.min_date = c.committer_date
-                        self._log.info('[%s] empty_cycle %s min_date %s, min_path_date %s', revision_hash, empty_cycle, ts.min_date, ts.min_path_date)
-
-                        # if we are moving around in circles without finishing anything because of the date we are using
-                        # the next minimum date of the last cycle is used (the next node we can use with minimum date)
-                        if empty_cycle > 1 and c.committer_date == ts.min_path_date:
-                            self._log.info('[%s] switching date in date-order list %s != %s', revision_hash, c.committer_date, ts.dates[0])
-                            tmp = ts.dates.index(ts.min_path_date)
-                            ts.dates[0], ts.dates[tmp] = ts.dates[tmp], ts.dates[0]
-                        else:
-                            requeue = True
-                            # if we are further along the cycle and still hit this we chose the minimum date of all currently queued commits
-                            # if empty_cycle > 3 and c.committer_date == min_path_date:
-                            #     log.info('[{}] min_path_date trigger, switching date in date-order list {} != {}'.format(revision_hash, c.committer_date, dates[0]))
-                            #     tmp = dates.index(min_path_date)
-                            #     dates[0], dates[tmp] = dates[tmp], dates[0]
-                            # else:
-                            #     requeue = True
-
-                    # if we need to requeue we better also jump to the next path number
-                    if requeue:
-                        self._log.debug('[%s] putting back on stack', revision_hash)
-                        que.appendleft(revision_hash)
-                        break
-
-                    # if we neede cache we load it
-                    if revision_hash in ts.commits and revision_hash in ts.needs_cache:
-                        old_files = len(ts.path_state[pathkey].files.keys())
-                        ts.path_state[pathkey] = PathState(files=copy.deepcopy(ts.commit_cache[revision_hash].files))
-                        new_files = len(ts.path_state[pathkey].files.keys())
-                        self._log.info('[%s] load from cache, files %s -> %s', revision_hash, old_files, new_files)
-
-                    # skip on already extracted commits
-                    if revision_hash in ts.commits:
-                        self._log.debug('[%s] already extracted, skipping', revision_hash)
-                        continue
+                        # if we could use the commit (cache is filled and parent is finished) we set the min_path_date
+                        if not requeue and revision_hash not in ts.commits and not requeue and c.committer_date < ts.min_path_date:
+                            ts.min_path_date = c.committer_date
+
+                        # we want to traverse all paths in date order, if the current commit is not the next in date order we put it back on the stack
+                        if not requeue and revision_hash not in ts.commits and c.committer_date != ts.dates[0]:
+                            self._log.info('[%s] requeue, commit date is unequal to next date in date-order list %s != %s', revision_hash, c.committer_date, ts.dates[0])
+                            # set min date we want to use if we have multiple passes
+                            if ts.min_date > c.committer_date:
+                                ts.min_date = c.committer_date
+                            self._log.info('[%s] empty_cycle %s min_date %s, min_path_date %s', revision_hash, empty_cycle, ts.min_date, ts.min_path_date)
+
+                            # if we are moving around in circles without finishing anything because of the date we are using
+                            # the next minimum date of the last cycle is used (the next node we can use with minimum date)
+                            if empty_cycle > 1 and c.committer_date == ts.min_path_date:
+                                self._log.info('[%s] switching date in date-order list %s != %s', revision_hash, c.committer_date, ts.dates[0])
+                                tmp = ts.dates.index(ts.min_path_date)
+                                ts.dates[0], ts.dates[tmp] = ts.dates[tmp], ts.dates[0]
+                            else:
+                                requeue = True
+                                # if we are further along the cycle and still hit this we chose the minimum date of all currently queued commits
+                                # if empty_cycle > 3 and c.committer_date == min_path_date:
+                                #     log.info('[{}] min_path_date trigger, switching date in date-order list {} != {}'.format(revision_hash, c.committer_date, dates[0]))
+                                #     tmp = dates.index(min_path_date)
+                                #     dates[0], dates[tmp] = dates[tmp], dates[0]
+                                # else:
+                                #     requeue = True
+
+                        # if we need to requeue we better also jump to the next path number
+                        if requeue:
+                            run['requeues'] += 1
+                            self._log.debug('[%s] putting back on stack', revision_hash)
+                            que.appendleft(revision_hash)
+                            break
 
-                    # case of one parent or none (orphan commit)
-                    if len(c.parents) <= 1:
-
-                        # orphan commit
-                        parent = None
-                        if len(c.parents) == 1:
-                            parent = c.parents[0]
-
-                        self._log.info('[%s] non-merge %s/%s commits, %s state files', revision_hash, len(ts.commits) + 1, len(ts.need_commits), len(ts.path_state[pathkey].files.keys()))
-                        ts.path_state[pathkey], ts.global_state, metrics = self.mine_commit(ts.path_state[pathkey], ts.global_state, c, parent)
-
-                    # case of multiple parents, need to handle merge
-                    elif len(c.parents) > 1:
-                        ts.needs_cache.add(revision_hash)
-                        self._log.info('[%s] merge %s/%s commits, %s state files', revision_hash, len(ts.commits) + 1, len(ts.need_commits), len(ts.path_state[pathkey].files.keys()))
-                        ts.path_state[pathkey], ts.global_state, metrics = self.track_merge(ts.commit_cache, c, ts.global_state)
-
-                    if revision_hash not in ts.commits:
-                        if c.committer_date == ts.dates[0]:
-                            empty_cycle = 0  # reset empty cycle counter
-                            ts.min_date = max(ts.dates)  # reset min_date
-                            ts.min_path_date = max(ts.dates)  # reset min_path_date
-                            del ts.dates[0]  # pop date
-                        else:
-                            raise Exception('date mismatch')  # this is critical, we need eveything in date order (at least when possible)
-
-                    # if we have not already collected the metrics add them (if there are any), to_date is maximum date only add if current date is below that
-                    if revision_hash not in ts.commits and metrics:
-                        to_date = self.to_date.replace(tzinfo=c.committer_date.tzinfo)
-                        if c.committer_date <= to_date:
-                            # append aditional path information
-                            for m in metrics:
-                                m['pathnum'] = pathnum
-                                ts.data.append(m)
-
-                            # self._log.info('[%s] %s/%s commits, memsize commit cache: %s mb', revision_hash, len(ts.commits) + 1, len(ts.need_commits), asizeof.asizeof(ts.global_state._wd_cache) / 1024 / 1024)
-                            # self._log.info('[%s] %s/%s commits, memsize metrics: %s mb, memsize static metrics: %s mb', revision_hash, len(ts.commits) + 1, len(ts.need_commits), asizeof.asizeof(ts.data) / 1024 / 1024, asizeof.asizeof(ts.global_state.files) / 1024 / 1024)
-                            # ts.data += metrics
-                    # add commits to set of finished commits
-                    ts.commits.add(revision_hash)
-
-                    # if one of our successors is a merge commit we need to save this commits state global as the merge draws from that not from the path
-                    for succ in ts.g.successors(revision_hash):
-                        sc = gr.get_commit(succ)
-                        if len(sc.parents) > 1 and revision_hash not in ts.commit_cache.keys():
+                        # if we neede cache we load it
+                        if revision_hash in ts.commits and revision_hash in ts.needs_cache:
+                            old_files = len(ts.path_state[pathkey].files.keys())
+                            ts.path_state[pathkey] = PathState(files=copy.deepcopy(ts.commit_cache[revision_hash].files))
+                            new_files = len(ts.path_state[pathkey].files.keys())
+                            self._log.info('[%s] load from cache, files %s -> %s', revision_hash, old_files, new_files)
+
+                        # skip on already extracted commits
+                        if revision_hash in ts.commits:
+                            self._log.debug('[%s] already extracted, skipping', revision_hash)
+                            continue
+
+                        # case of one parent or none (orphan commit)
+                        if len(c.parents) <= 1:
+
+                            # orphan commit
+                            parent = None
+                            if len(c.parents) == 1:
+                                parent = c.parents[0]
+
+                            self._log.info('[%s] non-merge %s/%s commits, %s state files', revision_hash, len(ts.commits) + 1, len(ts.need_commits), len(ts.path_state[pathkey].files.keys()))
+                            ts.path_state[pathkey], ts.global_state, metrics = self.mine_commit(ts.path_state[pathkey], ts.global_state, c, parent)
+
+                        # case of multiple parents, need to handle merge
+                        elif len(c.parents) > 1:
+                            ts.needs_cache.add(revision_hash)
+                            self._log.info('[%s] merge %s/%s commits, %s state files', revision_hash, len(ts.commits) + 1, len(ts.need_commits), len(ts.path_state[pathkey].files.keys()))
+                            ts.path_state[pathkey], ts.global_state, metrics = self.track_merge(ts.commit_cache, c, ts.global_state)
+
+                        if revision_hash not in ts.commits:
+                            if c.committer_date == ts.dates[0]:
+                                empty_cycle = 0  # reset empty cycle counter
+                                ts.min_date = max(ts.dates)  # reset min_date
+                                ts.min_path_date = max(ts.dates)  # reset min_path_date
+                                del ts.dates[0]  # pop date
+                            else:
+                                raise Exception('date mismatch')  # this is critical, we need eveything in date order (at least when possible)
+
+                        # if we have not already collected the metrics add them (if there are any), to_date is maximum date only add if current date is below that
+                        if revision_hash not in ts.commits and metrics:
+                            to_date = self.to_date.replace(tzinfo=c.committer_date.tzinfo)
+                            if c.committer_date <= to_date:
+                                # append aditional path information
+                                for m in metrics:
+                                    m['pathnum'] = pathnum
+                                    ts.data.append(m)
+
+                                # self._log.info('[%s] %s/%s commits, memsize commit cache: %s mb', revision_hash, len(ts.commits) + 1, len(ts.need_commits), asizeof.asizeof(ts.global_state._wd_cache) / 1024 / 1024)
+                                # self._log.info('[%s] %s/%s commits, memsize metrics: %s mb, memsize static metrics: %s mb', revision_hash, len(ts.commits) + 1, len(ts.need_commits), asizeof.asizeof(ts.data) / 1024 / 1024, asizeof.asizeof(ts.global_state.files) / 1024 / 1024)
+                                # ts.data += metrics
+                        # add commits to set of finished commits
+                        ts.commits.add(revision_hash)
+                        self._profiler.count('commits')
+                        if progress.due():
+                            progress.write(self._progress(ts, run))
+
+                        # if one of our successors is a merge commit we need to save this commits state global as the merge draws from that not from the path
+                        for succ in ts.g.successors(revision_hash):
+                            sc = gr.get_commit(succ)
+                            if len(sc.parents) > 1 and revision_hash not in ts.commit_cache.keys():
+                                ts.commit_cache[revision_hash] = PathState(files=copy.deepcopy(ts.path_state[pathkey].files))
+                                self._log.info('[%s] successor (%s) is merge commit, saving global cache', revision_hash, succ)
+
+                        # save cache if this commit needs it (due to beeing first on a path)
+                        if revision_hash in ts.needs_cache and revision_hash not in ts.commit_cache.keys():
+                            new_files = len(ts.path_state[pathkey].files.keys())
                             ts.commit_cache[revision_hash] = PathState(files=copy.deepcopy(ts.path_state[pathkey].files))
-                            self._log.info('[%s] successor (%s) is merge commit, saving global cache', revision_hash, succ)
+                            self._log.info('[%s] save to cache, %s files', revision_hash, new_files)
 
-                    # save cache if this commit needs it (due to beeing first on a path)
-                    if revision_hash in ts.needs_cache and revision_hash not in ts.commit_cache.keys():
-                        new_files = len(ts.path_state[pathkey].files.keys())
-                        ts.commit_cache[revision_hash] = PathState(files=copy.deepcopy(ts.path_state[pathkey].files))
-                        self._log.info('[%s] save to cache, %s files', revision_hash, new_files)
+                    self._log.info('finished path %s (%s/%s), %s/%s commits', pathnum, ts.initial_path_lengths[pathkey] - len(que), ts.initial_path_lengths[pathkey], len(ts.commits), len(ts.need_commits))
 
-                self._log.info('finished path %s (%s/%s), %s/%s commits', pathnum, ts.initial_path_lengths[pathkey] - len(que), ts.initial_path_lengths[pathkey], len(ts.commits), len(ts.need_commits))
+                # if we have one complete rotation without beeing finished because of date switches
+                # we use the minimum date of the available next commits
+                empty_cycle += 1
+        progress.write(self._progress(ts, run, finished=True))
 
-            # if we have one complete rotation without beeing finished because of date switches
-            # we use the minimum date of the available next commits
-            empty_cycle += 1
+        if self._use_linter:
+            linter_con.close()
 
         # the bug matrix might be too memory intensive to build, we pickle what we have beforehand
         # self._log.info('dumping pickle of collected data just in case')
@@ -425,6 +460,8 @@ class Traversal:
         if self._use_maven:
             pompom.save_cache(build_cache_file)
 
+        self._log.info('filename filter cache hit rate %.1f%% (%s hits, %s misses)', self._args.filter_hit_rate() * 100, self._args.filter_hits, self._args.filter_misses)
+        self._profiler.counters['filename_filter_hit_rate'] = self._args.filter_hit_rate()
 
         # we need to re-attach the inducings here in case we loaded a previous traversal state
         for row in ts.data:
@@ -433,47 +470,75 @@ class Traversal:
 
         # now we can build the bug matrix
         self._log.info('creating bug matrix')
-        all_bugs = set()
-        for row in ts.data:
-            if 'label_adhoc' not in row.keys():
-                print(row)
-            for bug in row['label_adhoc']:
-                all_bugs.add(bug)
-            #if 'label_bug' in row.keys():
-            for label in ts.labels:
-                for bug in row['label_{}'.format(label)]:
-                    all_bugs.add('{}__{}'.format(label, bug))
-
-        new_data = []
-        for row in ts.data:
-            bug_matrix = {k: 0 for k in all_bugs}
-            for bug in row['label_adhoc']:
-                bug_matrix[bug] = 1
-
-            #if 'label_bug' in row.keys():
-            for label in ts.labels:
-                for bug in row['label_{}'.format(label)]:
-                    bug_matrix['{}__{}'.format(label, bug)] = 1
-            # add bug matrix values to row
-            for k, v in bug_matrix.items():
-                row[k] = v
-
-            # clear lists which were only needed for the construction of bug_matrix from the output
-            #if 'label_bug' in row.keys():
-            for label in ts.labels:
-                del row['label_{}'.format(label)]
-            if 'label_adhoc' in row.keys():
-                del row['label_adhoc']
-
-            new_data.append(row)
+        with self._profiler.phase('bug_matrix'):
+            all_bugs = set()
+            for row in ts.data:
+                if 'label_adhoc' not in row.keys():
+                    print(row)
+                for bug in row['label_adhoc']:
+                    all_bugs.add(bug)
+                #if 'label_bug' in row.keys():
+                for label in ts.labels:
+                    for bug in row['label_{}'.format(label)]:
+                        all_bugs.add('{}__{}'.format(label, bug))
+
+            new_data = []
+            for row in ts.data:
+                bug_matrix = {k: 0 for k in all_bugs}
+                for bug in row['label_adhoc']:
+                    bug_matrix[bug] = 1
+
+                #if 'label_bug' in row.keys():
+                for label in ts.labels:
+                    for bug in row['label_{}'.format(label)]:
+                        bug_matrix['{}__{}'.format(label, bug)] = 1
+                # add bug matrix values to row
+                for k, v in bug_matrix.items():
+                    row[k] = v
+
+                # the smartshark connector keeps the static features as vector until now
+                static_features = row.pop('static_features', None)
+                if static_features is not None:
+                    row.update(static_features.items())
+
+                # clear lists which were only needed for the construction of bug_matrix from the output
+                #if 'label_bug' in row.keys():
+                for label in ts.labels:
+                    del row['label_{}'.format(label)]
+                if 'label_adhoc' in row.keys():
+                    del row['label_adhoc']
+
+                new_data.append(row)
         self._log.info('finished bug matrix')
         return new_data
 
+    def _progress(self, ts, run, finished=False):
+        """Progress, throughput and cache hit rates of the current traversal run."""
+        duration = time.monotonic() - run['start']
+        done = len(ts.commits) - run['commits']
+
+        caches = {'filename_filter': hit_rate(self._args.filter_hits, self._args.filter_misses)}
+        for name, con in ts.global_state.get_connectors().items():
+            caches[name] = hit_rate(con.cache_hits, con.cache_misses)
+
+        return {'project': self.project_name,
+                'finished': finished,
+                'commits_done': len(ts.commits),
+                'commits_total': len(ts.need_commits),
+                'commits_per_second': done / duration if duration else 0.0,
+                'seconds': duration,
+                'rows': len(ts.data),
+                'requeues': run['requeues'],
+                'cache_hit_rates': caches,
+                'commit_cache_size': len(ts.commit_cache),
+                'rss': rss()}
+
     def mine_commit(self, path_state, global_state, commit, parent_revision_hash):
         metrics = []
 
         gr2 = GitRepository(self.project_path)
-        gr2.repo.git.checkout(commit.hash, '--force')  # we rely on the current filesystem of the project being the current commit in PMD and build connectors
+        with self._profiler.call('checkout'):
+            gr2.repo.git.checkout(commit.hash, '--force')  # we rely on the current filesystem of the project being the current commit in PMD and build connectors
         global_state.add_commit(commit)
         for m in commit.modifications:
             # this is handled separately in rename
@@ -531,7 +596,8 @@ class Traversal:
             if len(a) > 0 or len(b) > 0:
                 raise Exception('stopping here')
 
-        global_state.calculate_metrics(commit)
+        with self._profiler.call('calculate_metrics'):
+            global_state.calculate_metrics(commit)
         metrics = copy.deepcopy(global_state.metrics)
         return path_state, global_state, metrics
 
@@ -616,7 +682,8 @@ class Traversal:
             if len(a) > 0 or len(b) > 0:
                 raise Exception('stopping here')
 
-        global_state.calculate_metrics(commit)
+        with self._profiler.call('calculate_metrics'):
+            global_state.calculate_metrics(commit)
         metrics = copy.deepcopy(global_state.metrics)
 
         # we need to return the merged parent states in a new path_state
@@ -713,12 +780,8 @@ class Traversal:
 
         result = set()
         for root, dirs, files in os.walk(self.project_path):
-            for file in files:
-                filepath = os.path.join(root, file)
-                rel_filepath = filepath.replace(self.project_path, '')
-
-                if self._args.filename_filter(rel_filepath):
-                    result.add(rel_filepath)
+            rel_filepaths = [os.path.join(root, file).replace(self.project_path, '') for file in files]
+            result.update(self._args.filter_paths(rel_filepaths))
 
         if not self._is_test:
             gr2.repo.git.checkout(gr2.repo.refs['origin/HEAD'].commit.hexsha, '--force')